@@ -0,0 +1,188 @@
+"""
+Per-site, per-hour-of-week baselines and anomaly z-scores.
+
+A nightly batch (`python main.py --mode baselines`) computes, for every site and each of
+the 168 hours of the week, the median and MAD (median absolute deviation) of latency, loss
+and jitter over the last few weeks of history. The result is a set of float32 arrays of
+shape (sites, 168, metrics) saved as one .npz file, with sites addressed by index.
+
+Scoring a new sample is then a dict lookup plus array indexing:
+    z = (value - median) / (1.4826 * MAD)
+so "worse than usual for this site" works for satellite or LTE branches whose normal
+latency would fail the fixed thresholds in calculate_score.
+"""
+import os
+from datetime import datetime, timedelta
+
+METRICS = ('latency_ms', 'packet_loss_pct', 'jitter_ms')
+HOURS_PER_WEEK = 168
+# Lower bounds for the scaled MAD, so very stable sites don't turn noise into huge z-scores.
+MIN_SCALE = {'latency_ms': 2.0, 'packet_loss_pct': 0.2, 'jitter_ms': 1.0}
+MAD_TO_SIGMA = 1.4826
+BASELINE_FILE = os.getenv('BASELINE_FILE', 'baselines/baselines.npz')
+
+
+def hour_of_week(timestamp):
+    return timestamp.weekday() * 24 + timestamp.hour
+
+
+def compute_baselines(df, min_samples=3):
+    """
+    Computes baselines from a history DataFrame with site_id, timestamp and METRICS columns.
+    Hour-of-week buckets with fewer than `min_samples` samples fall back to the site's
+    all-hours median/MAD. Returns a Baselines object.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, site_ids = pd.factorize(df['site_id'], sort=True)
+    timestamps = pd.to_datetime(df['timestamp'])
+    how = (timestamps.dt.dayofweek * 24 + timestamps.dt.hour).to_numpy()
+    values = pd.DataFrame(df[list(METRICS)].to_numpy(dtype=np.float32), columns=METRICS)
+
+    n_sites = len(site_ids)
+    median = np.full((n_sites * HOURS_PER_WEEK, len(METRICS)), np.nan, dtype=np.float32)
+    mad = np.full_like(median, np.nan)
+    counts = np.zeros(n_sites * HOURS_PER_WEEK, dtype=np.uint16)
+
+    def median_and_mad(keys):
+        grouped = values.groupby(keys)
+        medians = grouped.median()
+        deviations = (values - medians.loc[keys].to_numpy()).abs()
+        return medians, deviations.groupby(keys).median(), grouped.size()
+
+    if n_sites:
+        bucket_keys = codes * HOURS_PER_WEEK + how
+        medians, mads, sizes = median_and_mad(bucket_keys)
+        median[medians.index] = medians.to_numpy()
+        mad[mads.index] = mads.to_numpy()
+        counts[sizes.index] = np.minimum(sizes.to_numpy(), np.iinfo(np.uint16).max)
+
+        site_medians, site_mads, _sizes = median_and_mad(codes)
+        sparse = counts < min_samples
+        fallback_sites = np.repeat(np.arange(n_sites), HOURS_PER_WEEK)[sparse]
+        median[sparse] = site_medians.reindex(fallback_sites).to_numpy()
+        mad[sparse] = site_mads.reindex(fallback_sites).to_numpy()
+
+    shape = (n_sites, HOURS_PER_WEEK, len(METRICS))
+    return Baselines(
+        list(site_ids), median.reshape(shape), mad.reshape(shape),
+        counts.reshape(n_sites, HOURS_PER_WEEK), datetime.utcnow()
+    )
+
+
+class Baselines:
+    """Baseline arrays plus the site_id -> row index used to address them."""
+
+    def __init__(self, site_ids, median, mad, counts, computed_at):
+        import numpy as np
+
+        self.site_ids = list(site_ids)
+        self.index = {site_id: i for i, site_id in enumerate(self.site_ids)}
+        self.median = median
+        self.mad = mad
+        self.counts = counts
+        self.computed_at = computed_at
+        self.scale = np.maximum(MAD_TO_SIGMA * np.nan_to_num(mad), np.array([MIN_SCALE[m] for m in METRICS], dtype=np.float32))
+
+    def __len__(self):
+        return len(self.site_ids)
+
+    def zscores(self, site_id, timestamp, **values):
+        """
+        Robust z-scores of one sample against the site's baseline for that hour of the week,
+        e.g. zscores('SITE-001', ts, latency_ms=180). Returns {metric: z} or None for unknown sites.
+        """
+        row = self.index.get(site_id)
+        if row is None:
+            return None
+        how = hour_of_week(timestamp)
+        scores = {}
+        for column, metric in enumerate(METRICS):
+            value = values.get(metric)
+            baseline = self.median[row, how, column]
+            if value is None or baseline != baseline:  # NaN: no history for this site
+                continue
+            scores[metric] = round(float((value - baseline) / self.scale[row, how, column]), 2)
+        return scores
+
+    def zscores_frame(self, df):
+        """Vectorized z-scores for a DataFrame with site_id, timestamp and METRICS columns (NaN if unknown)."""
+        import numpy as np
+        import pandas as pd
+
+        rows = df['site_id'].map(self.index)
+        known = rows.notna().to_numpy()
+        result = pd.DataFrame(np.nan, index=df.index, columns=[f'{m}_z' for m in METRICS])
+        if not known.any():
+            return result
+        rows = rows[known].astype(int).to_numpy()
+        timestamps = pd.to_datetime(df['timestamp'][known])
+        how = (timestamps.dt.dayofweek * 24 + timestamps.dt.hour).to_numpy()
+        values = df.loc[known, list(METRICS)].to_numpy(dtype=np.float32)
+        result.loc[known] = (values - self.median[rows, how]) / self.scale[rows, how]
+        return result
+
+    def save(self, path=BASELINE_FILE):
+        import numpy as np
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path, site_ids=np.array(self.site_ids, dtype=str), median=self.median, mad=self.mad,
+            counts=self.counts, computed_at=np.array(self.computed_at.isoformat())
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BASELINE_FILE):
+        """Loads saved baselines, or returns None if none have been computed."""
+        import numpy as np
+
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(
+                data['site_ids'].tolist(), data['median'], data['mad'], data['counts'],
+                datetime.fromisoformat(str(data['computed_at']))
+            )
+
+
+def load_history_frame(start, end):
+    """
+    History between `start` and `end` as a DataFrame: exported days from the Parquet
+    snapshots (if pyarrow is installed) plus the newer rows still in SQLite.
+    """
+    import pandas as pd
+    from sqlalchemy import select
+    from database.db import get_engine, SiteStatusHistory
+
+    columns = ['site_id', 'timestamp', *METRICS]
+    frames = []
+    sqlite_start = start
+    try:
+        from database.snapshot import exported_days, load_history
+        days = [day for day in exported_days() if start.date() <= day <= end.date()]
+        if days:
+            frames.append(load_history(start, end, columns=columns).to_pandas())
+            sqlite_start = max(start, datetime.combine(days[-1] + timedelta(days=1), datetime.min.time()))
+    except ImportError:
+        pass
+
+    query = select(*[getattr(SiteStatusHistory, c) for c in columns]).where(
+        SiteStatusHistory.timestamp >= sqlite_start, SiteStatusHistory.timestamp < end
+    )
+    frames.append(pd.read_sql(query, get_engine()))
+    frames = [f for f in frames if not f.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def build_baselines(days=28, end=None, path=BASELINE_FILE):
+    """Nightly batch: computes baselines over the last `days` days of history and saves them."""
+    end = end or datetime.utcnow()
+    df = load_history_frame(end - timedelta(days=days), end)
+    baselines = compute_baselines(df)
+    baselines.save(path)
+    return baselines, len(df)
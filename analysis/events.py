@@ -0,0 +1,186 @@
+"""
+Change detection for site state, with debounced transition events.
+
+ChangeDetector keeps the last confirmed state of every site in memory and compares each
+new sweep against it. A new state must be seen in `debounce` consecutive sweeps before it
+is confirmed and an event is emitted, so a single flapping sample doesn't alert. Sites
+whose state is unchanged cost one dict comparison; no history is read.
+
+Tracked transitions (kind: states):
+    wan:    UP / DOWN
+    health: Excellent / Good / Fair / Poor / Critical
+    switch: OK / LOST
+    ap:     OK / LOST
+
+Events go to pluggable sinks: anything with an `emit(events)` method. A failing sink is
+printed and skipped, so it never interrupts the collector or the sinks after it.
+"""
+import json
+import os
+from datetime import datetime
+
+EVENT_KINDS = ('wan', 'health', 'switch', 'ap')
+
+
+def site_state(contribution):
+    """Per-kind states of one site from its summary contribution (see database/summary.py)."""
+    return {
+        'wan': 'DOWN' if contribution['wan_down'] else 'UP',
+        'health': contribution['status'],
+        'switch': 'LOST' if contribution['switch_down'] else 'OK',
+        'ap': 'LOST' if contribution['ap_down'] else 'OK',
+    }
+
+
+class ChangeDetector:
+    """
+    Usage:
+        detector = ChangeDetector(debounce=2, sinks=[DatabaseSink(), FileSink()])
+        detector.observe('fmg', [(site_id, site_contribution(site)), ...])
+    """
+
+    def __init__(self, debounce=2, sinks=None):
+        self.debounce = max(1, debounce)
+        self.sinks = list(sinks or [])
+        self.confirmed = {}  # site_id -> {kind: state}
+        self.pending = {}    # (site_id, kind) -> (candidate state, consecutive sweeps seen)
+
+    def seed(self, session):
+        """Loads confirmed states from site_status, so a restart doesn't re-alert or miss changes."""
+        from database.db import SiteStatus
+        from database.summary import site_contribution
+
+        for site in session.query(SiteStatus):
+            self.confirmed[site.site_id] = site_state(site_contribution(site))
+
+    def observe(self, source, sites, timestamp=None):
+        """
+        Compares a sweep of (site_id, contribution) pairs with the confirmed states.
+        Sites seen for the first time are recorded without an event. Returns the new events.
+        """
+        timestamp = timestamp or datetime.utcnow()
+        events = []
+        for site_id, contribution in sites:
+            state = site_state(contribution)
+            confirmed = self.confirmed.get(site_id)
+            if confirmed is None:
+                self.confirmed[site_id] = state
+                continue
+            if state == confirmed:
+                if self.pending:
+                    for kind in EVENT_KINDS:
+                        self.pending.pop((site_id, kind), None)
+                continue
+
+            for kind in EVENT_KINDS:
+                new, old = state[kind], confirmed[kind]
+                key = (site_id, kind)
+                if new == old:
+                    self.pending.pop(key, None)
+                    continue
+                candidate, seen = self.pending.get(key, (None, 0))
+                seen = seen + 1 if candidate == new else 1
+                if seen >= self.debounce:
+                    self.pending.pop(key, None)
+                    confirmed[kind] = new
+                    events.append({
+                        'site_id': site_id, 'source': source, 'kind': kind,
+                        'old_state': old, 'new_state': new, 'timestamp': timestamp,
+                    })
+                else:
+                    self.pending[key] = (new, seen)
+
+        if events:
+            for sink in self.sinks:
+                try:
+                    sink.emit(events)
+                except Exception as e:
+                    print(f"Event sink {type(sink).__name__} failed for {len(events)} event(s): {e}")
+        return events
+
+    def forget(self, site_id):
+        self.confirmed.pop(site_id, None)
+        for kind in EVENT_KINDS:
+            self.pending.pop((site_id, kind), None)
+
+
+def _serialize(event):
+    return {**event, 'timestamp': event['timestamp'].isoformat()}
+
+
+class FileSink:
+    """Appends events as JSON lines."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('EVENTS_FILE', 'events/events.jsonl')
+
+    def emit(self, events):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as f:
+            for event in events:
+                f.write(json.dumps(_serialize(event)) + '\n')
+
+
+class WebhookSink:
+    """POSTs each batch of events as a JSON list. Failures are printed, never raised."""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, events):
+        import requests
+        try:
+            response = requests.post(self.url, json=[_serialize(e) for e in events], timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Could not deliver {len(events)} event(s) to {self.url}: {e}")
+
+
+class DatabaseSink:
+    """Inserts events into the `site_events` table."""
+
+    def emit(self, events):
+        from sqlalchemy import insert
+        from database.db import get_session, SiteEvent
+        session = get_session()
+        try:
+            session.execute(insert(SiteEvent), events)
+            session.commit()
+        finally:
+            session.close()
+
+
+def detector_from_env(seed=True, debounce=None):
+    """
+    Builds a ChangeDetector with a DatabaseSink, plus a FileSink if EVENTS_FILE is set and a
+    WebhookSink if EVENTS_WEBHOOK is set. EVENT_DEBOUNCE sets the sweeps needed to confirm,
+    unless `debounce` is given (one-shot runs such as the FAZ/ZDX scrapers use 1, since
+    pending states don't survive the process).
+    If TOPOLOGY_FILE exists, a CorrelationEngine follows the events and reports shared-cause incidents.
+    """
+    from analysis.topology import TOPOLOGY_FILE, CorrelationEngine, Topology
+
+    sinks = [DatabaseSink()]
+    if os.getenv('EVENTS_FILE'):
+        sinks.append(FileSink())
+    if os.getenv('EVENTS_WEBHOOK'):
+        sinks.append(WebhookSink(os.getenv('EVENTS_WEBHOOK')))
+    if debounce is None:
+        debounce = int(os.getenv('EVENT_DEBOUNCE', '2'))
+    detector = ChangeDetector(debounce=debounce, sinks=sinks)
+    if seed or os.path.exists(TOPOLOGY_FILE):
+        from database.db import get_session
+        session = get_session()
+        try:
+            if seed:
+                detector.seed(session)
+            if os.path.exists(TOPOLOGY_FILE):
+                engine = CorrelationEngine(Topology.from_session(session))
+                engine.seed(session)
+                detector.sinks.append(engine)
+        finally:
+            session.close()
+    return detector
@@ -0,0 +1,154 @@
+"""
+Streaming per-site statistics for stable scoring.
+
+RollingStats keeps, for every site, state that is updated in O(1) per sample and never
+re-reads history:
+    - EWMA of latency, loss and jitter
+    - a sliding window (last `window` samples) of latency as a fixed-bucket histogram, for p95
+    - loss-burst counters: current run of lossy samples, longest run and lossy samples in the window
+
+`smoothed_metrics()` returns windowed values in the shape calculate_score expects, so one
+latency spike no longer flips a site between Excellent and Poor.
+"""
+import bisect
+from array import array
+
+from analysis.scoring import calculate_score
+
+# Latency bucket upper bounds (ms); the last bucket is open-ended.
+LATENCY_BUCKETS = (5, 10, 20, 30, 40, 50, 60, 75, 100, 125, 150, 200, 250, 300, 400, 500, 750, 1000, 2000)
+LOSS_THRESHOLD = 1.0  # % loss that counts a sample as lossy
+
+
+class SiteWindow:
+    """Rolling state of one site. Memory is O(window) bytes plus a few floats."""
+
+    __slots__ = ('alpha', 'window', 'samples', 'latency', 'loss', 'jitter',
+                 'buckets', 'ring', 'lossy_ring', 'position', 'lossy_in_window',
+                 'burst', 'longest_burst', 'bursts')
+
+    def __init__(self, window=60, alpha=0.2):
+        self.alpha = alpha
+        self.window = window
+        self.samples = 0
+        self.latency = self.loss = self.jitter = None
+        self.buckets = array('I', [0] * (len(LATENCY_BUCKETS) + 1))
+        self.ring = array('B', [0] * window)       # bucket index of each sample in the window
+        self.lossy_ring = bytearray(window)         # 1 if the sample was lossy
+        self.position = 0
+        self.lossy_in_window = 0
+        self.burst = 0
+        self.longest_burst = 0
+        self.bursts = 0
+
+    @staticmethod
+    def _current(current, value):
+        if value is not None:
+            return value
+        return 0.0 if current is None else current
+
+    def _ewma(self, current, value):
+        return value if current is None else current + self.alpha * (value - current)
+
+    def update(self, latency_ms, packet_loss_pct, jitter_ms):
+        # A metric the sample doesn't carry (None) counts as its current smoothed value.
+        latency_ms = self._current(self.latency, latency_ms)
+        packet_loss_pct = self._current(self.loss, packet_loss_pct)
+        jitter_ms = self._current(self.jitter, jitter_ms)
+        self.latency = self._ewma(self.latency, latency_ms)
+        self.loss = self._ewma(self.loss, packet_loss_pct)
+        self.jitter = self._ewma(self.jitter, jitter_ms)
+
+        # Slide the window: evict the oldest sample once it is full.
+        if self.samples >= self.window:
+            self.buckets[self.ring[self.position]] -= 1
+            self.lossy_in_window -= self.lossy_ring[self.position]
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, latency_ms)
+        self.buckets[bucket] += 1
+        self.ring[self.position] = bucket
+
+        lossy = packet_loss_pct >= LOSS_THRESHOLD
+        self.lossy_ring[self.position] = lossy
+        self.lossy_in_window += lossy
+        if lossy:
+            if self.burst == 0:
+                self.bursts += 1
+            self.burst += 1
+            self.longest_burst = max(self.longest_burst, self.burst)
+        else:
+            self.burst = 0
+
+        self.position = (self.position + 1) % self.window
+        self.samples += 1
+
+    def latency_percentile(self, q):
+        """Estimated latency quantile over the window, interpolated within buckets."""
+        count = min(self.samples, self.window)
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for index, bucket_count in enumerate(self.buckets):
+            upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1] * 2
+            if bucket_count and seen + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return lower
+
+
+class RollingStats:
+    """
+    Per-site rolling windows, created on first sample.
+
+    Usage:
+        stats = RollingStats(window=60, alpha=0.2)
+        stats.update('SITE-001', latency_ms=42, packet_loss_pct=0, jitter_ms=3)
+        stats.score('SITE-001', wan_status=True, lan_switch_status=True, lan_ap_status=True)
+    """
+
+    def __init__(self, window=60, alpha=0.2):
+        self.window = window
+        self.alpha = alpha
+        self.sites = {}
+
+    def __len__(self):
+        return len(self.sites)
+
+    def update(self, site_id, latency_ms=0.0, packet_loss_pct=0.0, jitter_ms=0.0):
+        site = self.sites.get(site_id)
+        if site is None:
+            site = self.sites[site_id] = SiteWindow(self.window, self.alpha)
+        site.update(latency_ms, packet_loss_pct, jitter_ms)
+        return site
+
+    def smoothed_metrics(self, site_id):
+        """Windowed metrics for calculate_score (EWMA values), plus p95 latency and burst counters."""
+        site = self.sites.get(site_id)
+        if site is None or not site.samples:
+            return None
+        return {
+            'latency_ms': round(site.latency, 3),
+            'packet_loss_pct': round(site.loss, 3),
+            'jitter_ms': round(site.jitter, 3),
+            'latency_p95_ms': round(site.latency_percentile(0.95), 3),
+            'lossy_samples': site.lossy_in_window,
+            'loss_burst': site.burst,
+            'longest_loss_burst': site.longest_burst,
+        }
+
+    def score(self, site_id, wan_status=True, lan_switch_status=True, lan_ap_status=True):
+        """calculate_score over the smoothed metrics. Availability is taken as-is (not smoothed)."""
+        metrics = self.smoothed_metrics(site_id) or {}
+        return calculate_score({
+            'wan_status': wan_status,
+            'lan_switch_status': lan_switch_status,
+            'lan_ap_status': lan_ap_status,
+            'latency_ms': metrics.get('latency_ms', 0.0),
+            'packet_loss_pct': metrics.get('packet_loss_pct', 0.0),
+            'jitter_ms': metrics.get('jitter_ms', 0.0),
+        })
+
+    def forget(self, site_id):
+        self.sites.pop(site_id, None)
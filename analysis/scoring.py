@@ -61,3 +61,25 @@ def get_health_status(score):
         return "Poor"
     else:
         return "Critical"
+
+def calculate_scores(wan_status, lan_switch_status, lan_ap_status, latency_ms, packet_loss_pct, jitter_ms):
+    """
+    Vectorized calculate_score over equal-length arrays (numpy arrays or pandas Series).
+    Returns a float numpy array with the same penalties and caps as calculate_score.
+    """
+    import numpy as np
+
+    latency = np.asarray(latency_ms, dtype=np.float64)
+    loss = np.asarray(packet_loss_pct, dtype=np.float64)
+    jitter = np.asarray(jitter_ms, dtype=np.float64)
+
+    score = np.full(latency.shape, 100.0)
+    score -= 20 * ~np.asarray(lan_switch_status, dtype=bool)
+    score -= 20 * ~np.asarray(lan_ap_status, dtype=bool)
+    score -= np.minimum(np.clip((latency - 50) / 10, 0, None), 30)
+    score -= np.minimum(np.clip(loss * 5, 0, None), 40)
+    score -= np.minimum(np.clip((jitter - 10) / 5, 0, None), 10)
+
+    score = np.maximum(0.0, np.round(score, 1))
+    score[~np.asarray(wan_status, dtype=bool)] = 0.0
+    return score
@@ -0,0 +1,58 @@
+"""
+SD-WAN health-check parsing and per-site aggregation.
+
+FortiOS `/api/v2/monitor/virtual-wan/health-check` returns
+    {"<health check>": {"<member interface>": {"status": "up", "latency": 12.1,
+                                               "jitter": 0.8, "packet_loss": 0.0, ...}}}
+`parse_health_check` flattens that into one dict per (health check, member), and
+`site_wan_metrics` reduces the members to the latency/loss/jitter fed to calculate_score.
+"""
+
+HEALTH_CHECK = "/api/v2/monitor/virtual-wan/health-check"
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_health_check(data):
+    """Flattens a health-check response (with or without a 'results' wrapper) into member dicts."""
+    if isinstance(data, dict) and 'results' in data:
+        data = data['results']
+    if not isinstance(data, dict):
+        return []
+
+    members = []
+    for health_check, interfaces in data.items():
+        if not isinstance(interfaces, dict):
+            continue
+        for member, stats in interfaces.items():
+            if not isinstance(stats, dict):
+                continue
+            members.append({
+                'health_check': health_check,
+                'member': member,
+                'status': str(stats.get('status', '')).lower() == 'up',
+                'latency_ms': _float(stats.get('latency')),
+                'jitter_ms': _float(stats.get('jitter')),
+                'packet_loss_pct': _float(stats.get('packet_loss')),
+            })
+    return members
+
+
+def site_wan_metrics(members, mode='worst'):
+    """
+    Reduces member measurements to one latency/loss/jitter per site, over members that are up.
+    `mode` is 'worst' (max of each metric) or 'mean'. Returns None if no member is up.
+    """
+    up = [m for m in members if m['status']]
+    if not up:
+        return None
+    reduce = max if mode == 'worst' else (lambda values: sum(values) / len(values))
+    return {
+        key: round(reduce([m[key] for m in up]), 3)
+        for key in ('latency_ms', 'packet_loss_pct', 'jitter_ms')
+    }
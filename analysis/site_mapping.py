@@ -0,0 +1,240 @@
+"""
+Maps ZDX users/devices to sites and aggregates their experience metrics per site.
+
+Rules are plain dicts, loaded from SITE_MAPPING_FILE (JSON list) or passed in:
+    {"type": "prefix", "pattern": "nyc-",           "site_id": "SITE-001"}
+    {"type": "regex",  "pattern": "^(\\d{3})-",      "site_id": "SITE-{1}"}   # {n} = regex group n
+    {"type": "subnet", "pattern": "10.12.0.0/16",   "site_id": "SITE-012"}
+Prefix and regex rules match the `user` field unless a rule sets "field" (e.g. "device");
+subnet rules match `ip`. Matching is case-insensitive for prefixes.
+
+Rules are compiled once: prefixes into a character trie (longest prefix wins), subnets into
+a SubnetIndex (sorted numpy arrays per prefix length). The first rule type that matches
+wins, in the order prefix, regex, subnet. A DataFrame of thousands of rows is mapped with
+one lookup per distinct value and one vectorized pass for the IPs.
+"""
+import ipaddress
+import json
+import os
+import re
+
+SITE_MAPPING_FILE = os.getenv('SITE_MAPPING_FILE', 'site_mapping.json')
+
+
+class PrefixTrie:
+    """Character trie returning the site of the longest matching prefix."""
+
+    _END = object()
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, prefix, site_id):
+        node = self.root
+        for char in prefix.lower():
+            node = node.setdefault(char, {})
+        node[self._END] = site_id
+
+    def match(self, value):
+        node = self.root
+        found = node.get(self._END)
+        for char in value.lower():
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(self._END, found)
+        return found
+
+
+class SubnetIndex:
+    """
+    IPv4 subnet -> site index. Networks are grouped by prefix length, and each group is a
+    sorted array of network addresses, so a lookup is one binary search per prefix length.
+    Overlapping subnets resolve to the longest prefix.
+    """
+
+    def __init__(self, subnets=()):
+        self._networks = {}  # prefix length -> {network int: site_id}
+        self._compiled = None
+        for subnet, site_id in subnets:
+            self.add(subnet, site_id)
+
+    def add(self, subnet, site_id, overwrite=True):
+        network = ipaddress.ip_network(subnet, strict=False)
+        if network.version != 4:
+            raise ValueError(f"Only IPv4 subnets are supported: {subnet}")
+        networks = self._networks.setdefault(network.prefixlen, {})
+        if overwrite or int(network.network_address) not in networks:
+            networks[int(network.network_address)] = site_id
+        self._compiled = None
+
+    def extend(self, subnets):
+        """Adds (subnet, site_id) pairs without replacing subnets that are already mapped."""
+        for subnet, site_id in subnets:
+            self.add(subnet, site_id, overwrite=False)
+
+    def __len__(self):
+        return sum(len(networks) for networks in self._networks.values())
+
+    def _compile(self):
+        import numpy as np
+
+        compiled = []
+        for prefixlen in sorted(self._networks, reverse=True):
+            networks = self._networks[prefixlen]
+            starts = np.array(sorted(networks), dtype=np.uint32)
+            sites = np.array([networks[int(start)] for start in starts], dtype=object)
+            mask = np.uint32((0xFFFFFFFF << (32 - prefixlen)) & 0xFFFFFFFF)
+            compiled.append((mask, starts, sites))
+        self._compiled = compiled
+        return compiled
+
+    def lookup_many(self, ips):
+        """
+        Resolves an iterable of IPv4 strings to site ids, vectorized.
+        Returns an object numpy array with None where nothing matched or the IP is invalid.
+        """
+        import numpy as np
+
+        addresses, valid = ip_to_int(ips)
+        result = np.full(len(addresses), None, dtype=object)
+        unresolved = valid.copy()
+        for mask, starts, sites in (self._compiled or self._compile()):
+            if not unresolved.any():
+                break
+            masked = addresses & mask
+            positions = np.searchsorted(starts, masked)
+            positions[positions == len(starts)] = 0
+            hit = unresolved & (starts[positions] == masked)
+            result[hit] = sites[positions[hit]]
+            unresolved &= ~hit
+        return result
+
+    def lookup(self, ip):
+        return self.lookup_many([ip])[0]
+
+
+def ip_to_int(ips):
+    """Converts IPv4 strings to a uint32 array plus a validity mask, vectorized with pandas."""
+    import numpy as np
+    import pandas as pd
+
+    text = pd.Series(list(ips), dtype=object).astype(str).str.strip()
+    addresses = np.zeros(len(text), dtype=np.uint32)
+    valid = text.str.fullmatch(r'\d{1,3}(?:\.\d{1,3}){3}').fillna(False).to_numpy(dtype=bool)
+    if valid.any():
+        octets = text[valid].str.split('.', expand=True).astype(np.uint32).to_numpy()
+        in_range = (octets <= 255).all(axis=1)
+        values = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+        positions = np.flatnonzero(valid)
+        addresses[positions] = values
+        valid[positions[~in_range]] = False
+    return addresses, valid
+
+
+class SiteMapper:
+    """Compiled mapping rules. Usage: SiteMapper(rules).map_frame(df) -> Series of site ids."""
+
+    def __init__(self, rules=(), site_index=None):
+        self.prefixes = {}   # field -> PrefixTrie
+        self.regexes = []    # (field, compiled pattern, site template)
+        self.subnets = SubnetIndex()
+        # Exact (lowercased) name -> site_id, e.g. database.store.build_site_index.
+        self.site_index = site_index or {}
+
+        for rule in rules:
+            kind = rule['type']
+            if kind == 'prefix':
+                self.prefixes.setdefault(rule.get('field', 'user'), PrefixTrie()).add(rule['pattern'], rule['site_id'])
+            elif kind == 'regex':
+                self.regexes.append((rule.get('field', 'user'), re.compile(rule['pattern'], re.IGNORECASE), rule['site_id']))
+            elif kind == 'subnet':
+                self.subnets.add(rule['pattern'], rule['site_id'])
+            else:
+                raise ValueError(f"Unknown site mapping rule type: {kind}")
+
+    @classmethod
+    def from_file(cls, path=SITE_MAPPING_FILE, site_index=None):
+        """Loads rules from a JSON file; a missing file means no rules."""
+        rules = []
+        if os.path.exists(path):
+            with open(path) as f:
+                rules = json.load(f)
+        return cls(rules, site_index=site_index)
+
+    def match_name(self, field, value, site_index=None):
+        """
+        Site for one user/device name via exact match, prefix trie, then regex rules.
+        `site_index` is used for the exact match if the mapper has no index of its own.
+        """
+        if not value:
+            return None
+        site_id = (self.site_index or site_index or {}).get(value.lower())
+        if site_id is None and field in self.prefixes:
+            site_id = self.prefixes[field].match(value)
+        if site_id is None:
+            for rule_field, pattern, template in self.regexes:
+                if rule_field != field:
+                    continue
+                match = pattern.search(value)
+                if match:
+                    return _expand(template, match)
+        return site_id
+
+    def map_frame(self, df, site_index=None, subnets=None):
+        """
+        Returns a Series of site ids aligned with `df` (None where no rule matched).
+        `site_index` backs up the mapper's exact-name index (see match_name) and `subnets`
+        (a SubnetIndex, e.g. database.subnets.get_subnet_index) its subnet rules; the mapper
+        itself is not changed.
+        """
+        import pandas as pd
+
+        site_ids = pd.Series(None, index=df.index, dtype=object)
+        fields = {'user', 'device'} | set(self.prefixes) | {field for field, _p, _t in self.regexes}
+        for field in sorted(fields):
+            if field not in df.columns:
+                continue
+            todo = site_ids.isna()
+            if not todo.any():
+                break
+            values = df.loc[todo, field]
+            # One rule evaluation per distinct value.
+            lookup = {value: self.match_name(field, value, site_index) for value in values.dropna().unique()}
+            site_ids[todo] = values.map(lookup)
+
+        for index in (self.subnets, subnets):
+            todo = site_ids.isna()
+            if index is not None and len(index) and 'ip' in df.columns and todo.any():
+                site_ids[todo] = index.lookup_many(df.loc[todo, 'ip'].fillna(''))
+        return site_ids
+
+
+def _expand(template, match):
+    return re.sub(r'\{(\d+)\}', lambda m: match.group(int(m.group(1))) or '', template)
+
+
+def aggregate_site_metrics(df, site_ids):
+    """
+    Per-site median/p95 of latency and packet loss, median score and row count.
+    `df` has latency, packet_loss and zdx_score columns; unmapped rows are dropped.
+    Returns a DataFrame indexed by site_id.
+    """
+    import pandas as pd
+
+    frame = df.assign(site_id=site_ids).dropna(subset=['site_id'])
+    if frame.empty:
+        return pd.DataFrame(columns=[
+            'users', 'latency_median', 'latency_p95', 'loss_median', 'loss_p95', 'score_median'
+        ]).rename_axis('site_id')
+
+    grouped = frame.groupby('site_id')
+    result = pd.DataFrame({
+        'users': grouped.size(),
+        'latency_median': grouped['latency'].median(),
+        'latency_p95': grouped['latency'].quantile(0.95),
+        'loss_median': grouped['packet_loss'].median(),
+        'loss_p95': grouped['packet_loss'].quantile(0.95),
+        'score_median': grouped['zdx_score'].median(),
+    })
+    return result
@@ -0,0 +1,231 @@
+"""
+Fleet topology and shared-cause correlation.
+
+The topology maps every site to the upstream things it depends on:
+    circuit -> isp -> hub -> datacenter -> region
+loaded from TOPOLOGY_FILE (JSON object keyed by site_id), with the region taken from
+site_status when the file doesn't set one:
+    {"SITE-001": {"isp": "Comcast", "circuit": "CKT-1001", "hub": "HUB-EAST", "datacenter": "DC1"}}
+
+CorrelationEngine keeps, for every dependency node, how many of its sites are degraded.
+A site changing state touches only its own nodes (at most one per dimension), so a sweep
+costs O(changed sites). A node becomes an incident when at least `min_sites` sites and
+`min_fraction` of its sites are degraded at once. `incidents()` assigns each degraded site
+to one incident only, preferring the node that explains the largest share of its sites,
+then the most specific one, so 40 sites behind one ISP show as one incident rather than
+as 40 site rows plus their region.
+"""
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+
+# Most specific first; used to break ties between equally good explanations.
+DIMENSIONS = ('circuit', 'isp', 'hub', 'datacenter', 'region')
+DEGRADED_STATUSES = ('Poor', 'Critical')
+TOPOLOGY_FILE = os.getenv('TOPOLOGY_FILE', 'topology.json')
+
+
+def is_degraded(contribution):
+    """True for a site that is down or scoring Poor/Critical (see database/summary.py)."""
+    return contribution['wan_down'] or contribution['status'] in DEGRADED_STATUSES
+
+
+def degradation_onsets(session, flags):
+    """
+    When each currently degraded site became degraded: the latest transition into WAN DOWN
+    and into Poor/Critical health from site_events, taking the earlier of the two when both
+    are degraded now. `flags` is {site_id: {'wan': bool, 'health': bool}}.
+    """
+    from sqlalchemy import and_, func, or_
+    from database.db import SiteEvent
+
+    entered = or_(
+        and_(SiteEvent.kind == 'wan', SiteEvent.new_state == 'DOWN', SiteEvent.old_state != 'DOWN'),
+        and_(SiteEvent.kind == 'health', SiteEvent.new_state.in_(DEGRADED_STATUSES),
+             SiteEvent.old_state.notin_(DEGRADED_STATUSES)),
+    )
+    rows = session.query(SiteEvent.site_id, SiteEvent.kind, func.max(SiteEvent.timestamp)) \
+        .filter(entered).group_by(SiteEvent.site_id, SiteEvent.kind)
+    onsets = {}
+    for site_id, kind, timestamp in rows:
+        if timestamp is not None and flags.get(site_id, {}).get(kind):
+            onsets[site_id] = min(onsets.get(site_id, timestamp), timestamp)
+    return onsets
+
+
+class Topology:
+    """Site -> dependency nodes, and node -> member sites. A node is a (dimension, name) pair."""
+
+    def __init__(self):
+        self.site_nodes = {}
+        self.members = defaultdict(set)
+
+    def __len__(self):
+        return len(self.site_nodes)
+
+    def add(self, site_id, **dependencies):
+        """Sets the dependencies of a site, replacing any it had, e.g. add('S1', isp='Comcast')."""
+        for node in self.site_nodes.pop(site_id, ()):
+            self.members[node].discard(site_id)
+        nodes = tuple(
+            (dimension, str(dependencies[dimension])) for dimension in DIMENSIONS if dependencies.get(dimension)
+        )
+        self.site_nodes[site_id] = nodes
+        for node in nodes:
+            self.members[node].add(site_id)
+
+    def nodes_of(self, site_id):
+        return self.site_nodes.get(site_id, ())
+
+    def size(self, node):
+        return len(self.members.get(node, ()))
+
+    @classmethod
+    def from_file(cls, path=TOPOLOGY_FILE, regions=None):
+        """
+        Loads the topology file (missing file: no dependencies) and merges `regions`
+        ({site_id: region}) for sites whose entry has no region of its own.
+        """
+        entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                entries = json.load(f)
+        topology = cls()
+        for site_id in set(entries) | set(regions or {}):
+            dependencies = dict(entries.get(site_id) or {})
+            if not dependencies.get('region') and regions:
+                dependencies['region'] = regions.get(site_id)
+            topology.add(site_id, **dependencies)
+        return topology
+
+    @classmethod
+    def from_session(cls, session, path=TOPOLOGY_FILE):
+        """Topology file plus the regions recorded in site_status."""
+        from database.db import SiteStatus
+        regions = dict(session.query(SiteStatus.site_id, SiteStatus.region).filter(SiteStatus.region.isnot(None)))
+        return cls.from_file(path, regions=regions)
+
+
+class CorrelationEngine:
+    """
+    Usage:
+        engine = CorrelationEngine(Topology.from_session(session), min_sites=3, min_fraction=0.5)
+        opened = engine.observe('fmg', [(site_id, site_contribution(site)), ...])
+        engine.incidents()
+
+    The engine can also be added to a ChangeDetector's sinks, in which case it follows the
+    debounced wan/health transitions instead of raw sweeps. Build a new engine when the
+    topology changes.
+    """
+
+    def __init__(self, topology, min_sites=3, min_fraction=0.5):
+        self.topology = topology
+        self.min_sites = min_sites
+        self.min_fraction = min_fraction
+        self.flags = {}                    # site_id -> {'wan': bool, 'health': bool}
+        self.degraded = {}                 # site_id -> since
+        self.counts = defaultdict(int)     # node -> degraded member count
+        self.active = {}                   # node -> incident opened at
+        self._dirty = set()
+
+    def update(self, site_id, degraded, timestamp=None):
+        """Records one site's state; only a change touches the counters of its nodes."""
+        if degraded == (site_id in self.degraded):
+            return
+        if degraded:
+            self.degraded[site_id] = timestamp or datetime.utcnow()
+            delta = 1
+        else:
+            del self.degraded[site_id]
+            delta = -1
+        for node in self.topology.nodes_of(site_id):
+            self.counts[node] += delta
+            self._dirty.add(node)
+
+    def _is_incident(self, node):
+        degraded = self.counts.get(node, 0)
+        return degraded >= self.min_sites and degraded >= self.min_fraction * self.topology.size(node)
+
+    def refresh(self, timestamp=None):
+        """Re-evaluates the nodes touched since the last refresh. Returns (opened, closed) nodes."""
+        timestamp = timestamp or datetime.utcnow()
+        opened, closed = [], []
+        for node in self._dirty:
+            if self._is_incident(node):
+                if node not in self.active:
+                    self.active[node] = timestamp
+                    opened.append(node)
+            elif self.active.pop(node, None) is not None:
+                closed.append(node)
+        self._dirty.clear()
+        return opened, closed
+
+    def observe(self, source, sites, timestamp=None):
+        """Feeds a sweep of (site_id, contribution) pairs. Returns the nodes that became incidents."""
+        timestamp = timestamp or datetime.utcnow()
+        for site_id, contribution in sites:
+            self.flags[site_id] = {'wan': contribution['wan_down'], 'health': contribution['status'] in DEGRADED_STATUSES}
+            self.update(site_id, is_degraded(contribution), contribution.get('timestamp') or timestamp)
+        return self.refresh(timestamp)[0]
+
+    def seed(self, session):
+        """
+        Loads the current state of every site from site_status. A degraded site's `since`
+        is the onset recorded in site_events, or its last sample time if there is none.
+        """
+        from database.db import SiteStatus
+        from database.summary import site_contribution
+        self.observe('seed', ((site.site_id, site_contribution(site)) for site in session.query(SiteStatus)))
+        for site_id, onset in degradation_onsets(session, self.flags).items():
+            if site_id in self.degraded and onset < self.degraded[site_id]:
+                self.degraded[site_id] = onset
+
+    def emit(self, events):
+        """ChangeDetector sink: applies wan/health transitions and prints incidents that open or close."""
+        timestamp = None
+        for event in events:
+            if event['kind'] not in ('wan', 'health'):
+                continue
+            flags = self.flags.setdefault(event['site_id'], {'wan': False, 'health': False})
+            if event['kind'] == 'wan':
+                flags['wan'] = event['new_state'] == 'DOWN'
+            else:
+                flags['health'] = event['new_state'] in DEGRADED_STATUSES
+            timestamp = event['timestamp']
+            self.update(event['site_id'], flags['wan'] or flags['health'], timestamp)
+        opened, closed = self.refresh(timestamp)
+        for dimension, name in opened:
+            print(f"Incident opened: {dimension} {name} "
+                  f"({self.counts[(dimension, name)]}/{self.topology.size((dimension, name))} sites degraded)")
+        for dimension, name in closed:
+            print(f"Incident cleared: {dimension} {name}")
+
+    def incidents(self):
+        """
+        Active incidents, best explanation first, each degraded site listed under one incident:
+        [{'dimension', 'name', 'sites', 'degraded', 'total', 'fraction', 'since'}, ...]
+        `since` is when the earliest of the incident's sites became degraded.
+        """
+        candidates = sorted(
+            self.active,
+            key=lambda node: (-self.counts[node] / self.topology.size(node), DIMENSIONS.index(node[0]), node[1])
+        )
+        claimed = set()
+        incidents = []
+        for node in candidates:
+            sites = sorted(s for s in self.topology.members[node] if s in self.degraded and s not in claimed)
+            if len(sites) < self.min_sites:
+                continue
+            claimed.update(sites)
+            total = self.topology.size(node)
+            incidents.append({
+                'dimension': node[0],
+                'name': node[1],
+                'sites': sites,
+                'degraded': self.counts[node],
+                'total': total,
+                'fraction': round(self.counts[node] / total, 3),
+                'since': min(self.degraded[s] for s in sites),
+            })
+        return incidents
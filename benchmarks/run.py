@@ -0,0 +1,298 @@
+"""
+Benchmark runner for the collection, scoring, storage and dashboard load paths.
+
+Usage (from the project root):
+    python -m benchmarks.run                          # run everything, print a table
+    python -m benchmarks.run --only scoring db        # run a subset (substring match)
+    python -m benchmarks.run --save-baseline          # write benchmarks/baseline.json
+    python -m benchmarks.run --compare                # fail if slower than the baseline
+
+Every run writes a machine-readable result file (benchmarks/results/<timestamp>.json)
+so regressions can be tracked over time.
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+# Point the SQLite engine at a throwaway file before anything imports database.db.
+_TMP_DIR = tempfile.mkdtemp(prefix="netexp-bench-")
+atexit.register(shutil.rmtree, _TMP_DIR, ignore_errors=True)
+os.environ.setdefault("DB_FILE", os.path.join(_TMP_DIR, "bench.db"))
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DB_SIZES = (260, 2_600, 26_000)
+
+BENCHMARKS = []
+
+
+def benchmark(name, repeat=5, ops=1):
+    """Registers a benchmark. The decorated function does the setup and returns the callable to time."""
+    def decorator(func):
+        BENCHMARKS.append({"name": name, "func": func, "repeat": repeat, "ops": ops})
+        return func
+    return decorator
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+# --- Scoring ---
+
+def _random_metrics(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'wan_status': rng.random() > 0.02,
+            'lan_switch_status': rng.random() > 0.03,
+            'lan_ap_status': rng.random() > 0.03,
+            'latency_ms': rng.uniform(5, 300),
+            'packet_loss_pct': rng.uniform(0, 5),
+            'jitter_ms': rng.uniform(1, 40)
+        }
+        for _ in range(n)
+    ]
+
+
+@benchmark("scoring.calculate_score[10k]", ops=10_000)
+def bench_calculate_score():
+    from analysis.scoring import calculate_score
+    samples = _random_metrics(10_000)
+    return lambda: [calculate_score(m) for m in samples]
+
+
+@benchmark("scoring.calculate_scores[1M]", ops=1_000_000)
+def bench_calculate_scores():
+    import numpy as np
+    from analysis.scoring import calculate_scores
+    rng = np.random.default_rng(0)
+    n = 1_000_000
+    columns = (
+        rng.random(n) > 0.02, rng.random(n) > 0.03, rng.random(n) > 0.03,
+        rng.uniform(5, 300, n), rng.uniform(0, 5, n), rng.uniform(1, 40, n)
+    )
+    return lambda: calculate_scores(*columns)
+
+
+@benchmark("scoring.rolling_update[2600 sites x 10]", ops=26_000)
+def bench_rolling_update():
+    from analysis.rolling import RollingStats
+    samples = _random_metrics(26_000)
+    site_ids = [f"SITE-{i % 2600:04d}" for i in range(len(samples))]
+
+    def run():
+        stats = RollingStats(window=60)
+        for site_id, m in zip(site_ids, samples):
+            stats.update(site_id, m['latency_ms'], m['packet_loss_pct'], m['jitter_ms'])
+            stats.score(site_id)
+    return run
+
+
+# --- Collection ---
+
+def _collector_benchmark(num_devices, latency):
+    import logging
+    from src.collector import DataCollector
+    from utils.fmg_simulator import FMGSimulator
+
+    logging.getLogger("src").setLevel(logging.WARNING)
+    simulator = FMGSimulator(num_devices=num_devices, latency=latency).start()
+
+    def run():
+        collector = DataCollector(simulator.url, simulator.username, simulator.password)
+        try:
+            df = collector.fetch_all_data()
+        finally:
+            collector.close()
+        assert len(df) == num_devices, f"expected {num_devices} rows, got {len(df)}"
+
+    run.cleanup = simulator.stop
+    return run
+
+
+@benchmark("collector.fetch_all_data[260 devices, 0ms]", repeat=3, ops=260)
+def bench_collector_fast():
+    return _collector_benchmark(260, 0.0)
+
+
+@benchmark("collector.fetch_all_data[260 devices, 20ms]", repeat=3, ops=260)
+def bench_collector_latency():
+    return _collector_benchmark(260, float(os.getenv("BENCH_FMG_LATENCY", "0.02")))
+
+
+# --- Storage ---
+
+def _register_db_benchmarks():
+    for size in DB_SIZES:
+        def write(size=size):
+            from database.db import init_db
+            from utils.mock_data import generate_mock_data
+            init_db()
+            return lambda: _quiet(generate_mock_data, num_sites=size)
+
+        def write_bulk(size=size):
+            from database.db import init_db
+            from utils.mock_data import generate_fleet_history, write_fleet_history_db
+            init_db()
+            return lambda: _quiet(write_fleet_history_db, generate_fleet_history(num_sites=size, timesteps=1, seed=0))
+
+        def read(size=size):
+            from database.db import init_db, get_session, SiteStatus
+            from utils.mock_data import generate_mock_data
+            init_db()
+            _quiet(generate_mock_data, num_sites=size)
+
+            def run():
+                session = get_session()
+                try:
+                    [s.to_dict() for s in session.query(SiteStatus).all()]
+                finally:
+                    session.close()
+            return run
+
+        benchmark(f"db.write_orm[{size} sites]", repeat=3, ops=size)(write)
+        benchmark(f"db.write_bulk[{size} sites]", repeat=3, ops=size)(write_bulk)
+        benchmark(f"db.read[{size} sites]", repeat=5, ops=size)(read)
+
+
+def _quiet(func, *args, **kwargs):
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+_register_db_benchmarks()
+
+
+# --- Dashboard ---
+
+@benchmark("dashboard.load_data[2600 sites]", repeat=5, ops=2_600)
+def bench_load_data():
+    from database.db import init_db
+    from utils.mock_data import generate_mock_data
+    init_db()
+    _quiet(generate_mock_data, num_sites=2_600)
+
+    import logging
+    from dashboard.app import load_data
+    logging.getLogger("streamlit.runtime.caching.cache_data_api").setLevel(logging.ERROR)
+
+    def run():
+        load_data.clear()
+        df = load_data()
+        assert len(df) == 2_600
+    return run
+
+
+# --- Runner ---
+
+def run_benchmarks(selected=None, repeat=None):
+    results = []
+    for bench in BENCHMARKS:
+        if selected and not any(s in bench["name"] for s in selected):
+            continue
+
+        run = bench["func"]()
+        try:
+            timings = time_call(run, repeat or bench["repeat"])
+        finally:
+            cleanup = getattr(run, "cleanup", None)
+            if cleanup:
+                cleanup()
+
+        best = min(timings)
+        result = {
+            "name": bench["name"],
+            "repeat": len(timings),
+            "min_s": best,
+            "median_s": statistics.median(timings),
+            "mean_s": statistics.mean(timings),
+            "max_s": max(timings),
+            "ops": bench["ops"],
+            "ops_per_s": bench["ops"] / best if best else None,
+        }
+        results.append(result)
+        print(f"{result['name']:<48} min {best * 1000:10.2f} ms  median {result['median_s'] * 1000:10.2f} ms  "
+              f"{result['ops_per_s']:14,.0f} ops/s")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the benchmarks whose best time is more than `threshold` slower than the baseline's."""
+    previous = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result["name"])
+        if not base:
+            continue
+        # The minimum is the least noisy estimate of the true cost on a shared machine.
+        ratio = result["min_s"] / base["min_s"] if base["min_s"] else 1.0
+        marker = "REGRESSION" if ratio > 1 + threshold else "ok"
+        print(f"{result['name']:<48} {ratio:6.2f}x baseline  {marker}")
+        if ratio > 1 + threshold:
+            regressions.append(result["name"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Network Experience Dashboard benchmarks")
+    parser.add_argument("--only", nargs="*", help="Run only benchmarks whose name contains one of these strings")
+    parser.add_argument("--repeat", type=int, default=None, help="Override the repeat count of every benchmark")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Write results to {BASELINE_FILE}")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before flagging a regression (0.25 = 25%%)")
+    parser.add_argument("--output", help="Result file path (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.repeat)
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {BASELINE_FILE}")
+
+    if args.compare:
+        if not os.path.exists(BASELINE_FILE):
+            print("No baseline found. Run with --save-baseline first.")
+            return 1
+        with open(BASELINE_FILE) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,151 @@
 import time
 from playwright.sync_api import sync_playwright
 from database.db import get_session, SiteStatus, init_db
+from database.store import build_site_index, get_cursor, save_cursor, upsert_sites
+from database.subnets import get_subnet_index
+from analysis.events import detector_from_env
 from datetime import datetime
+from utils.metrics import MetricsRegistry, finish_run
+
+CURSOR_SOURCE = "faz_events"
+
+# Placeholder selectors for the FAZ log view: they are not taken from a live FortiAnalyzer and
+# must be checked against its markup before the scraper is used (see the README).
+LOG_ROW_SELECTOR = "table#log_list tbody tr"
+LOG_COLUMNS = {
+    "log_id": ".logid-column",
+    "timestamp": ".timestamp-column",
+    "device": ".device-column",
+    "srcip": ".srcip-column",
+    "message": ".message-column",
+}
+
+# Reads every row in one round trip instead of one inner_text() call per cell. Rows older
+# than the cursor are dropped in the browser (FAZ timestamps sort as strings).
+EXTRACT_ROWS_JS = """
+({selector, columns, since}) => {
+    const rows = [];
+    for (const tr of document.querySelectorAll(selector)) {
+        const row = {};
+        for (const [key, css] of Object.entries(columns)) {
+            const cell = tr.querySelector(css);
+            row[key] = cell ? cell.innerText.trim() : "";
+        }
+        if (!since || row.timestamp >= since) rows.push(row);
+    }
+    return rows;
+}
+"""
+
+# Message substrings -> WAN state they imply.
+WAN_MESSAGES = (("interface down", False), ("link down", False), ("interface up", True), ("link up", True))
+
+
+def log_id_key(log_id):
+    """Sort key for log ids: numeric ids compare as numbers (so "9" < "10"), others as strings."""
+    log_id = log_id or ""
+    return (0, int(log_id), "") if log_id.isdigit() else (1, 0, log_id)
+
+
+def after_cursor(timestamp, log_id, cursor):
+    last_timestamp, last_id = cursor
+    if last_timestamp is None:
+        return True
+    return (timestamp, log_id_key(log_id)) > (last_timestamp, log_id_key(last_id))
+
+
+def newest_position(rows, cursor=(None, None)):
+    """
+    The newest (timestamp, log_id) among `rows`, whatever their message, or `cursor` if no
+    row is newer. Saving it keeps non-WAN rows from being read again on the next run.
+    """
+    newest = cursor
+    for row in rows:
+        try:
+            timestamp = datetime.fromisoformat(row["timestamp"])
+        except (KeyError, ValueError):
+            continue
+        log_id = row.get("log_id") or ""
+        if after_cursor(timestamp, log_id, newest):
+            newest = (timestamp, log_id)
+    return newest
+
+
+def parse_event_rows(rows, cursor=(None, None)):
+    """
+    Turns raw table rows into events newer than `cursor` (last_timestamp, last_id), oldest
+    first. Rows with unparseable timestamps or irrelevant messages are skipped.
+    """
+    events = []
+    for row in rows:
+        try:
+            timestamp = datetime.fromisoformat(row["timestamp"])
+        except (KeyError, ValueError):
+            continue
+        log_id = row.get("log_id") or ""
+        if not after_cursor(timestamp, log_id, cursor):
+            continue
+
+        message = row.get("message", "").lower()
+        wan_status = next((state for needle, state in WAN_MESSAGES if needle in message), None)
+        if wan_status is None:
+            continue
+        events.append({
+            "log_id": log_id,
+            "timestamp": timestamp,
+            "device": row.get("device", ""),
+            "srcip": row.get("srcip", ""),
+            "message": row.get("message", ""),
+            "wan_status": wan_status,
+        })
+    events.sort(key=lambda e: (e["timestamp"], log_id_key(e["log_id"])))
+    return events
+
+
+def site_updates(events, site_index, subnet_index=None):
+    """
+    Resolves event devices to site ids through `site_index` (see build_site_index), falling
+    back to the source IP in `subnet_index` (see database/subnets.py), and keeps the latest
+    WAN state per site. Returns (site records, unmatched device names).
+    """
+    site_ids = [site_index.get(event["device"].lower()) for event in events]
+    if subnet_index is not None and len(subnet_index):
+        missing = [i for i, site_id in enumerate(site_ids) if site_id is None]
+        if missing:
+            resolved = subnet_index.lookup_many([events[i]["srcip"] for i in missing])
+            for i, site_id in zip(missing, resolved):
+                site_ids[i] = site_id
+
+    latest = {}
+    unmatched = set()
+    for event, site_id in zip(events, site_ids):
+        if site_id is None:
+            unmatched.add(event["device"])
+            continue
+        latest[site_id] = event
+    records = [{"site_id": site_id, "wan_status": e["wan_status"]} for site_id, e in latest.items()]
+    return records, unmatched
+
 
 class FAZScraper:
-    def __init__(self, url, username, password, headless=True):
+    def __init__(self, url, username, password, headless=True, detector=None):
         self.url = url
         self.username = username
         self.password = password
         self.headless = headless
+        # analysis.events.ChangeDetector for the written states; built from the environment if None.
+        self.detector = detector
+        self.metrics = MetricsRegistry()
 
     def run(self):
         """
         Main execution method: Login -> Scrape FAZ Logs -> Update DB (Event Based).
         """
         print(f"Starting FAZ Scraper for {self.url}...")
+        self.metrics = MetricsRegistry()
+        started_at = datetime.utcnow()
+        errors = 0
+        events = []
 
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=self.headless)
@@ -23,24 +154,30 @@ class FAZScraper:
 
             try:
                 # 1. Login
-                self._login(page)
+                with self.metrics.timer("faz_login_seconds"):
+                    self._login(page)
 
                 # 2. Navigate to Log View
-                self._navigate_to_logs(page)
+                with self.metrics.timer("faz_navigate_seconds"):
+                    self._navigate_to_logs(page)
 
                 # 3. Scrape Critical Events
-                events = self._scrape_events(page)
+                with self.metrics.timer("faz_scrape_seconds"):
+                    events, newest = self._scrape_events(page)
 
                 # 4. Update Database (mark sites as critical based on logs)
-                self._update_database(events)
+                with self.metrics.timer("db_commit_seconds"):
+                    self._update_database(events, newest)
 
                 print("FAZ Scraping completed successfully.")
 
             except Exception as e:
+                errors += 1
                 print(f"Error during FAZ scraping: {e}")
                 page.screenshot(path="faz_error.png")
             finally:
                 browser.close()
+                finish_run("faz", started_at, self.metrics, devices=len(events), errors=errors)
 
     def _login(self, page):
         """
@@ -77,46 +214,46 @@ class FAZScraper:
 
     def _scrape_events(self, page):
         """
-        Scrapes the event table for critical errors (e.g., 'interface down').
-        TODO: Inspect the log table rows.
+        Reads the event table in a single page.evaluate() call. Returns the events newer
+        than the stored cursor and the newest (timestamp, log_id) read.
         """
         print("Scraping events...")
-        events = []
+        session = get_session()
+        try:
+            cursor = get_cursor(session, CURSOR_SOURCE)
+        finally:
+            session.close()
 
-        # Example: Find all rows in the log table
-        # rows = page.query_selector_all("table#log_list tbody tr")
-
-        # for row in rows:
-        #     timestamp = row.query_selector(".timestamp-column").inner_text()
-        #     device = row.query_selector(".device-column").inner_text()
-        #     message = row.query_selector(".message-column").inner_text()
-        #
-        #     if "interface down" in message.lower():
-        #         events.append({
-        #             "device": device,
-        #             "message": message,
-        #             "timestamp": timestamp
-        #         })
-
-        print("TODO: Implement specific FAZ log table parsing logic.")
-        return events
-
-    def _update_database(self, events):
+        since = cursor[0].strftime("%Y-%m-%d %H:%M:%S") if cursor[0] else None
+        rows = page.evaluate(EXTRACT_ROWS_JS, {"selector": LOG_ROW_SELECTOR, "columns": LOG_COLUMNS, "since": since})
+        events = parse_event_rows(rows, cursor)
+        print(f"{len(rows)} row(s) read, {len(events)} new WAN event(s) since {since or 'the beginning'}.")
+        return events, newest_position(rows, cursor)
+
+    def _update_database(self, events, newest):
         """
-        Updates the SQLite database based on events.
+        Applies the latest WAN state per site from the events and advances the cursor to
+        the newest row read (WAN event or not), in one transaction.
         """
-        if not events:
-            print("No critical events found.")
+        if newest[0] is None:
+            print("No events found.")
             return
 
         session = get_session()
-        for event in events:
-            # Logic: If 'interface down' event is recent, mark site WAN status as DOWN.
-            # This requires parsing the timestamp and matching the device name.
-            pass
-
-        session.commit()
-        session.close()
+        try:
+            if events:
+                records, unmatched = site_updates(events, build_site_index(session), get_subnet_index(session))
+                if unmatched:
+                    print(f"{len(unmatched)} device(s) not matched to a site: {', '.join(sorted(unmatched)[:10])}")
+                # Only existing sites are in the index, so this never creates sites.
+                upsert_sites(records, session=session, source="faz",
+                             detector=self.detector or detector_from_env(debounce=1))
+            else:
+                print("No critical events found.")
+            save_cursor(session, CURSOR_SOURCE, newest[0], newest[1])
+            session.commit()
+        finally:
+            session.close()
 
 if __name__ == "__main__":
     # Example Usage
@@ -1,20 +1,34 @@
 import time
 from playwright.sync_api import sync_playwright
-from database.db import get_session, SiteStatus
+from database.db import get_session, SiteStatus, record_history
+from database.summary import apply_site_changes, site_contribution
+from database.store import upsert_sdwan_members
+from database.inventory import InventoryCache, inventory_scope
+from analysis.scoring import calculate_score
+from analysis.sdwan import HEALTH_CHECK, parse_health_check, site_wan_metrics
+from utils.metrics import MetricsRegistry, finish_run
 from datetime import datetime
 
 class FMGProxyCollector:
-    def __init__(self, fmg_url, fmg_user, fmg_pass, headless=True):
+    def __init__(self, fmg_url, fmg_user, fmg_pass, headless=True, adom="root", inventory=None):
         self.fmg_url = fmg_url
         self.fmg_user = fmg_user
         self.fmg_pass = fmg_pass
         self.headless = headless
+        self.adom = adom
+        # Shared with the API collectors: a fresh device list cached by any of them skips the scrape.
+        self.inventory = inventory or InventoryCache()
+        self.metrics = MetricsRegistry()
 
     def run(self):
         """
         Main execution method: Login to FMG -> Scrape Device List -> Iterate Devices via Proxy -> Update DB.
         """
         print(f"Starting FMG Proxy Collector for {self.fmg_url}...")
+        self.metrics = MetricsRegistry()
+        started_at = datetime.utcnow()
+        devices = []
+        errors = 0
 
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=self.headless)
@@ -23,25 +37,36 @@ class FMGProxyCollector:
 
             try:
                 # 1. Login to FMG
-                self._login_fmg(page)
-
-                # 2. Get List of Devices (scrape device manager table)
-                devices = self._get_device_list(page)
+                with self.metrics.timer("fmg_login_seconds"):
+                    self._login_fmg(page)
+
+                # 2. Get List of Devices (inventory cache, else scrape device manager table)
+                with self.metrics.timer("fmg_device_list_seconds"):
+                    scope = inventory_scope(self.fmg_url, self.adom)
+                    devices = self.inventory.cached(scope)
+                    if devices is None:
+                        devices = self._get_device_list(page)
+                        if devices:
+                            self.inventory.store(scope, devices)
 
                 # 3. Iterate Devices & Proxy Tunnel
                 for device in devices:
                     try:
-                        self._collect_via_proxy(context, device)
+                        with self.metrics.timer("fmg_proxy_call_seconds", device=device['name'], resource="gui"):
+                            self._collect_via_proxy(context, device)
                     except Exception as e:
+                        errors += 1
                         print(f"Error collecting data for device {device['name']}: {e}")
 
                 print("FMG Proxy Collection completed successfully.")
 
             except Exception as e:
+                errors += 1
                 print(f"Error during FMG Proxy Collection: {e}")
                 page.screenshot(path="fmg_proxy_error.png")
             finally:
                 browser.close()
+                finish_run("fmg_proxy", started_at, self.metrics, devices=len(devices), errors=errors)
 
     def _login_fmg(self, page):
         print("Logging in to FMG...")
@@ -103,14 +128,16 @@ class FMGProxyCollector:
             # 1. Check Interfaces (WAN Status)
             # page.click("text=Network")
             # page.click("text=Interfaces")
-            wan_status = True # Mock logic
-            latency = 0
-            loss = 0
-            jitter = 0
 
-            # Scrape WAN metrics if visible (e.g. SD-WAN Monitor)
-            # page.click("text=SD-WAN Status")
-            # ... scrape latency/jitter table ...
+            # SD-WAN health-check: one REST call through the same proxy tunnel instead of
+            # crawling the SD-WAN monitor widgets.
+            response = page.request.get(proxy_url.rstrip("/") + HEALTH_CHECK)
+            members = parse_health_check(response.json()) if response.ok else []
+            wan = site_wan_metrics(members)
+            wan_status = wan is not None or not members
+            latency = wan["latency_ms"] if wan else 0
+            loss = wan["packet_loss_pct"] if wan else 0
+            jitter = wan["jitter_ms"] if wan else 0
 
             # 2. Check Managed Switch/AP (LAN Status)
             # page.click("text=WiFi & Switch Controller")
@@ -118,14 +145,15 @@ class FMGProxyCollector:
             ap_status = True
 
             # Save to DB
-            self._update_db(device['name'], wan_status, sw_status, ap_status, latency, loss, jitter)
+            self._update_db(device['name'], wan_status, sw_status, ap_status, latency, loss, jitter, members)
 
         finally:
             page.close()
 
-    def _update_db(self, site_name, wan_status, sw_status, ap_status, latency, loss, jitter):
+    def _update_db(self, site_name, wan_status, sw_status, ap_status, latency, loss, jitter, members=None):
         session = get_session()
         site = session.query(SiteStatus).filter_by(site_name=site_name).first()
+        before = site_contribution(site)
 
         if not site:
             # Create new if doesn't exist (or log warning)
@@ -138,9 +166,23 @@ class FMGProxyCollector:
         site.latency_ms = latency
         site.packet_loss_pct = loss
         site.jitter_ms = jitter
+        with self.metrics.timer("scoring_seconds"):
+            site.zdx_score = calculate_score({
+                'wan_status': wan_status,
+                'lan_switch_status': sw_status,
+                'lan_ap_status': ap_status,
+                'latency_ms': latency,
+                'packet_loss_pct': loss,
+                'jitter_ms': jitter
+            })
         site.timestamp = datetime.utcnow()
+        if members:
+            upsert_sdwan_members(session, {site.site_id: members}, site.timestamp)
+        record_history(session, [site])
+        apply_site_changes(session, [(before, site_contribution(site))])
 
-        session.commit()
+        with self.metrics.timer("db_commit_seconds"):
+            session.commit()
         session.close()
         print(f"Updated DB for {site_name}")
 
@@ -1,20 +1,131 @@
+import re
 import time
 from playwright.sync_api import sync_playwright
-from database.db import get_session, SiteStatus, init_db
+from database.db import get_session, SiteStatus, ZdxSiteMetrics, init_db
+from database.store import build_site_index, upsert_sites
+from database.subnets import get_subnet_index
+from analysis.events import detector_from_env
 from datetime import datetime
+from utils.metrics import MetricsRegistry, finish_run
+
+# Placeholder selectors for the ZDX users grid: they are not taken from a live tenant and must
+# be checked against the portal's markup before the scraper is used (see the README).
+GRID_SELECTOR = "div.grid-body"          # scrollable container of the (virtualised) grid
+ROW_SELECTOR = "div.grid-row"
+ROW_KEY_ATTRIBUTE = "data-row-index"     # stable per-row id; the row text is used if missing
+GRID_COLUMNS = {
+    "user": ".user-name",
+    "device": ".device-name",
+    "ip": ".ip-address",
+    "zdx_score": ".score-value",
+    "latency": ".latency-value",         # e.g. "45 ms"
+    "packet_loss": ".packet-loss-value", # e.g. "0.5 %"
+}
+NEXT_PAGE_SELECTOR = "button.pagination-next:not([disabled])"
+
+# Serialises the rendered rows and scrolls the grid by one viewport in the same round trip.
+# Returns {rows, atEnd}; with virtual scrolling only the rows currently in the DOM are seen,
+# so the caller repeats until the grid stops scrolling.
+EXTRACT_AND_SCROLL_JS = """
+({grid, row, keyAttr, columns}) => {
+    const container = document.querySelector(grid);
+    const rows = [];
+    for (const el of document.querySelectorAll(row)) {
+        const item = {_key: el.getAttribute(keyAttr) || el.innerText};
+        for (const [key, css] of Object.entries(columns)) {
+            const cell = el.querySelector(css);
+            item[key] = cell ? cell.innerText.trim() : "";
+        }
+        rows.push(item);
+    }
+    let atEnd = true;
+    if (container) {
+        const before = container.scrollTop;
+        container.scrollTop = before + container.clientHeight;
+        atEnd = container.scrollTop === before;
+    }
+    return {rows, atEnd};
+}
+"""
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def parse_number(text):
+    """First number in a cell such as "45 ms" or "0.5 %", or None."""
+    match = _NUMBER.search(text or "")
+    return float(match.group()) if match else None
+
+
+def parse_metric_rows(rows):
+    """Converts raw grid rows (strings) into metric dicts. Rows without a user or device are skipped."""
+    metrics = []
+    for row in rows:
+        if not (row.get("user") or row.get("device")):
+            continue
+        metrics.append({
+            "user": row.get("user", ""),
+            "device": row.get("device", ""),
+            "ip": row.get("ip", ""),
+            "zdx_score": parse_number(row.get("zdx_score")),
+            "latency": parse_number(row.get("latency")),
+            "packet_loss": parse_number(row.get("packet_loss")),
+        })
+    return metrics
+
+
+def store_site_metrics(session, metrics_data, mapper=None, detector=None):
+    """
+    Maps ZDX rows to sites (analysis/site_mapping.py), aggregates them per site and writes
+    the medians to site_status plus the full aggregates to zdx_site_metrics, in one commit.
+    State changes go to `detector`, if given. Returns the per-site aggregates DataFrame.
+    """
+    import pandas as pd
+    from sqlalchemy import insert
+    from analysis.site_mapping import SiteMapper, aggregate_site_metrics
+
+    site_index = build_site_index(session)
+    mapper = mapper or SiteMapper.from_file()
+
+    df = pd.DataFrame(metrics_data)
+    # Registered site subnets (database/subnets.py) back up the configured subnet rules.
+    site_ids = mapper.map_frame(df, site_index=site_index, subnets=get_subnet_index(session))
+    # Rules may name sites that aren't in site_status; only known sites are written.
+    site_ids = site_ids.where(site_ids.isin(set(site_index.values())))
+    aggregates = aggregate_site_metrics(df, site_ids)
+    print(f"Mapped {int(site_ids.notna().sum())}/{len(df)} ZDX rows to {len(aggregates)} sites.")
+    if aggregates.empty:
+        return aggregates
+
+    now = datetime.utcnow()
+    rows = aggregates.reset_index()
+    rows = rows.astype(object).where(rows.notna(), None).assign(timestamp=now).to_dict("records")
+    session.execute(insert(ZdxSiteMetrics), rows)
+    upsert_sites([
+        {"site_id": row["site_id"], "latency_ms": row["latency_median"], "packet_loss_pct": row["loss_median"], "timestamp": now}
+        for row in rows
+    ], session=session, source="zdx", detector=detector)
+    return aggregates
 
 class ZDXScraper:
-    def __init__(self, url, username, password, headless=True):
+    def __init__(self, url, username, password, headless=True, detector=None):
         self.url = url
         self.username = username
         self.password = password
         self.headless = headless
+        # analysis.events.ChangeDetector for the written states; built from the environment if None.
+        self.detector = detector
+        self.metrics = MetricsRegistry()
 
     def run(self):
         """
         Main execution method: Login -> Scrape ZDX Dashboard -> Update DB.
         """
         print(f"Starting ZDX Scraper for {self.url}...")
+        self.metrics = MetricsRegistry()
+        started_at = datetime.utcnow()
+        errors = 0
+        metrics_data = []
 
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=self.headless)
@@ -23,24 +134,30 @@ class ZDXScraper:
 
             try:
                 # 1. Login
-                self._login(page)
+                with self.metrics.timer("zdx_login_seconds"):
+                    self._login(page)
 
                 # 2. Navigate to Users or Experience View
-                self._navigate_to_experience_view(page)
+                with self.metrics.timer("zdx_navigate_seconds"):
+                    self._navigate_to_experience_view(page)
 
                 # 3. Scrape Metrics
-                metrics_data = self._scrape_metrics(page)
+                with self.metrics.timer("zdx_scrape_seconds"):
+                    metrics_data = self._scrape_metrics(page)
 
                 # 4. Update Database
-                self._update_database(metrics_data)
+                with self.metrics.timer("db_commit_seconds"):
+                    self._update_database(metrics_data)
 
                 print("ZDX Scraping completed successfully.")
 
             except Exception as e:
+                errors += 1
                 print(f"Error during ZDX scraping: {e}")
                 page.screenshot(path="zdx_error.png")
             finally:
                 browser.close()
+                finish_run("zdx", started_at, self.metrics, devices=len(metrics_data), errors=errors)
 
     def _login(self, page):
         """
@@ -78,31 +195,47 @@ class ZDXScraper:
         page.wait_for_load_state("networkidle")
         time.sleep(5)
 
-    def _scrape_metrics(self, page):
+    def _scrape_metrics(self, page, max_pages=500, max_scrolls=1000, stall_retries=3):
         """
-        Scrapes latency, loss, and score from the table.
-        TODO: Inspect the table structure.
+        Scrapes latency, loss and score from every page of the grid. Each call to
+        EXTRACT_AND_SCROLL_JS reads all rendered rows at once, so a page costs one round trip
+        per viewport instead of several per row. A scroll that returns only rows already seen
+        (the grid is still rendering) is retried up to `stall_retries` times, waiting longer
+        each time, before the page is treated as finished.
         """
         print("Scraping ZDX metrics...")
-        metrics = []
-
-        # Example: Find all rows in the user table
-        # rows = page.query_selector_all("div.grid-row")
-
-        # for row in rows:
-        #     user = row.query_selector(".user-name").inner_text()
-        #     score = row.query_selector(".score-value").inner_text()
-        #     latency = row.query_selector(".latency-value").inner_text() # e.g., "45 ms"
-        #     loss = row.query_selector(".packet-loss-value").inner_text() # e.g., "0.5 %"
-        #
-        #     metrics.append({
-        #         "user": user,
-        #         "zdx_score": float(score),
-        #         "latency": float(latency.replace(" ms", "")),
-        #         "packet_loss": float(loss.replace(" %", ""))
-        #     })
-
-        print("TODO: Implement specific ZDX table row parsing logic.")
+        args = {"grid": GRID_SELECTOR, "row": ROW_SELECTOR, "keyAttr": ROW_KEY_ATTRIBUTE, "columns": GRID_COLUMNS}
+        rows = {}
+        round_trips = 0
+
+        for page_number in range(1, max_pages + 1):
+            stalled = 0
+            for _ in range(max_scrolls):
+                result = page.evaluate(EXTRACT_AND_SCROLL_JS, args)
+                round_trips += 1
+                new_rows = 0
+                for row in result["rows"]:
+                    key = (page_number, row.pop("_key"))
+                    if key not in rows:
+                        rows[key] = row
+                        new_rows += 1
+                if result["atEnd"]:
+                    break
+                stalled = 0 if new_rows else stalled + 1
+                if stalled > stall_retries:
+                    break
+                # Give the virtualised grid a moment to render the next rows.
+                page.wait_for_timeout(100 * (stalled + 1))
+
+            next_button = page.query_selector(NEXT_PAGE_SELECTOR)
+            if next_button is None:
+                break
+            next_button.click()
+            page.wait_for_load_state("networkidle")
+
+        metrics = parse_metric_rows(rows.values())
+        self.metrics.inc("zdx_evaluate_calls_total", round_trips)
+        print(f"Scraped {len(metrics)} ZDX rows in {round_trips} round trip(s).")
         return metrics
 
     def _update_database(self, metrics_data):
@@ -114,13 +247,10 @@ class ZDXScraper:
             return
 
         session = get_session()
-        for data in metrics_data:
-            # Map ZDX user/device to Site ID if possible.
-            # This mapping logic depends on how ZDX names users (e.g., "site-001-user").
-            pass
-
-        session.commit()
-        session.close()
+        try:
+            store_site_metrics(session, metrics_data, detector=self.detector or detector_from_env(debounce=1))
+        finally:
+            session.close()
 
 if __name__ == "__main__":
     # Example Usage
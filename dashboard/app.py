@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
-from database.db import get_session, SiteStatus, init_db
+from datetime import datetime, timedelta
 from analysis.scoring import get_health_status
 
 st.set_page_config(page_title="Network Experience Dashboard", layout="wide")
 
 @st.cache_data
 def load_data():
+    from database.db import get_session, SiteStatus
     session = get_session()
     # Check if table exists
     try:
@@ -18,6 +19,94 @@ def load_data():
         session.close()
     return pd.DataFrame(data)
 
+@st.cache_data(ttl=60)
+def load_summary():
+    """Fleet totals and per-region counters from the incrementally maintained summary tables."""
+    from database.db import get_session
+    from database.summary import get_fleet_summary, get_counters
+    session = get_session()
+    try:
+        return get_fleet_summary(session), get_counters(session, 'region_status')
+    except Exception:
+        return None, {}
+    finally:
+        session.close()
+
+@st.cache_data(ttl=30)
+def load_events(limit=50):
+    """Most recent site state transitions from the events table."""
+    from database.db import get_session, SiteEvent
+    session = get_session()
+    try:
+        rows = session.query(SiteEvent).order_by(SiteEvent.id.desc()).limit(limit).all()
+        return pd.DataFrame([{
+            'timestamp': e.timestamp, 'site_id': e.site_id, 'source': e.source,
+            'kind': e.kind, 'from': e.old_state, 'to': e.new_state
+        } for e in rows])
+    except Exception:
+        return pd.DataFrame()
+    finally:
+        session.close()
+
+@st.cache_data(ttl=60)
+def load_incidents():
+    """Shared-cause incidents: degraded sites grouped by ISP/circuit/hub/datacenter/region."""
+    from database.db import get_session
+    from analysis.topology import CorrelationEngine, Topology
+    session = get_session()
+    try:
+        engine = CorrelationEngine(Topology.from_session(session))
+        engine.seed(session)
+        return engine.incidents()
+    except Exception:
+        return []
+    finally:
+        session.close()
+
+@st.cache_resource(ttl=3600)
+def load_baselines():
+    """Per-site hour-of-week baselines from the nightly batch (None if not computed yet)."""
+    from analysis.baselines import Baselines
+    return Baselines.load()
+
+@st.cache_data(ttl=60)
+def load_site_trend(site_id, window):
+    """Downsampled score/latency/loss/jitter trend for one site (bounded number of points)."""
+    from database.trends import site_trend
+    try:
+        return site_trend(site_id, window)
+    except Exception:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=60)
+def load_fleet_recent_trend(window):
+    """Downsampled fleet-wide trend from history / the hourly summary table."""
+    from database.trends import fleet_trend
+    try:
+        return fleet_trend(window)
+    except Exception:
+        return pd.DataFrame()
+
+@st.cache_data(ttl=300)
+def load_sparklines():
+    """Last 24h of average score per site, in 24 buckets, for the table's trend column."""
+    from database.trends import site_sparklines
+    try:
+        return site_sparklines(hours=24, points=24)
+    except Exception:
+        return {}
+
+@st.cache_data(ttl=3600)
+def load_fleet_trend(days):
+    """Daily fleet aggregates from the Parquet snapshots (empty if none exported)."""
+    try:
+        from database.snapshot import fleet_daily_summary
+    except ImportError:
+        return pd.DataFrame()
+
+    end = datetime.utcnow()
+    return fleet_daily_summary(end - timedelta(days=days), end)
+
 def main():
     st.title("Network Experience Dashboard")
 
@@ -27,6 +116,7 @@ def main():
     if df.empty:
         st.warning("No data found. Please generate mock data or run collectors.")
         if st.button("Generate Mock Data"):
+            from database.db import init_db
             from utils.mock_data import generate_mock_data
             init_db()
             generate_mock_data()
@@ -37,12 +127,18 @@ def main():
     if 'health_status' not in df.columns:
         df['health_status'] = df['zdx_score'].apply(get_health_status)
 
-    # Summary Metrics
-    total_sites = len(df)
-    critical_sites = len(df[df['health_status'] == 'Critical'])
-    poor_sites = len(df[df['health_status'] == 'Poor'])
-    good_sites = len(df[df['health_status'].isin(['Good', 'Excellent'])])
-    avg_score = df['zdx_score'].mean()
+    # Summary Metrics (from the pre-aggregated summary row, falling back to the DataFrame)
+    summary, region_counts = load_summary()
+    if summary and summary['total_sites']:
+        total_sites = summary['total_sites']
+        critical_sites = summary['critical']
+        good_sites = summary['healthy']
+        avg_score = summary['avg_score']
+    else:
+        total_sites = len(df)
+        critical_sites = len(df[df['health_status'] == 'Critical'])
+        good_sites = len(df[df['health_status'].isin(['Good', 'Excellent'])])
+        avg_score = df['zdx_score'].mean()
 
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total Sites", total_sites)
@@ -50,6 +146,36 @@ def main():
     col3.metric("Critical Issues", critical_sites, delta_color="inverse")
     col4.metric("Healthy Sites", good_sites)
 
+    if region_counts:
+        with st.expander("Sites by Region"):
+            region_df = pd.Series(region_counts).rename_axis('key').reset_index(name='sites')
+            region_df[['region', 'status']] = region_df['key'].str.split('|', n=1, expand=True)
+            st.dataframe(
+                region_df.pivot(index='region', columns='status', values='sites').fillna(0).astype(int),
+                use_container_width=True
+            )
+
+    events_df = load_events()
+    if not events_df.empty:
+        with st.expander(f"Recent Events ({len(events_df)})"):
+            st.dataframe(events_df, use_container_width=True, hide_index=True)
+
+    with st.expander("Fleet Trend"):
+        fleet_window = st.radio("Range", ["1h", "24h", "7d", "30d"], index=1, horizontal=True, key="fleet_window")
+        fleet_df = load_fleet_recent_trend(fleet_window)
+        if fleet_df.empty:
+            st.info("No history recorded in this range yet.")
+        else:
+            st.line_chart(fleet_df[['score']])
+
+    with st.expander("Fleet Trend (Daily Snapshots)"):
+        trend_days = st.selectbox("Window", [7, 30, 90], index=1, format_func=lambda d: f"Last {d} days")
+        trend_df = load_fleet_trend(trend_days)
+        if trend_df.empty:
+            st.info("No snapshots exported yet. Run `python3 main.py --mode snapshot`.")
+        else:
+            st.line_chart(trend_df[['avg_score', 'min_score']])
+
     st.markdown("---")
 
     # Filters
@@ -70,6 +196,21 @@ def main():
             filtered_df['site_name'].str.contains(search_term, case=False)
         ]
 
+    # Shared-cause incidents, above the individual site rows
+    incidents = load_incidents()
+    if incidents:
+        st.subheader(f"Active Incidents ({len(incidents)})")
+        for incident in incidents:
+            with st.expander(
+                f"🔴 {incident['dimension'].upper()} {incident['name']}: {incident['degraded']} of "
+                f"{incident['total']} sites degraded since {incident['since']:%Y-%m-%d %H:%M}"
+            ):
+                st.dataframe(
+                    df[df['site_id'].isin(incident['sites'])][['site_id', 'site_name', 'health_status', 'zdx_score', 'wan_status']],
+                    use_container_width=True,
+                    hide_index=True
+                )
+
     # Main Table
     st.subheader("Site Overview")
 
@@ -81,10 +222,15 @@ def main():
         st.markdown("Try adjusting your filters or search term.")
         return
 
+    table_df = filtered_df[['site_id', 'site_name', 'health_status', 'zdx_score', 'wan_status', 'lan_switch_status', 'lan_ap_status']]
+    sparklines = load_sparklines()
+    if sparklines:
+        table_df = table_df.assign(trend=table_df['site_id'].map(sparklines))
     st.dataframe(
-        filtered_df[['site_id', 'site_name', 'health_status', 'zdx_score', 'wan_status', 'lan_switch_status', 'lan_ap_status']],
+        table_df,
         use_container_width=True,
-        hide_index=True
+        hide_index=True,
+        column_config={"trend": st.column_config.LineChartColumn("Score (24h)", y_min=0, y_max=100)}
     )
 
     # Detail View
@@ -134,6 +280,13 @@ def main():
             # Diagnostic Logic
             st.write("#### Automated Root Cause Analysis")
             issues = []
+            incident = next((i for i in incidents if selected_site_id in i['sites']), None)
+            if incident:
+                st.error(
+                    f"🔴 **Shared cause**: {incident['degraded']} of {incident['total']} sites on "
+                    f"{incident['dimension']} {incident['name']} are degraded. Investigate the {incident['dimension']} first."
+                )
+                issues.append("Shared Incident")
             if wan_status_str == 'DOWN':
                 st.error("🔴 **CRITICAL**: WAN Link is down. Check ISP or FortiGate interface.")
                 issues.append("WAN Down")
@@ -151,8 +304,32 @@ def main():
                 st.error("🔴 **WIFI**: Access Point is unreachable. Check PoE or switch port.")
                 issues.append("AP Down")
 
+            baselines = load_baselines()
+            zscores = baselines.zscores(
+                selected_site_id, pd.Timestamp(site_row['timestamp']).to_pydatetime(),
+                latency_ms=site_row['latency_ms'], packet_loss_pct=site_row['packet_loss_pct'], jitter_ms=site_row['jitter_ms']
+            ) if baselines is not None and pd.notna(site_row['timestamp']) else None
+            for metric, label in (('latency_ms', 'Latency'), ('packet_loss_pct', 'Packet loss'), ('jitter_ms', 'Jitter')):
+                z = (zscores or {}).get(metric)
+                if z is not None and z >= 3:
+                    st.warning(f"🟠 **Unusual**: {label} is worse than usual for this site at this hour (z={z:.1f}).")
+                    issues.append(f"Unusual {label}")
+
             if not issues:
                 st.info("✅ No significant issues detected.")
 
+        st.write("#### Trend")
+        site_window = st.radio("Range", ["1h", "24h", "7d", "30d"], index=1, horizontal=True, key="site_window")
+        trend_df = load_site_trend(selected_site_id, site_window)
+        if trend_df.empty:
+            st.info("No history recorded for this site in this range.")
+        else:
+            t1, t2 = st.columns(2)
+            t1.line_chart(trend_df[['score', 'score_min', 'score_max']])
+            t2.line_chart(trend_df[['latency_ms', 'latency_max']])
+            t3, t4 = st.columns(2)
+            t3.line_chart(trend_df[['packet_loss_pct', 'packet_loss_max']])
+            t4.line_chart(trend_df[['jitter_ms', 'jitter_max']])
+
 if __name__ == "__main__":
     main()
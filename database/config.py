@@ -0,0 +1,4 @@
+import os
+
+# Kept free of heavy imports so health checks can locate the database cheaply.
+DB_FILE = os.getenv('DB_FILE', 'network_dashboard.db')
@@ -1,24 +1,42 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, Float, Boolean, DateTime, Text, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
 
+from database.config import DB_FILE
+
 # Create the SQLite database file
-DB_FILE = 'network_dashboard.db'
 if os.path.exists(DB_FILE):
     # For now, we don't want to wipe the db every time, but for dev it's okay if needed.
     pass
 
-engine = create_engine(f'sqlite:///{DB_FILE}', echo=False)
+# The engine and session factory are created on first use, so importing this module
+# (e.g. for the models) does not open the database.
+_engine = None
+_Session = None
 Base = declarative_base()
 
+def get_engine():
+    """Returns the shared SQLAlchemy engine, creating it on first use."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(f'sqlite:///{DB_FILE}', echo=False)
+    return _engine
+
+def __getattr__(name):
+    # Backwards compatibility for `from database.db import engine`.
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class SiteStatus(Base):
     __tablename__ = 'site_status'
 
     id = Column(Integer, primary_key=True)
     site_id = Column(String, unique=True, nullable=False)
     site_name = Column(String, nullable=False)
+    region = Column(String, nullable=True)
 
     # WAN Metrics (from FortiManager/FortiGate)
     wan_status = Column(Boolean, default=True) # True = UP, False = DOWN
@@ -40,6 +58,7 @@ class SiteStatus(Base):
         return {
             'site_id': self.site_id,
             'site_name': self.site_name,
+            'region': self.region,
             'wan_status': 'UP' if self.wan_status else 'DOWN',
             'latency_ms': self.latency_ms,
             'packet_loss_pct': self.packet_loss_pct,
@@ -50,11 +69,204 @@ class SiteStatus(Base):
             'timestamp': self.timestamp
         }
 
+class SiteStatusHistory(Base):
+    """Append-only history of SiteStatus samples (one row per site per collection)."""
+    __tablename__ = 'site_status_history'
+    # Per-site range scans (trend charts) read one contiguous slice of this index.
+    __table_args__ = (Index('ix_site_status_history_site_time', 'site_id', 'timestamp'),)
+
+    id = Column(Integer, primary_key=True)
+    site_id = Column(String, nullable=False, index=True)
+
+    wan_status = Column(Boolean, default=True)
+    latency_ms = Column(Float, default=0.0)
+    packet_loss_pct = Column(Float, default=0.0)
+    jitter_ms = Column(Float, default=0.0)
+    lan_switch_status = Column(Boolean, default=True)
+    lan_ap_status = Column(Boolean, default=True)
+    zdx_score = Column(Float, default=0.0)
+
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+    @classmethod
+    def from_site(cls, site):
+        """Builds a history sample from a SiteStatus row."""
+        return cls(
+            site_id=site.site_id,
+            wan_status=site.wan_status,
+            latency_ms=site.latency_ms,
+            packet_loss_pct=site.packet_loss_pct,
+            jitter_ms=site.jitter_ms,
+            lan_switch_status=site.lan_switch_status,
+            lan_ap_status=site.lan_ap_status,
+            zdx_score=site.zdx_score,
+            timestamp=site.timestamp or datetime.utcnow()
+        )
+
+class FleetSummary(Base):
+    """
+    Single-row, incrementally maintained fleet totals.
+    Updated in the same transaction as the site writes (see database/summary.py).
+    """
+    __tablename__ = 'fleet_summary'
+
+    id = Column(Integer, primary_key=True)
+    total_sites = Column(Integer, default=0)
+    score_sum = Column(Float, default=0.0)
+    wan_down = Column(Integer, default=0)
+    switch_down = Column(Integer, default=0)
+    ap_down = Column(Integer, default=0)
+    excellent = Column(Integer, default=0)
+    good = Column(Integer, default=0)
+    fair = Column(Integer, default=0)
+    poor = Column(Integer, default=0)
+    critical = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class FleetCounter(Base):
+    """Site counts per dimension value, e.g. ('status', 'Critical') or ('region', 'EMEA')."""
+    __tablename__ = 'fleet_counter'
+    __table_args__ = (UniqueConstraint('dimension', 'key'),)
+
+    id = Column(Integer, primary_key=True)
+    dimension = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    count = Column(Integer, default=0)
+
+class FleetSummaryHourly(Base):
+    """Per-hour roll-up of every site sample written."""
+    __tablename__ = 'fleet_summary_hourly'
+
+    hour = Column(DateTime, primary_key=True)
+    samples = Column(Integer, default=0)
+    score_sum = Column(Float, default=0.0)
+    critical_samples = Column(Integer, default=0)
+    wan_down_samples = Column(Integer, default=0)
+
+class CollectionRun(Base):
+    """One row per collector run with per-stage timing percentiles (see utils/metrics.py)."""
+    __tablename__ = 'collection_runs'
+
+    id = Column(Integer, primary_key=True)
+    collector = Column(String, nullable=False, index=True)
+    started_at = Column(DateTime, nullable=False, index=True)
+    finished_at = Column(DateTime)
+    duration_s = Column(Float)
+    devices = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    stages = Column(Text)           # JSON: {stage: {count, sum, max, p50, p95, p99}}
+    slowest_devices = Column(Text)  # JSON: [{device, seconds}, ...]
+
+class SiteEvent(Base):
+    """Debounced per-site state transitions emitted by analysis/events.py."""
+    __tablename__ = 'site_events'
+
+    id = Column(Integer, primary_key=True)
+    site_id = Column(String, nullable=False, index=True)
+    source = Column(String, nullable=False)  # fmg, zdx, faz
+    kind = Column(String, nullable=False)    # wan, health, switch, ap
+    old_state = Column(String)
+    new_state = Column(String, nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ZdxSiteMetrics(Base):
+    """Per-site aggregate of one ZDX scrape (see analysis/site_mapping.py)."""
+    __tablename__ = 'zdx_site_metrics'
+
+    id = Column(Integer, primary_key=True)
+    site_id = Column(String, nullable=False, index=True)
+    users = Column(Integer, default=0)
+    latency_median = Column(Float)
+    latency_p95 = Column(Float)
+    loss_median = Column(Float)
+    loss_p95 = Column(Float)
+    score_median = Column(Float)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+class SdwanMember(Base):
+    """Latest SD-WAN health-check measurement per site, health check and member interface."""
+    __tablename__ = 'sdwan_members'
+    __table_args__ = (UniqueConstraint('site_id', 'health_check', 'member'),)
+
+    id = Column(Integer, primary_key=True)
+    site_id = Column(String, nullable=False, index=True)
+    health_check = Column(String, nullable=False)
+    member = Column(String, nullable=False)
+    status = Column(Boolean, default=True)  # True = UP
+    latency_ms = Column(Float, default=0.0)
+    jitter_ms = Column(Float, default=0.0)
+    packet_loss_pct = Column(Float, default=0.0)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+class SiteSubnet(Base):
+    """IPv4 subnets belonging to a site, for attributing IPs to sites (see database/subnets.py)."""
+    __tablename__ = 'site_subnets'
+
+    id = Column(Integer, primary_key=True)
+    site_id = Column(String, nullable=False, index=True)
+    cidr = Column(String, nullable=False, unique=True)
+    source = Column(String, default='manual')  # manual, fmg
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DeviceInventory(Base):
+    """Cached FMG device list per FMG/ADOM scope, so sweeps don't re-list devices (see database/inventory.py)."""
+    __tablename__ = 'device_inventory'
+    __table_args__ = (UniqueConstraint('scope', 'name'),)
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False, index=True)  # <fmg url>/<adom>
+    name = Column(String, nullable=False)
+    serial = Column(String)
+    data = Column(Text, nullable=False)  # JSON: the dvmdb device object
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class IngestCursor(Base):
+    """High-water mark per incremental source (e.g. FAZ event logs), so each run only reads new rows."""
+    __tablename__ = 'ingest_cursors'
+
+    source = Column(String, primary_key=True)
+    last_timestamp = Column(DateTime)
+    last_id = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def add_missing_columns(engine):
+    """
+    Adds nullable columns introduced since a table was created (e.g. site_status.region),
+    since create_all never alters existing tables. Returns the added "table.column" names.
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
 def init_db():
-    """Initializes the database, creating tables if they don't exist."""
+    """Initializes the database, creating tables and indexes if they don't exist."""
+    engine = get_engine()
     Base.metadata.create_all(engine)
+    for column in add_missing_columns(engine):
+        print(f"Added missing column {column}")
+    # create_all skips tables that already exist, so add indexes introduced since then.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session():
     """Returns a new SQLAlchemy session."""
-    Session = sessionmaker(bind=engine)
-    return Session()
+    global _Session
+    if _Session is None:
+        _Session = sessionmaker(bind=get_engine())
+    return _Session()
+
+def record_history(session, sites):
+    """Appends a history sample for each SiteStatus row. The caller commits."""
+    session.add_all([SiteStatusHistory.from_site(site) for site in sites])
@@ -0,0 +1,125 @@
+"""
+Persistent FMG device inventory cache.
+
+The managed device list rarely changes, but every sweep used to start by pulling the full
+dvmdb device objects. InventoryCache keeps the list in `device_inventory`, one row per
+device per scope (FMG URL + ADOM), with the fetch time and a fingerprint of the
+(name, serial) pairs stored as the scope's IngestCursor.
+
+While the cache is younger than the TTL, a sweep only asks FMG for name, sn and
+conn_status. If the fingerprint of that list matches, the cached devices are reused with
+the fresh conn_status merged in; otherwise, or once the TTL expires, the full list is
+fetched and stored. All collectors share the same rows.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from database.db import get_session, DeviceInventory
+from database.store import get_cursor, save_cursor
+
+INVENTORY_TTL = int(os.getenv('INVENTORY_TTL', '3600'))
+STATE_FIELDS = ['name', 'sn', 'conn_status']
+
+
+def inventory_scope(url, adom):
+    return f"{url.rstrip('/')}/{adom}"
+
+
+def fingerprint(devices):
+    """Order-independent hash of the (name, serial) pairs of a device list."""
+    pairs = sorted((str(d.get('name')), str(d.get('sn'))) for d in devices)
+    return hashlib.sha1(json.dumps(pairs).encode()).hexdigest()
+
+
+def load_inventory(session, scope):
+    """Returns (devices, fetched_at, fingerprint); ([], None, None) if the scope was never cached."""
+    fetched_at, digest = get_cursor(session, f'inventory:{scope}')
+    rows = session.query(DeviceInventory.data).filter(DeviceInventory.scope == scope).order_by(DeviceInventory.name)
+    return [json.loads(data) for (data,) in rows], fetched_at, digest
+
+
+def save_inventory(session, scope, devices, now=None):
+    """Replaces the cached devices of `scope`. The caller commits."""
+    now = now or datetime.utcnow()
+    session.query(DeviceInventory).filter(DeviceInventory.scope == scope).delete()
+    rows = [{
+        'scope': scope, 'name': d.get('name'), 'serial': d.get('sn'),
+        'data': json.dumps(d), 'updated_at': now,
+    } for d in devices if d.get('name')]
+    if rows:
+        session.execute(insert(DeviceInventory), rows)
+    save_cursor(session, f'inventory:{scope}', now, fingerprint(devices))
+
+
+class InventoryCache:
+    """
+    Usage:
+        inventory = InventoryCache(ttl=3600)
+        devices = inventory.devices(client, adom)   # client: a logged-in FMGClient
+
+    Database errors are printed and fall back to listing devices from FMG directly.
+    """
+
+    def __init__(self, ttl=INVENTORY_TTL, clock=datetime.utcnow):
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, fetched_at):
+        return fetched_at is not None and self.clock() - fetched_at < timedelta(seconds=self.ttl)
+
+    def cached(self, scope):
+        """Cached devices of `scope` if younger than the TTL, else None (no FMG call)."""
+        session = get_session()
+        try:
+            devices, fetched_at, _digest = load_inventory(session, scope)
+        except SQLAlchemyError as e:
+            print(f"Device inventory cache unavailable: {e}")
+            return None
+        finally:
+            session.close()
+        return devices if devices and self._fresh(fetched_at) else None
+
+    def store(self, scope, devices):
+        session = get_session()
+        try:
+            save_inventory(session, scope, devices, now=self.clock())
+            session.commit()
+        except SQLAlchemyError as e:
+            session.rollback()
+            print(f"Could not cache the device inventory: {e}")
+        finally:
+            session.close()
+
+    def devices(self, client, adom="root"):
+        """Device list of `adom`, from the cache when FMG reports the same devices."""
+        scope = inventory_scope(client.base_url, adom)
+        session = get_session()
+        try:
+            cached, fetched_at, digest = load_inventory(session, scope)
+        except SQLAlchemyError as e:
+            print(f"Device inventory cache unavailable: {e}")
+            cached, fetched_at, digest = [], None, None
+        finally:
+            session.close()
+
+        if cached and self._fresh(fetched_at):
+            states = client.get_managed_devices(adom, fields=STATE_FIELDS)
+            if states and fingerprint(states) == digest:
+                conn_status = {s.get('name'): s.get('conn_status') for s in states}
+                for device in cached:
+                    device['conn_status'] = conn_status.get(device.get('name'), device.get('conn_status'))
+                self.hits += 1
+                return cached
+
+        self.misses += 1
+        devices = client.get_managed_devices(adom)
+        if devices:
+            self.store(scope, devices)
+        return devices
@@ -0,0 +1,184 @@
+"""
+Re-scoring of stored history after a change to analysis/scoring.py.
+
+`site_status_history` is split into id ranges by keyset pagination on the primary key
+(no OFFSET over the whole table, no ORM objects). Each range is read and scored by a
+worker process with the vectorized calculate_scores, and only rows whose score changed
+come back. The parent writes them with one bulk UPDATE per range, applies the matching
+deltas to the hourly fleet roll-up and moves a checkpoint in the same transaction, so an
+interrupted run resumes after the last range written.
+
+Days already exported to Parquet snapshots and pruned from SQLite are not rewritten.
+"""
+import concurrent.futures
+import os
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import func, select, text, update
+
+from analysis.scoring import calculate_scores
+from database.db import get_engine, get_session, SiteStatus, SiteStatusHistory, IngestCursor
+from database.store import get_cursor, save_cursor
+from database.summary import add_hourly_samples, rebuild_summary
+
+CHECKPOINT = 'rescore'
+RANGE_SQL = """
+    SELECT id, strftime('%Y-%m-%d %H:00:00', timestamp) AS hour, wan_status, lan_switch_status,
+           lan_ap_status, latency_ms, packet_loss_pct, jitter_ms, zdx_score
+    FROM site_status_history
+    WHERE id > :start AND id <= :end
+"""
+UPDATE_SQL = "UPDATE site_status_history SET zdx_score = ? WHERE id = ?"
+
+
+def id_ranges(connection, after_id, chunk_size):
+    """Yields (start, end] id ranges of at most `chunk_size` rows, walking the primary key."""
+    boundary = text("SELECT id FROM site_status_history WHERE id > :after ORDER BY id LIMIT 1 OFFSET :skip")
+    last = text("SELECT max(id) FROM site_status_history")
+    start = after_id
+    while True:
+        end = connection.execute(boundary, {'after': start, 'skip': chunk_size - 1}).scalar()
+        if end is None:
+            end = connection.execute(last).scalar()
+            if end is not None and end > start:
+                yield start, end
+            return
+        yield start, end
+        start = end
+
+
+def score_rows(rows):
+    """
+    Scores rows of RANGE_SQL. Returns (ids, scores, hourly) for the rows whose score changed,
+    where hourly is {hour string: {'score_sum': delta, 'critical_samples': delta}}.
+    """
+    import numpy as np
+    import pandas as pd
+
+    if not rows:
+        return [], [], {}
+    df = pd.DataFrame(rows, columns=[
+        'id', 'hour', 'wan_status', 'lan_switch_status', 'lan_ap_status',
+        'latency_ms', 'packet_loss_pct', 'jitter_ms', 'zdx_score'
+    ])
+    # Same defaults as calculate_score: a missing WAN status is down, missing LAN devices are up.
+    flags = df[['wan_status']].fillna(False).join(df[['lan_switch_status', 'lan_ap_status']].fillna(True)).astype(bool)
+    metrics = df[['latency_ms', 'packet_loss_pct', 'jitter_ms']].fillna(0.0)
+    scores = calculate_scores(
+        flags['wan_status'], flags['lan_switch_status'], flags['lan_ap_status'],
+        metrics['latency_ms'], metrics['packet_loss_pct'], metrics['jitter_ms']
+    )
+    old = df['zdx_score'].fillna(0.0).to_numpy()
+    changed = ~np.isclose(scores, old)
+    if not changed.any():
+        return [], [], {}
+
+    deltas = pd.DataFrame({
+        'hour': df['hour'][changed].to_numpy(),
+        'score_sum': scores[changed] - old[changed],
+        'critical_samples': (scores[changed] <= 0).astype(int) - (old[changed] <= 0).astype(int),
+    }).groupby('hour').sum()
+    hourly = {
+        hour: {'score_sum': float(row['score_sum']), 'critical_samples': int(row['critical_samples'])}
+        for hour, row in deltas.iterrows()
+    }
+    return df['id'][changed].tolist(), scores[changed].tolist(), hourly
+
+
+def score_range(db_path, start, end):
+    """
+    Worker: reads one id range through its own read-only connection and scores it.
+    Returns (end, rows read, changed ids, new scores, hourly deltas).
+    """
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=60)
+    try:
+        rows = connection.execute(RANGE_SQL, {'start': start, 'end': end}).fetchall()
+    finally:
+        connection.close()
+    return end, len(rows), *score_rows(rows)
+
+
+def _write_range(session, end, _rows, ids, scores, hourly):
+    if ids:
+        # Plain executemany on the DB-API cursor: ORM bulk updates cost more than the scoring itself.
+        session.connection().exec_driver_sql(UPDATE_SQL, list(zip(scores, ids)))
+        add_hourly_samples(session, {datetime.fromisoformat(hour): delta for hour, delta in hourly.items()})
+    save_cursor(session, CHECKPOINT, datetime.utcnow(), str(end))
+    session.commit()
+
+
+def rescore_current(session):
+    """Re-scores the latest state of every site and rebuilds the fleet summary from it."""
+    sites = session.query(
+        SiteStatus.id, SiteStatus.wan_status, SiteStatus.lan_switch_status, SiteStatus.lan_ap_status,
+        SiteStatus.latency_ms, SiteStatus.packet_loss_pct, SiteStatus.jitter_ms
+    ).all()
+    if not sites:
+        return 0
+    ids, wan, switch, ap, latency, loss, jitter = zip(*sites)
+    scores = calculate_scores(
+        [bool(w) for w in wan], [s is not False for s in switch], [a is not False for a in ap],
+        [v or 0.0 for v in latency], [v or 0.0 for v in loss], [v or 0.0 for v in jitter]
+    )
+    session.execute(update(SiteStatus), [{'id': i, 'zdx_score': float(s)} for i, s in zip(ids, scores)])
+    rebuild_summary(session)
+    session.commit()
+    return len(sites)
+
+
+def rescore_history(workers=None, chunk_size=50_000, restart=False, progress=print):
+    """
+    Re-scores all of site_status_history, then site_status. Resumes from the checkpoint of an
+    interrupted run unless `restart`. `workers` <= 1 (or an in-memory database) scores in this
+    process. Returns {'rows', 'changed', 'sites', 'seconds'}.
+    """
+    engine = get_engine()
+    db_path = engine.url.database
+    inline = (workers is not None and workers <= 1) or not db_path or db_path == ':memory:'
+    session = get_session()
+    started = time.perf_counter()
+    rows_done = changed = 0
+    try:
+        checkpoint = get_cursor(session, CHECKPOINT)[1]
+        after_id = 0 if restart or checkpoint is None else int(checkpoint)
+        if after_id:
+            progress(f"Resuming after history id {after_id}.")
+        total = session.scalar(select(func.count()).select_from(SiteStatusHistory).where(SiteStatusHistory.id > after_id))
+
+        def write(result):
+            nonlocal rows_done, changed
+            _write_range(session, *result)
+            rows_done += result[1]
+            changed += len(result[2])
+            elapsed = time.perf_counter() - started
+            progress(f"Rescored {rows_done:,}/{total:,} rows ({100 * rows_done / max(total, 1):.0f}%), "
+                     f"{changed:,} changed, {rows_done / max(elapsed, 1e-9):,.0f} rows/s")
+
+        with engine.connect() as reader:
+            ranges = id_ranges(reader, after_id, chunk_size)
+            if inline:
+                for start, end in ranges:
+                    rows = reader.execute(text(RANGE_SQL), {'start': start, 'end': end}).fetchall()
+                    write((end, len(rows), *score_rows(rows)))
+            else:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                    # Bounded window of ranges in flight; results are written in id order so
+                    # the checkpoint never skips an unwritten range.
+                    window = deque()
+                    limit = 2 * (workers or os.cpu_count() or 1)
+                    for start, end in ranges:
+                        window.append(executor.submit(score_range, db_path, start, end))
+                        if len(window) >= limit:
+                            write(window.popleft().result())
+                    while window:
+                        write(window.popleft().result())
+
+        sites = rescore_current(session)
+        session.query(IngestCursor).filter(IngestCursor.source == CHECKPOINT).delete()
+        session.commit()
+    finally:
+        session.close()
+    return {'rows': rows_done, 'changed': changed, 'sites': sites, 'seconds': round(time.perf_counter() - started, 2)}
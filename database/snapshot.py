@@ -0,0 +1,233 @@
+"""
+Columnar snapshots of site history.
+
+Completed days of `site_status_history` are compacted into Parquet files
+partitioned by day:
+
+    snapshots/date=2024-03-01/part-0.parquet
+
+Long-window reads go through memory-mapped Arrow tables instead of SQLite
+row scans, so month-long trends only touch the columns and days they need.
+
+`part-0` is the file export_day writes; it records the highest history row id it holds
+(schema metadata `max_id`), so pruning deletes exactly the rows that were exported.
+"""
+import os
+from datetime import datetime, timedelta, date
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import func
+
+from database.db import get_session, SiteStatusHistory
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+HISTORY_SCHEMA = pa.schema([
+    ("site_id", pa.string()),
+    ("wan_status", pa.bool_()),
+    ("latency_ms", pa.float32()),
+    ("packet_loss_pct", pa.float32()),
+    ("jitter_ms", pa.float32()),
+    ("lan_switch_status", pa.bool_()),
+    ("lan_ap_status", pa.bool_()),
+    ("zdx_score", pa.float32()),
+    ("timestamp", pa.timestamp("us")),
+])
+MAX_ID_KEY = b"max_id"
+
+
+def partition_path(day, snapshot_dir=SNAPSHOT_DIR):
+    """Returns the Parquet file path for a given day."""
+    return os.path.join(snapshot_dir, f"date={day.isoformat()}", "part-0.parquet")
+
+
+def partition_files(day, snapshot_dir=SNAPSHOT_DIR):
+    """Returns all Parquet files of a day's partition (bulk loaders may write several parts)."""
+    directory = os.path.join(snapshot_dir, f"date={day.isoformat()}")
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")
+    )
+
+
+def exported_days(snapshot_dir=SNAPSHOT_DIR):
+    """Returns the sorted list of days that already have a snapshot."""
+    if not os.path.isdir(snapshot_dir):
+        return []
+
+    days = []
+    for entry in os.listdir(snapshot_dir):
+        if not entry.startswith("date="):
+            continue
+        try:
+            day = date.fromisoformat(entry[len("date="):])
+        except ValueError:
+            continue
+        if partition_files(day, snapshot_dir):
+            days.append(day)
+    return sorted(days)
+
+
+def export_day(session, day, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Writes all history samples for `day` into its Parquet partition.
+    The file is written to a temporary name and renamed, so readers never see a partial snapshot.
+    Returns the number of rows exported.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+
+    names = [field.name for field in HISTORY_SCHEMA]
+    rows = session.query(SiteStatusHistory.id, *[getattr(SiteStatusHistory, name) for name in names]).filter(
+        SiteStatusHistory.timestamp >= start,
+        SiteStatusHistory.timestamp < end
+    ).order_by(SiteStatusHistory.site_id, SiteStatusHistory.timestamp).all()
+
+    if not rows:
+        return 0
+
+    ids, *columns = zip(*rows)
+    table = pa.Table.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, HISTORY_SCHEMA)],
+        schema=HISTORY_SCHEMA
+    ).replace_schema_metadata({MAX_ID_KEY: str(max(ids))})
+
+    path = partition_path(day, snapshot_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_partition(table, path)
+    return table.num_rows
+
+
+def write_partition(table, path):
+    """Writes a Parquet file via a temporary name, so readers never see a partial file."""
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def exported_max_id(day, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Highest history row id exported for `day`, or None if the day can't be pruned safely:
+    no part-0 written by export_day (or one from before ids were recorded), or other parts
+    (e.g. mock history) in the partition.
+    """
+    path = partition_path(day, snapshot_dir)
+    if partition_files(day, snapshot_dir) != [path]:
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    return int(metadata[MAX_ID_KEY]) if MAX_ID_KEY in metadata else None
+
+
+def prune_day(session, day, max_id):
+    """Deletes a day's history rows up to `max_id` (the exported ones) and commits. Returns the number deleted."""
+    start = datetime.combine(day, datetime.min.time())
+    deleted = session.query(SiteStatusHistory).filter(
+        SiteStatusHistory.timestamp >= start,
+        SiteStatusHistory.timestamp < start + timedelta(days=1),
+        SiteStatusHistory.id <= max_id
+    ).delete(synchronize_session=False)
+    session.commit()
+    return deleted
+
+
+def export_snapshots(snapshot_dir=SNAPSHOT_DIR, prune=False, overwrite=False):
+    """
+    Compacts every completed (UTC) day of history into Parquet.
+    Days that already have a snapshot are skipped unless `overwrite` is set.
+    With `prune`, exported rows are deleted from SQLite afterwards, including days exported
+    by an earlier run (see exported_max_id); rows added after the export are kept.
+    Returns a dict of {day: rows_exported}.
+    """
+    session = get_session()
+    today = datetime.utcnow().date()
+    done = set(exported_days(snapshot_dir))
+    exported = {}
+
+    try:
+        days = [
+            date.fromisoformat(row[0])
+            for row in session.query(func.date(SiteStatusHistory.timestamp)).distinct().all()
+            if row[0]
+        ]
+
+        for day in sorted(days):
+            if day >= today:
+                continue
+            if day in done and not overwrite:
+                if prune:
+                    max_id = exported_max_id(day, snapshot_dir)
+                    if max_id is None:
+                        print(f"Not pruning {day.isoformat()}: its snapshot doesn't record which rows it holds "
+                              f"(re-export with overwrite, and keep other parts out of the partition).")
+                    else:
+                        print(f"Pruned {prune_day(session, day, max_id)} already exported samples for {day.isoformat()}.")
+                continue
+
+            count = export_day(session, day, snapshot_dir)
+            exported[day] = count
+            print(f"Exported {count} samples for {day.isoformat()}.")
+
+            max_id = exported_max_id(day, snapshot_dir)
+            if prune and count and max_id is not None:
+                prune_day(session, day, max_id)
+    finally:
+        session.close()
+
+    return exported
+
+
+def load_history(start, end, site_ids=None, columns=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Reads snapshot history between `start` and `end` (datetimes) as a pyarrow Table.
+    Only the partitions that overlap the range are opened, each via a memory map.
+    """
+    columns = list(columns) if columns else [field.name for field in HISTORY_SCHEMA]
+    read_columns = list(dict.fromkeys(columns + ["timestamp", "site_id"]))
+
+    tables = []
+    for day in exported_days(snapshot_dir):
+        if day < start.date() or day > end.date():
+            continue
+        for path in partition_files(day, snapshot_dir):
+            tables.append(pq.read_table(path, columns=read_columns, memory_map=True))
+
+    if not tables:
+        return HISTORY_SCHEMA.empty_table().select(columns)
+
+    table = pa.concat_tables(tables)
+    mask = pc.and_(
+        pc.greater_equal(table["timestamp"], pa.scalar(start, type=pa.timestamp("us"))),
+        pc.less(table["timestamp"], pa.scalar(end, type=pa.timestamp("us")))
+    )
+    if site_ids:
+        mask = pc.and_(mask, pc.is_in(table["site_id"], value_set=pa.array(list(site_ids), type=pa.string())))
+
+    return table.filter(mask).select(columns)
+
+
+def fleet_daily_summary(start, end, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Aggregates snapshot history into one row per day (avg/min score, samples, WAN-down samples).
+    The aggregation runs in Arrow; only the small result is converted to pandas.
+    """
+    table = load_history(start, end, columns=["timestamp", "zdx_score", "wan_status"], snapshot_dir=snapshot_dir)
+    table = table.append_column("day", pc.floor_temporal(table["timestamp"], unit="day"))
+    table = table.append_column("wan_down", pc.cast(pc.invert(table["wan_status"]), pa.int32()))
+
+    summary = table.group_by("day").aggregate([
+        ("zdx_score", "mean"),
+        ("zdx_score", "min"),
+        ("zdx_score", "count"),
+        ("wan_down", "sum"),
+    ])
+
+    df = summary.to_pandas().rename(columns={
+        "zdx_score_mean": "avg_score",
+        "zdx_score_min": "min_score",
+        "zdx_score_count": "samples",
+        "wan_down_sum": "wan_down_samples",
+    })
+    return df.sort_values("day").set_index("day")
@@ -0,0 +1,140 @@
+"""
+Batch writes of collected site metrics.
+
+One call upserts many sites into `site_status`, appends their history samples and applies
+the fleet summary deltas in a single transaction, so collectors don't pay a query and a
+commit per site.
+"""
+from datetime import datetime
+
+from analysis.scoring import calculate_score
+from sqlalchemy.dialects.sqlite import insert
+
+from database.db import get_session, SiteStatus, IngestCursor, SdwanMember, record_history
+from database.summary import apply_site_changes, site_contribution
+
+SITE_FIELDS = (
+    'site_name', 'region', 'wan_status', 'latency_ms', 'packet_loss_pct', 'jitter_ms',
+    'lan_switch_status', 'lan_ap_status', 'zdx_score', 'timestamp'
+)
+SCORE_FIELDS = ('wan_status', 'lan_switch_status', 'lan_ap_status', 'latency_ms', 'packet_loss_pct', 'jitter_ms')
+ROLLING_FIELDS = ('latency_ms', 'packet_loss_pct', 'jitter_ms')
+
+# SQLite limits the number of bound parameters per statement.
+IN_CLAUSE_BATCH = 500
+
+
+def load_sites(session, site_ids):
+    """Returns {site_id: SiteStatus} for the given ids, querying in batches."""
+    site_ids = list(site_ids)
+    sites = {}
+    for start in range(0, len(site_ids), IN_CLAUSE_BATCH):
+        batch = site_ids[start:start + IN_CLAUSE_BATCH]
+        for site in session.query(SiteStatus).filter(SiteStatus.site_id.in_(batch)):
+            sites[site.site_id] = site
+    return sites
+
+
+def build_site_index(session):
+    """
+    Hash index for resolving device/host names to site ids: lowercased site_id and
+    site_name -> site_id. Built with one query over two columns.
+    """
+    index = {}
+    for site_id, site_name in session.query(SiteStatus.site_id, SiteStatus.site_name):
+        index[site_id.lower()] = site_id
+        if site_name:
+            index.setdefault(site_name.lower(), site_id)
+    return index
+
+
+def get_cursor(session, source):
+    """Returns (last_timestamp, last_id) for `source`, or (None, None) on the first run."""
+    cursor = session.get(IngestCursor, source)
+    if cursor is None:
+        return None, None
+    return cursor.last_timestamp, cursor.last_id
+
+
+def save_cursor(session, source, last_timestamp, last_id=None):
+    """Moves the high-water mark of `source`. The caller commits."""
+    session.merge(IngestCursor(source=source, last_timestamp=last_timestamp, last_id=last_id, updated_at=datetime.utcnow()))
+
+
+def upsert_sdwan_members(session, members_by_site, timestamp=None):
+    """
+    Upserts the latest SD-WAN member measurements ({site_id: [member dict, ...]}, see
+    analysis/sdwan.py). One row per (site, health check, member). The caller commits.
+    """
+    timestamp = timestamp or datetime.utcnow()
+    rows = [
+        {**member, 'site_id': site_id, 'timestamp': timestamp}
+        for site_id, members in members_by_site.items() for member in members
+    ]
+    if not rows:
+        return 0
+    statement = insert(SdwanMember)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=['site_id', 'health_check', 'member'],
+        set_={key: statement.excluded[key] for key in ('status', 'latency_ms', 'jitter_ms', 'packet_loss_pct', 'timestamp')}
+    ), rows)
+    return len(rows)
+
+
+def upsert_sites(records, session=None, detector=None, source='fmg', rolling=None):
+    """
+    Upserts site records (dicts keyed like SiteStatus columns; `site_id` required).
+    Missing `zdx_score` values are calculated, and `sdwan_members` lists are written to the
+    sdwan_members table. After the commit, the new states are passed
+    to `detector` (an analysis.events.ChangeDetector), if given. With `rolling` (an
+    analysis.rolling.RollingStats), each sample updates the site's window and calculated
+    scores use the smoothed metrics. Returns the number of sites written.
+    """
+    if not records:
+        return 0
+
+    own_session = session is None
+    session = session or get_session()
+    try:
+        existing = load_sites(session, (r['site_id'] for r in records))
+        now = datetime.utcnow()
+        changes = []
+        written = []
+
+        for record in records:
+            site = existing.get(record['site_id'])
+            before = site_contribution(site)
+            if site is None:
+                site = SiteStatus(site_id=record['site_id'], site_name=record.get('site_name') or record['site_id'])
+                session.add(site)
+                existing[site.site_id] = site
+
+            for field in SITE_FIELDS:
+                if record.get(field) is not None:
+                    setattr(site, field, record[field])
+            # Only measured metrics are samples: the stored row may hold older values (possibly
+            # from another source) that must not be pushed into the window again.
+            if rolling is not None and any(record.get(f) is not None for f in ROLLING_FIELDS):
+                rolling.update(site.site_id, *(record.get(f) for f in ROLLING_FIELDS))
+            if record.get('zdx_score') is None:
+                if rolling is not None and site.site_id in rolling.sites:
+                    site.zdx_score = rolling.score(site.site_id, site.wan_status, site.lan_switch_status, site.lan_ap_status)
+                else:
+                    site.zdx_score = calculate_score({f: getattr(site, f) for f in SCORE_FIELDS if getattr(site, f) is not None})
+            if record.get('timestamp') is None:
+                site.timestamp = now
+
+            changes.append((before, site_contribution(site)))
+            written.append(site)
+
+        upsert_sdwan_members(session, {r['site_id']: r['sdwan_members'] for r in records if r.get('sdwan_members')}, now)
+        record_history(session, written)
+        apply_site_changes(session, changes)
+        session.commit()
+
+        if detector is not None:
+            detector.observe(source, [(site.site_id, after) for site, (_before, after) in zip(written, changes)])
+        return len(written)
+    finally:
+        if own_session:
+            session.close()
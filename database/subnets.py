@@ -0,0 +1,90 @@
+"""
+Site subnet registry.
+
+`site_subnets` holds the IPv4 subnets of every site (entered manually or discovered from
+FortiGate interfaces via FMG). `get_subnet_index()` compiles them into a SubnetIndex that
+the ZDX, FAZ and FMG collectors share to resolve IPs to sites in one vectorized batch
+instead of scanning subnets per IP.
+"""
+import csv
+import ipaddress
+import time
+from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert
+
+from analysis.site_mapping import SubnetIndex
+from database.db import get_session, SiteSubnet
+
+# Seconds a compiled index is reused before the table is read again.
+INDEX_TTL = 300
+
+_cache = {'index': None, 'loaded_at': 0.0}
+
+
+def normalize_cidr(cidr):
+    """'10.1.2.3/24' -> '10.1.2.0/24'. Raises ValueError for invalid or non-IPv4 subnets."""
+    network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+    if network.version != 4:
+        raise ValueError(f"Only IPv4 subnets are supported: {cidr}")
+    return str(network)
+
+
+def register_subnets(session, subnets, source='manual'):
+    """
+    Upserts (cidr, site_id) pairs; a subnet that moves to another site is reassigned.
+    The caller commits. Returns the number of subnets written.
+    """
+    now = datetime.utcnow()
+    rows = [{'cidr': normalize_cidr(cidr), 'site_id': site_id, 'source': source, 'updated_at': now}
+            for cidr, site_id in subnets]
+    if not rows:
+        return 0
+    statement = insert(SiteSubnet)
+    session.execute(statement.on_conflict_do_update(
+        index_elements=['cidr'],
+        set_={'site_id': statement.excluded.site_id, 'source': statement.excluded.source, 'updated_at': now}
+    ), rows)
+    invalidate_index()
+    return len(rows)
+
+
+def load_subnets(session):
+    """All registered (cidr, site_id) pairs."""
+    return session.query(SiteSubnet.cidr, SiteSubnet.site_id).all()
+
+
+def load_subnet_index(session):
+    """Builds a SubnetIndex from the whole table."""
+    return SubnetIndex(load_subnets(session))
+
+
+def get_subnet_index(session=None, ttl=INDEX_TTL):
+    """Process-wide compiled index, rebuilt at most every `ttl` seconds or after register_subnets."""
+    if _cache['index'] is None or time.monotonic() - _cache['loaded_at'] > ttl:
+        own_session = session is None
+        session = session or get_session()
+        try:
+            _cache['index'] = load_subnet_index(session)
+        finally:
+            if own_session:
+                session.close()
+        _cache['loaded_at'] = time.monotonic()
+    return _cache['index']
+
+
+def invalidate_index():
+    _cache['index'] = None
+
+
+def import_csv(path, source='manual'):
+    """Imports a CSV with `cidr` and `site_id` columns. Returns the number of subnets written."""
+    with open(path, newline='') as f:
+        pairs = [(row['cidr'], row['site_id']) for row in csv.DictReader(f)]
+    session = get_session()
+    try:
+        count = register_subnets(session, pairs, source=source)
+        session.commit()
+        return count
+    finally:
+        session.close()
@@ -0,0 +1,164 @@
+"""
+Incrementally maintained fleet summary.
+
+Writers capture a site's contribution before and after they change it and call
+`apply_site_changes` in the same session/transaction. Only the deltas are applied,
+so the dashboard header renders from one tiny row instead of scanning `site_status`.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert
+
+from analysis.scoring import get_health_status
+from database.db import SiteStatus, FleetSummary, FleetCounter, FleetSummaryHourly
+
+SUMMARY_ID = 1
+STATUS_COLUMNS = {
+    'Excellent': 'excellent',
+    'Good': 'good',
+    'Fair': 'fair',
+    'Poor': 'poor',
+    'Critical': 'critical',
+}
+
+
+def site_contribution(site):
+    """Snapshot of the fields of a SiteStatus row that feed the summary (None for no row)."""
+    if site is None:
+        return None
+    score = site.zdx_score or 0.0
+    return {
+        'score': score,
+        'status': get_health_status(score),
+        'region': site.region or 'Unassigned',
+        'wan_down': not site.wan_status,
+        'switch_down': not site.lan_switch_status,
+        'ap_down': not site.lan_ap_status,
+        'timestamp': site.timestamp,
+    }
+
+
+def _ensure_summary_row(session):
+    summary = session.get(FleetSummary, SUMMARY_ID)
+    if summary is None:
+        summary = FleetSummary(
+            id=SUMMARY_ID, total_sites=0, score_sum=0.0, wan_down=0, switch_down=0, ap_down=0,
+            excellent=0, good=0, fair=0, poor=0, critical=0
+        )
+        session.add(summary)
+        session.flush()
+    return summary
+
+
+def apply_site_changes(session, changes, count_samples=True):
+    """
+    Applies (before, after) contribution pairs to the summary tables.
+    `before` is None for new sites, `after` is None for removed sites.
+    With `count_samples`, every non-None `after` also counts as one sample in its hourly bucket.
+    Deltas are aggregated in Python first, so a batch costs one UPDATE per touched key.
+    """
+    totals = defaultdict(float)
+    counters = defaultdict(int)
+    hourly = {}
+
+    for before, after in changes:
+        for contribution, sign in ((before, -1), (after, 1)):
+            if contribution is None:
+                continue
+            totals['total_sites'] += sign
+            totals['score_sum'] += sign * contribution['score']
+            totals['wan_down'] += sign * contribution['wan_down']
+            totals['switch_down'] += sign * contribution['switch_down']
+            totals['ap_down'] += sign * contribution['ap_down']
+            totals[STATUS_COLUMNS[contribution['status']]] += sign
+
+            counters[('status', contribution['status'])] += sign
+            counters[('region', contribution['region'])] += sign
+            counters[('region_status', f"{contribution['region']}|{contribution['status']}")] += sign
+
+        if after is not None and count_samples:
+            hour = (after['timestamp'] or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+            bucket = hourly.setdefault(hour, {'samples': 0, 'score_sum': 0.0, 'critical_samples': 0, 'wan_down_samples': 0})
+            bucket['samples'] += 1
+            bucket['score_sum'] += after['score']
+            bucket['critical_samples'] += after['status'] == 'Critical'
+            bucket['wan_down_samples'] += after['wan_down']
+
+    _ensure_summary_row(session)
+    values = {
+        name: getattr(FleetSummary, name) + (delta if name == 'score_sum' else int(delta))
+        for name, delta in totals.items() if delta
+    }
+    values['updated_at'] = datetime.utcnow()
+    session.execute(update(FleetSummary).where(FleetSummary.id == SUMMARY_ID).values(**values))
+
+    for (dimension, key), delta in counters.items():
+        if not delta:
+            continue
+        stmt = insert(FleetCounter).values(dimension=dimension, key=key, count=delta)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=['dimension', 'key'],
+            set_={'count': FleetCounter.count + delta}
+        ))
+
+    add_hourly_samples(session, hourly)
+
+
+def add_hourly_samples(session, hourly):
+    """
+    Adds pre-aggregated samples to the hourly roll-up.
+    `hourly` maps an hour (datetime) to {'samples', 'score_sum', 'critical_samples', 'wan_down_samples'}.
+    """
+    for hour, bucket in hourly.items():
+        stmt = insert(FleetSummaryHourly).values(hour=hour, **bucket)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=['hour'],
+            set_={name: getattr(FleetSummaryHourly, name) + value for name, value in bucket.items()}
+        ))
+
+
+def reset_summary(session):
+    """Clears the current-state summary and counters (hourly roll-ups are history and are kept)."""
+    session.query(FleetCounter).delete()
+    session.query(FleetSummary).delete()
+    session.flush()
+
+
+def rebuild_summary(session):
+    """Recomputes the summary from `site_status`. Use after bulk edits that bypassed the write path."""
+    reset_summary(session)
+    changes = [(None, site_contribution(site)) for site in session.query(SiteStatus).all()]
+    apply_site_changes(session, changes, count_samples=False)
+
+
+def get_fleet_summary(session):
+    """Returns the fleet summary as a dict, or None if it has never been populated."""
+    summary = session.get(FleetSummary, SUMMARY_ID)
+    if summary is None:
+        return None
+    total = summary.total_sites or 0
+    return {
+        'total_sites': total,
+        'avg_score': (summary.score_sum / total) if total else 0.0,
+        'wan_down': summary.wan_down,
+        'switch_down': summary.switch_down,
+        'ap_down': summary.ap_down,
+        'excellent': summary.excellent,
+        'good': summary.good,
+        'fair': summary.fair,
+        'poor': summary.poor,
+        'critical': summary.critical,
+        'healthy': summary.excellent + summary.good,
+        'updated_at': summary.updated_at,
+    }
+
+
+def get_counters(session, dimension):
+    """Returns {key: count} for one counter dimension, omitting zero counts."""
+    rows = session.query(FleetCounter.key, FleetCounter.count).filter(
+        FleetCounter.dimension == dimension,
+        FleetCounter.count != 0
+    ).all()
+    return dict(rows)
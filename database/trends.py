@@ -0,0 +1,118 @@
+"""
+Downsampled trend queries for the dashboard.
+
+Every query groups history into fixed time buckets in SQLite (min/avg/max per bucket), with
+the bucket width chosen so a range returns at most `max_points` rows. A 30-day chart over
+1-minute samples therefore transfers a few hundred aggregated rows, never the raw samples.
+"""
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from database.db import get_engine
+
+RANGES = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+DEFAULT_POINTS = 240
+# Fleet ranges at least this long use the hourly summary table instead of raw history.
+HOURLY_FROM = timedelta(days=2)
+_TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_BUCKET = "CAST(strftime('%s', {column}) AS INTEGER) / :bucket"
+
+SITE_TREND_SQL = f"""
+SELECT {_BUCKET.format(column='timestamp')} AS bucket,
+       COUNT(*) AS samples,
+       AVG(zdx_score) AS score, MIN(zdx_score) AS score_min, MAX(zdx_score) AS score_max,
+       AVG(latency_ms) AS latency_ms, MAX(latency_ms) AS latency_max,
+       AVG(packet_loss_pct) AS packet_loss_pct, MAX(packet_loss_pct) AS packet_loss_max,
+       AVG(jitter_ms) AS jitter_ms, MAX(jitter_ms) AS jitter_max
+FROM site_status_history
+WHERE {{where}} timestamp >= :start AND timestamp < :end
+GROUP BY bucket
+ORDER BY bucket
+"""
+
+FLEET_HOURLY_SQL = f"""
+SELECT {_BUCKET.format(column='hour')} AS bucket,
+       SUM(samples) AS samples,
+       SUM(score_sum) / SUM(samples) AS score,
+       100.0 * SUM(critical_samples) / SUM(samples) AS critical_pct,
+       100.0 * SUM(wan_down_samples) / SUM(samples) AS wan_down_pct
+FROM fleet_summary_hourly
+WHERE hour >= :start AND hour < :end AND samples > 0
+GROUP BY bucket
+ORDER BY bucket
+"""
+
+SPARKLINE_SQL = f"""
+SELECT site_id, {_BUCKET.format(column='timestamp')} AS bucket, AVG(zdx_score) AS score
+FROM site_status_history
+WHERE timestamp >= :start AND timestamp < :end
+GROUP BY site_id, bucket
+"""
+
+
+def bucket_seconds(start, end, max_points=DEFAULT_POINTS):
+    """Bucket width (whole seconds, at least 60) giving at most `max_points` buckets."""
+    return max(60, math.ceil((end - start).total_seconds() / max_points))
+
+
+def _window(range_or_start, end=None):
+    end = end or datetime.utcnow()
+    start = end - RANGES[range_or_start] if isinstance(range_or_start, str) else range_or_start
+    return start, end
+
+
+def _frame(sql, params, bucket):
+    import pandas as pd
+
+    with get_engine().connect() as conn:
+        df = pd.read_sql(text(sql), conn, params=params)
+    if df.empty:
+        return df
+    df['timestamp'] = pd.to_datetime(df.pop('bucket') * bucket, unit='s')
+    return df.set_index('timestamp')
+
+
+def site_trend(site_id, range_or_start='24h', end=None, max_points=DEFAULT_POINTS):
+    """Per-bucket score/latency/loss/jitter (avg plus min/max) for one site, indexed by bucket start."""
+    start, end = _window(range_or_start, end)
+    bucket = bucket_seconds(start, end, max_points)
+    params = {'site_id': site_id, 'start': start.strftime(_TS_FORMAT), 'end': end.strftime(_TS_FORMAT), 'bucket': bucket}
+    return _frame(SITE_TREND_SQL.format(where='site_id = :site_id AND'), params, bucket)
+
+
+def fleet_trend(range_or_start='24h', end=None, max_points=DEFAULT_POINTS):
+    """
+    Fleet-wide trend. Ranges of HOURLY_FROM or more are read from the pre-aggregated
+    fleet_summary_hourly table in whole-hour buckets (score, critical and WAN-down
+    percentages); shorter ones aggregate history across all sites.
+    """
+    start, end = _window(range_or_start, end)
+    bucket = bucket_seconds(start, end, max_points)
+    params = {'start': start.strftime(_TS_FORMAT), 'end': end.strftime(_TS_FORMAT), 'bucket': bucket}
+    if end - start >= HOURLY_FROM:
+        bucket = math.ceil(bucket / 3600) * 3600
+        params['bucket'] = bucket
+        return _frame(FLEET_HOURLY_SQL, params, bucket)
+    return _frame(SITE_TREND_SQL.format(where=''), params, bucket)
+
+
+def site_sparklines(hours=24, points=24, end=None):
+    """{site_id: [avg score per bucket, oldest first]} for every site with history in the window."""
+    end = end or datetime.utcnow()
+    start = end - timedelta(hours=hours)
+    bucket = max(60, math.ceil(hours * 3600 / points))
+    params = {'start': start.strftime(_TS_FORMAT), 'end': end.strftime(_TS_FORMAT), 'bucket': bucket}
+
+    sparklines = {}
+    with get_engine().connect() as conn:
+        for site_id, _bucket, score in conn.execute(text(SPARKLINE_SQL + " ORDER BY site_id, bucket"), params):
+            sparklines.setdefault(site_id, []).append(round(score, 1))
+    return sparklines
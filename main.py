@@ -1,12 +1,30 @@
 import argparse
 import os
-import time
-from database.db import init_db
-from utils.mock_data import generate_mock_data
+import sys
+
+# Heavy dependencies (SQLAlchemy, numpy, pandas, Playwright) are imported inside the
+# mode that needs them, so --version/--check and cron invocations start quickly.
+
+__version__ = "0.2.0"
+
+def run_mock_collection(args):
+    from utils.mock_data import generate_mock_data, generate_fleet_history, write_fleet_history_db, write_fleet_history_parquet
 
-def run_mock_collection():
     print("Running Mock Data Collection...")
-    generate_mock_data()
+    if args.timesteps > 1 or args.output == "parquet":
+        chunks = generate_fleet_history(
+            num_sites=args.sites,
+            timesteps=args.timesteps,
+            interval_minutes=args.interval,
+            seed=args.seed,
+            chunk_rows=args.chunk_rows
+        )
+        if args.output == "parquet":
+            write_fleet_history_parquet(chunks)
+        else:
+            write_fleet_history_db(chunks)
+    else:
+        generate_mock_data(num_sites=args.sites, seed=args.seed)
     print("Mock Data Collection Complete.")
 
 def run_real_collection():
@@ -48,21 +66,220 @@ def run_real_collection():
     except ImportError as e:
         print(f"Error importing scrapers: {e}")
 
+def run_sharded_collection(args):
+    from analysis.events import detector_from_env
+    from database.inventory import InventoryCache
+    from src.coordinator import ShardedCollector, load_targets
+    from src.response_cache import RESPONSE_CACHE_FILE
+
+    targets = load_targets()
+    print(f"Running sharded FMG collection over {len(targets)} FortiManager(s) with {args.workers or os.cpu_count()} workers...")
+    collector = ShardedCollector(targets, workers=args.workers, shard_size=args.shard_size, inventory=InventoryCache(),
+                                 response_cache_file=RESPONSE_CACHE_FILE, detector=detector_from_env(),
+                                 record_runs=True)
+    try:
+        results = collector.run()
+    finally:
+        collector.close()
+    summary = collector.summary
+    print(f"Sharded collection complete. {summary['sites_up']}/{len(results)} sites up "
+          f"in {collector.last_run['duration_s']:.1f}s ({collector.last_run['errors']} errors).")
+
+def run_priority_polling(args):
+    from analysis.events import detector_from_env
+    from analysis.rolling import RollingStats
+    from database.inventory import InventoryCache
+    from src.response_cache import RESPONSE_CACHE_FILE, ResponseCache
+    from src.scheduler import PollScheduler, ScheduledCollector
+
+    scheduler = PollScheduler(base_interval=args.poll_interval, max_staleness=args.max_staleness)
+    poller = ScheduledCollector(
+        os.getenv("FMG_URL", "https://fmg.example.com"),
+        os.getenv("FMG_USER", "admin"),
+        os.getenv("FMG_PASS", "password"),
+        adom=os.getenv("FMG_ADOM", "root"),
+        scheduler=scheduler,
+        detector=detector_from_env(),
+        rolling=RollingStats(window=args.rolling_window),
+        inventory=InventoryCache(),
+        response_cache=ResponseCache(disk_path=RESPONSE_CACHE_FILE),
+        record_runs=True
+    )
+    print(f"Polling {poller.collector.client.base_url} (base interval {args.poll_interval}s, "
+          f"max staleness {scheduler.max_staleness}s). Ctrl+C to stop.")
+    try:
+        poller.run(cycles=args.cycles)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.collector.response_cache.close()
+
+def run_subnet_sync(args):
+    from database.db import get_session
+    from database.subnets import import_csv, register_subnets
+
+    if args.subnets_csv:
+        count = import_csv(args.subnets_csv)
+        print(f"Imported {count} site subnet(s) from {args.subnets_csv}.")
+        return
+
+    from database.inventory import InventoryCache
+    from src.collector import DataCollector
+    collector = DataCollector(
+        os.getenv("FMG_URL", "https://fmg.example.com"),
+        os.getenv("FMG_USER", "admin"),
+        os.getenv("FMG_PASS", "password"),
+        adom=os.getenv("FMG_ADOM", "root"),
+        inventory=InventoryCache()
+    )
+    if not collector.sessions.ensure():
+        print("Failed to login to FMG.")
+        return
+    try:
+        devices = collector.list_devices()
+        discovered = collector.discover_subnets(devices)
+    finally:
+        collector.close()
+
+    session = get_session()
+    try:
+        # FortiGates are named after their site (see src/coordinator.to_site_record).
+        count = register_subnets(session, [(cidr, name) for name, cidrs in discovered.items() for cidr in cidrs], source="fmg")
+        session.commit()
+    finally:
+        session.close()
+    print(f"Registered {count} interface subnet(s) from {len(discovered)} device(s).")
+
+def run_baseline_build(args):
+    from analysis.baselines import build_baselines, BASELINE_FILE
+
+    print(f"Computing per-site hour-of-week baselines over the last {args.baseline_days} days...")
+    baselines, samples = build_baselines(days=args.baseline_days)
+    print(f"Baselines for {len(baselines)} sites from {samples} samples written to {BASELINE_FILE}.")
+
+def run_rescore(args):
+    from database.rescore import rescore_history
+
+    print(f"Re-scoring site history with {args.workers or os.cpu_count()} worker(s), {args.chunk_rows} rows per chunk...")
+    result = rescore_history(workers=args.workers, chunk_size=args.chunk_rows, restart=args.restart)
+    print(f"Rescore complete: {result['changed']} of {result['rows']} history rows changed, "
+          f"{result['sites']} sites updated in {result['seconds']}s.")
+
+def run_snapshot_export(prune=False):
+    print("Exporting history snapshots to Parquet...")
+    try:
+        from database.snapshot import export_snapshots
+    except ImportError as e:
+        print(f"Error importing snapshot exporter (is pyarrow installed?): {e}")
+        return
+
+    exported = export_snapshots(prune=prune)
+    print(f"Snapshot export complete. {len(exported)} day(s) exported.")
+
+def run_check(max_age_minutes=None):
+    """
+    Cheap health check using only the stdlib sqlite3 module.
+    Returns 0 if the database is present and (optionally) fresh, 1 otherwise.
+    """
+    import sqlite3
+    from datetime import datetime
+    from database.config import DB_FILE
+
+    if not os.path.exists(DB_FILE):
+        print(f"CHECK FAILED: database {DB_FILE} not found. Run with --init-db.")
+        return 1
+
+    try:
+        conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True)
+        try:
+            sites, latest = conn.execute("SELECT COUNT(*), MAX(timestamp) FROM site_status").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"CHECK FAILED: {e}")
+        return 1
+
+    print(f"Database: {DB_FILE} | Sites: {sites} | Last update: {latest or 'never'}")
+    if not sites:
+        print("CHECK FAILED: no site data.")
+        return 1
+
+    if max_age_minutes is not None and latest:
+        age = (datetime.utcnow() - datetime.fromisoformat(latest)).total_seconds() / 60
+        if age > max_age_minutes:
+            print(f"CHECK FAILED: data is {age:.0f} minutes old (limit {max_age_minutes}).")
+            return 1
+
+    print("CHECK OK")
+    return 0
+
 def main():
     parser = argparse.ArgumentParser(description="Network Experience Dashboard Data Collector")
-    parser.add_argument("--mode", choices=["mock", "real"], default="mock", help="Data collection mode")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    parser.add_argument("--check", action="store_true", help="Check the database is present and fresh, then exit")
+    parser.add_argument("--max-age", type=int, default=None, help="Check mode: fail if the newest data is older than this many minutes")
+    parser.add_argument("--mode", choices=["mock", "real", "sharded", "poll", "subnets", "baselines", "rescore", "snapshot"], default="mock", help="Data collection mode")
     parser.add_argument("--init-db", action="store_true", help="Initialize the database")
+    parser.add_argument("--sites", type=int, default=260, help="Mock mode: number of sites to generate")
+    parser.add_argument("--timesteps", type=int, default=1, help="Mock mode: number of history samples per site")
+    parser.add_argument("--interval", type=int, default=5, help="Mock mode: minutes between history samples")
+    parser.add_argument("--seed", type=int, default=None, help="Mock mode: random seed for reproducible data")
+    parser.add_argument("--output", choices=["db", "parquet"], default="db", help="Mock mode: write history to SQLite or Parquet snapshots")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Mock mode: rows generated and written per chunk; rescore mode: rows scored per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Sharded/rescore mode: worker processes (default: CPU count)")
+    parser.add_argument("--shard-size", type=int, default=50, help="Sharded mode: devices per work unit")
+    parser.add_argument("--poll-interval", type=int, default=300, help="Poll mode: seconds between polls of a Fair/Good site")
+    parser.add_argument("--max-staleness", type=int, default=None, help="Poll mode: longest any site may go unpolled (default: 4x interval)")
+    parser.add_argument("--rolling-window", type=int, default=12, help="Poll mode: samples per site in the rolling window used for scoring")
+    parser.add_argument("--cycles", type=int, default=None, help="Poll mode: stop after this many polling rounds")
+    parser.add_argument("--subnets-csv", default=None, help="Subnets mode: import cidr,site_id rows from this CSV instead of discovering them via FMG")
+    parser.add_argument("--baseline-days", type=int, default=28, help="Baselines mode: days of history to learn from")
+    parser.add_argument("--restart", action="store_true", help="Rescore mode: ignore the checkpoint of an interrupted run")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port while running")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=["cprofile", "pyinstrument"],
+                        help="Profile the run (CPU + allocations) and write reports to profiles/<timestamp>-<mode>/")
+    parser.add_argument("--profile-top", type=int, default=20, help="Number of functions/allocation sites to report")
+    parser.add_argument("--prune", action="store_true", help="Snapshot mode: delete exported history rows from SQLite")
 
     args = parser.parse_args()
 
+    if args.check:
+        sys.exit(run_check(args.max_age))
+
+    if args.metrics_port:
+        from utils.metrics import serve_metrics
+        serve_metrics(args.metrics_port)
+        print(f"Serving metrics on http://0.0.0.0:{args.metrics_port}/metrics")
+
     if args.init_db:
+        from database.db import init_db
         print("Initializing Database...")
         init_db()
 
+    if args.profile:
+        from utils.profiling import profile_run
+        with profile_run(args.mode, engine=args.profile, top_n=args.profile_top):
+            run_mode(args)
+    else:
+        run_mode(args)
+
+def run_mode(args):
     if args.mode == "mock":
-        run_mock_collection()
+        run_mock_collection(args)
     elif args.mode == "real":
         run_real_collection()
+    elif args.mode == "sharded":
+        run_sharded_collection(args)
+    elif args.mode == "poll":
+        run_priority_polling(args)
+    elif args.mode == "subnets":
+        run_subnet_sync(args)
+    elif args.mode == "baselines":
+        run_baseline_build(args)
+    elif args.mode == "rescore":
+        run_rescore(args)
+    elif args.mode == "snapshot":
+        run_snapshot_export(prune=args.prune)
 
 if __name__ == "__main__":
     main()
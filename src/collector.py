@@ -1,63 +1,270 @@
 import concurrent.futures
-import pandas as pd
+import ipaddress
+import itertools
 import logging
+import os
+import sys
+from datetime import datetime
 try:
     from .fmg_client import FMGClient
+    from .session_manager import FMGSessionManager
 except ImportError:
     from fmg_client import FMGClient
+    from session_manager import FMGSessionManager
+try:
+    from utils.metrics import MetricsRegistry, finish_run
+    from analysis.sdwan import HEALTH_CHECK, parse_health_check, site_wan_metrics
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.metrics import MetricsRegistry, finish_run
+    from analysis.sdwan import HEALTH_CHECK, parse_health_check, site_wan_metrics
 
 logger = logging.getLogger(__name__)
 
+STATUS_CATEGORIES = ("UP", "DOWN", "Unreachable", "Error")
+# Column dtypes of the fetch_all_data DataFrame. Nested per-device data (sdwan_members) stays
+# in the result dicts; the display text is built by device_details() when rendered.
+FRAME_DTYPES = {
+    "name": "object",
+    "serial": "object",
+    "status": "category",
+    "cpu": "float32",
+    "mem": "float32",
+    "switches_total": "uint16",
+    "switches_up": "uint16",
+    "aps_total": "uint16",
+    "aps_up": "uint16",
+    "wan_members_up": "uint8",
+    "latency_ms": "float32",
+    "packet_loss_pct": "float32",
+    "jitter_ms": "float32",
+    "error": "object",
+}
+
+def results_frame(results, chunk_rows=1000):
+    """
+    Builds the typed device DataFrame from an iterable of result dicts, `chunk_rows` at a
+    time, so only one chunk of dicts is alive at once.
+    """
+    import pandas as pd
+
+    dtypes = {**FRAME_DTYPES, "status": pd.CategoricalDtype(STATUS_CATEGORIES)}
+    chunks = []
+    results = iter(results)
+    while True:
+        chunk = list(itertools.islice(results, chunk_rows))
+        if not chunk:
+            break
+        frame = pd.DataFrame.from_records(chunk, columns=list(dtypes))
+        frame[["cpu", "mem", "latency_ms", "packet_loss_pct", "jitter_ms"]] = \
+            frame[["cpu", "mem", "latency_ms", "packet_loss_pct", "jitter_ms"]].fillna(0.0)
+        frame[["switches_total", "switches_up", "aps_total", "aps_up", "wan_members_up"]] = \
+            frame[["switches_total", "switches_up", "aps_total", "aps_up", "wan_members_up"]].fillna(0)
+        chunks.append(frame.astype(dtypes))
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+    return pd.concat(chunks, ignore_index=True)
+
+def device_details(result):
+    """Human-readable summary of one device result (dict or DataFrame row), built on demand."""
+    if result["status"] == "Error":
+        return f"Error: {result['error']}"
+    if result["status"] == "DOWN":
+        return "Device disconnected from FMG"
+    return (f"Switches: {result['switches_up']}/{result['switches_total']} UP, "
+            f"APs: {result['aps_up']}/{result['aps_total']} UP")
+
+def tally_summary(summary, result):
+    """Adds one device result to a summary dict (see DataCollector._empty_summary)."""
+    summary["total_sites"] += 1
+    if result.get("status") == "UP":
+        summary["sites_up"] += 1
+    else:
+        summary["sites_down"] += 1
+    for key in ("switches_total", "switches_up", "aps_total", "aps_up"):
+        summary[key] += result.get(key, 0)
+
 class DataCollector:
-    def __init__(self, fmg_url, username, password, verify_ssl=False, adom="root"):
+    def __init__(self, fmg_url, username, password, verify_ssl=False, adom="root", record_runs=False, inventory=None,
+                 response_cache=None):
         self.client = FMGClient(fmg_url, username, password, verify_ssl)
+        # One FMG session kept across sweeps and shared by the worker threads; see close().
+        self.sessions = FMGSessionManager(self.client)
         self.adom = adom
+        # Optional database.inventory.InventoryCache, to reuse the device list across sweeps.
+        self.inventory = inventory
+        # Optional src.response_cache.ResponseCache for the slow-changing proxied endpoints.
+        self.response_cache = response_cache
         self.devices = []
+        self.summary = self._empty_summary()
+        self.record_runs = record_runs
+        self.metrics = MetricsRegistry()
+        self.last_run = None
+        self.errors = 0
+
+    @staticmethod
+    def _empty_summary():
+        return {
+            "total_sites": 0,
+            "sites_up": 0,
+            "sites_down": 0,
+            "switches_total": 0,
+            "switches_up": 0,
+            "aps_total": 0,
+            "aps_up": 0,
+        }
+
+    def _tally(self, result):
+        """Adds one device result to the running summary, so totals never need a DataFrame scan."""
+        tally_summary(self.summary, result)
 
     def fetch_all_data(self):
         """
         Connects to FMG, gets devices, and fetches detailed status for each.
-        Returns a DataFrame.
+        Returns a typed DataFrame (see FRAME_DTYPES), built in chunks as results arrive.
+        The FMG session stays open for the next call; call close() when done.
         """
-        if not self.client.login():
+        import pandas as pd  # imported here so importing the collector stays cheap
+
+        self.metrics = MetricsRegistry()
+        started_at = datetime.utcnow()
+
+        with self.metrics.timer("fmg_login_seconds"):
+            logged_in = self.sessions.ensure()
+        if not logged_in:
             logger.error("Failed to login to FMG")
+            self._finish_run(started_at, errors=1)
             return pd.DataFrame()
 
         logger.info(f"Fetching managed devices for ADOM: {self.adom}...")
-        self.devices = self.client.get_managed_devices(self.adom)
+        with self.metrics.timer("fmg_device_list_seconds"):
+            self.devices = self.list_devices()
         logger.info(f"Found {len(self.devices)} devices.")
 
-        results = []
+        df = results_frame(self.iter_devices(self.devices))
+
+        self._finish_run(started_at, errors=self.errors)
+        return df
+
+    def close(self):
+        """Logs out of FMG (if this collector's session manager logged in)."""
+        self.sessions.close()
+
+    def list_devices(self):
+        """Managed devices of the ADOM, through the inventory cache if one is set."""
+        if self.inventory is not None:
+            return self.inventory.devices(self.client, self.adom)
+        return self.client.get_managed_devices(self.adom)
+
+    def fetch_devices(self, devices, max_workers=10):
+        """
+        Fetches status for the given devices (the client must already be logged in).
+        Returns (results, errors) where results is a list of per-device dicts.
+        """
+        results = list(self.iter_devices(devices, max_workers))
+        return results, self.errors
+
+    def iter_devices(self, devices, max_workers=10):
+        """
+        Yields per-device result dicts as they complete, tallying the summary and counting
+        errors in self.errors. At most 2 x max_workers devices are queued at a time, so
+        neither the futures nor the results grow with the fleet.
+        """
+        self.summary = self._empty_summary()
+        self.errors = 0
+        devices = iter(devices)
 
         # Limit concurrency to avoid overwhelming FMG
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_device = {
-                executor.submit(self.fetch_device_status, device): device
-                for device in self.devices
+        with self.metrics.timer("fmg_sweep_seconds"), concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+
+            def submit(count):
+                for device in itertools.islice(devices, count):
+                    pending[executor.submit(self.fetch_device_status, device)] = device
+
+            submit(2 * max_workers)
+            while pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    device = pending.pop(future)
+                    try:
+                        data = future.result()
+                    except Exception as exc:
+                        logger.error(f"{device.get('name')} generated an exception: {exc}")
+                        data = {
+                            "name": device.get("name"),
+                            "serial": device.get("sn"),
+                            "status": "Error",
+                            "cpu": 0,
+                            "mem": 0,
+                            "switches_total": 0,
+                            "switches_up": 0,
+                            "aps_total": 0,
+                            "aps_up": 0,
+                            "error": str(exc)
+                        }
+                    if data["status"] in ("Error", "Unreachable"):
+                        self.errors += 1
+                    self._tally(data)
+                    yield data
+                submit(len(done))
+
+    def _finish_run(self, started_at, errors=0):
+        if self.record_runs:
+            self.last_run = finish_run("fmg_api", started_at, self.metrics, devices=len(self.devices), errors=errors)
+        else:
+            self.last_run = {
+                "stages": self.metrics.stage_summary(),
+                "slowest_devices": self.metrics.top("fmg_proxy_call_seconds", "device"),
             }
 
-            for future in concurrent.futures.as_completed(future_to_device):
-                device = future_to_device[future]
+    def fetch_device_subnets(self, device):
+        """
+        Connected IPv4 subnets (CIDR strings) of a device's non-WAN interfaces, for the
+        site subnet registry (database/subnets.py).
+        """
+        interfaces = self._device_command(device.get("name"), "/api/v2/monitor/system/available-interfaces")
+        if isinstance(interfaces, dict) and 'results' in interfaces:
+            interfaces = interfaces['results']
+        if not isinstance(interfaces, list):
+            return []
+
+        subnets = []
+        for interface in interfaces:
+            if str(interface.get("role", "")).lower() == "wan":
+                continue
+            for address in interface.get("ipv4_addresses") or []:
+                ip = address.get("ip")
+                prefix = address.get("cidr_netmask")
+                if not ip or prefix is None or ip.startswith("0."):
+                    continue
                 try:
-                    data = future.result()
-                    results.append(data)
-                except Exception as exc:
-                    logger.error(f"{device.get('name')} generated an exception: {exc}")
-                    results.append({
-                        "name": device.get("name"),
-                        "serial": device.get("sn"),
-                        "status": "Error",
-                        "cpu": 0,
-                        "mem": 0,
-                        "switches_total": 0,
-                        "switches_up": 0,
-                        "aps_total": 0,
-                        "aps_up": 0,
-                        "details": f"Error: {exc}"
-                    })
-
-        self.client.logout()
-        return pd.DataFrame(results)
+                    subnets.append(str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False)))
+                except ValueError:
+                    logger.warning(f"{device.get('name')}: ignoring invalid interface address {ip}/{prefix}")
+        return subnets
+
+    def discover_subnets(self, devices, max_workers=10):
+        """
+        Fetches interface subnets for the connected devices (the client must already be
+        logged in). Returns {device name: [cidr, ...]}.
+        """
+        connected = [d for d in devices if d.get("conn_status") == 1]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            subnets = executor.map(self.fetch_device_subnets, connected)
+            return {device.get("name"): found for device, found in zip(connected, subnets)}
+
+    def _proxy_call(self, name, path):
+        with self.metrics.timer("fmg_proxy_call_seconds", device=name, resource=path):
+            return self.client.execute_device_command(name, path)
+
+    def _device_command(self, name, path):
+        if self.response_cache is None:
+            return self._proxy_call(name, path)
+        value, state = self.response_cache.get(f"{self.client.base_url}|{name}", path,
+                                               lambda: self._proxy_call(name, path))
+        self.metrics.inc("fmg_response_cache_total", result=state, resource=path)
+        return value
 
     def fetch_device_status(self, device):
         """
@@ -81,11 +288,10 @@ class DataCollector:
                 "switches_up": 0,
                 "aps_total": 0,
                 "aps_up": 0,
-                "details": "Device disconnected from FMG"
             }
 
         # Fetch System Status
-        sys_status = self.client.execute_device_command(name, "/api/v2/monitor/system/status")
+        sys_status = self._device_command(name, "/api/v2/monitor/system/status")
 
         cpu = 0
         mem = 0
@@ -100,7 +306,7 @@ class DataCollector:
             mem = stats.get("mem", 0)
 
         # Fetch Switch Status
-        switch_status = self.client.execute_device_command(name, "/api/v2/monitor/switch-controller/managed-switch/status")
+        switch_status = self._device_command(name, "/api/v2/monitor/switch-controller/managed-switch/status")
         switches_total = 0
         switches_up = 0
 
@@ -120,7 +326,7 @@ class DataCollector:
                         switches_up += 1
 
         # Fetch AP Status
-        ap_status = self.client.execute_device_command(name, "/api/v2/monitor/wifi/managed-ap")
+        ap_status = self._device_command(name, "/api/v2/monitor/wifi/managed-ap")
         aps_total = 0
         aps_up = 0
         if ap_status:
@@ -138,6 +344,10 @@ class DataCollector:
                     if status in ['up', 'online', 'connected', 'running'] or conn_state in ['connected', 'online', 'running']:
                         aps_up += 1
 
+        # Fetch SD-WAN health-check (per-member latency/jitter/loss)
+        sdwan_members = parse_health_check(self._device_command(name, HEALTH_CHECK))
+        wan = site_wan_metrics(sdwan_members) or {"latency_ms": 0.0, "packet_loss_pct": 0.0, "jitter_ms": 0.0}
+
         return {
             "name": name,
             "serial": serial,
@@ -148,5 +358,7 @@ class DataCollector:
             "switches_up": switches_up,
             "aps_total": aps_total,
             "aps_up": aps_up,
-            "details": f"Switches: {switches_up}/{switches_total} UP, APs: {aps_up}/{aps_total} UP"
+            "sdwan_members": sdwan_members,
+            "wan_members_up": sum(1 for m in sdwan_members if m["status"]),
+            **wan,
         }
@@ -0,0 +1,248 @@
+"""
+Sharded collection across several FortiManagers and ADOMs.
+
+The coordinator lists the devices of every (fmg, adom) target, splits each device list
+into fixed-size shards and hands the shards to a process pool. Every worker reuses the
+coordinator's FMG session for its target (logging in itself only if that session expires),
+runs the usual threaded sweep over its shard and returns plain dicts, which the coordinator
+merges and writes to the shared store in one transaction. With a response cache file, the
+workers share cached switch/AP/interface responses through it (see src/response_cache.py).
+
+Targets come from FMG_TARGETS, a JSON list such as:
+    [{"name": "fmg-eu", "url": "https://fmg-eu", "username": "api", "password": "...",
+      "adoms": ["root", "retail"]}]
+falling back to FMG_URL / FMG_USER / FMG_PASS / FMG_ADOMS (comma separated).
+"""
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+try:
+    from .collector import DataCollector, tally_summary
+    from .fmg_client import FMGClient
+    from .response_cache import ResponseCache
+    from .session_manager import FMGSessionManager
+except ImportError:
+    from collector import DataCollector, tally_summary
+    from fmg_client import FMGClient
+    from response_cache import ResponseCache
+    from session_manager import FMGSessionManager
+try:
+    from utils.metrics import MetricsRegistry, finish_run
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.metrics import MetricsRegistry, finish_run
+
+logger = logging.getLogger(__name__)
+
+
+def load_targets():
+    """Reads the FMG targets from the environment. Returns a list of target dicts."""
+    raw = os.getenv("FMG_TARGETS")
+    if raw:
+        targets = json.loads(raw)
+    else:
+        targets = [{
+            "url": os.getenv("FMG_URL", "https://fmg.example.com"),
+            "username": os.getenv("FMG_USER", "admin"),
+            "password": os.getenv("FMG_PASS", "password"),
+            "adoms": [a.strip() for a in os.getenv("FMG_ADOMS", "root").split(",") if a.strip()],
+        }]
+    for target in targets:
+        target.setdefault("name", target["url"])
+        target.setdefault("adoms", ["root"])
+        target.setdefault("verify_ssl", False)
+    return targets
+
+
+def plan_work_units(targets, shard_size=50, inventory=None, sessions=None):
+    """
+    Lists the devices of every (fmg, adom) and splits them into work units of at most
+    `shard_size` devices. Targets that fail to log in are skipped and logged.
+    With an `inventory` (database.inventory.InventoryCache) the device lists come from the cache
+    when they haven't changed. With `sessions` ({target name: FMGSessionManager}, filled in as
+    needed) the sessions stay open and each unit carries its target's session_id.
+    """
+    units = []
+    for target in targets:
+        manager = (sessions or {}).get(target["name"])
+        if manager is None:
+            manager = FMGSessionManager(FMGClient(target["url"], target["username"], target["password"], target["verify_ssl"]))
+            if sessions is not None:
+                sessions[target["name"]] = manager
+        client = manager.client
+        if not manager.ensure():
+            logger.error(f"Failed to login to {target['name']}, skipping it")
+            continue
+        try:
+            for adom in target["adoms"]:
+                devices = inventory.devices(client, adom) if inventory is not None else client.get_managed_devices(adom)
+                logger.info(f"{target['name']}/{adom}: {len(devices)} devices")
+                for start in range(0, len(devices), shard_size):
+                    units.append({
+                        "target": target,
+                        "adom": adom,
+                        "shard": start // shard_size,
+                        "devices": devices[start:start + shard_size],
+                        "session_id": client.session_id if sessions is not None else None,
+                    })
+        finally:
+            if sessions is None:
+                manager.close()
+    return units
+
+
+def collect_unit(unit, threads=10):
+    """
+    Collects one work unit in a worker process, reusing the unit's session_id if it has one
+    (a new session is only created, and logged out afterwards, if that one has expired).
+    Returns a dict with the device results, error count and the unit's MetricsRegistry.
+    """
+    target = unit["target"]
+    cache_file = unit.get("response_cache_file")
+    collector = DataCollector(target["url"], target["username"], target["password"],
+                              verify_ssl=target["verify_ssl"], adom=unit["adom"], record_runs=False,
+                              response_cache=ResponseCache(disk_path=cache_file) if cache_file else None)
+    label = f"{target['name']}/{unit['adom']}#{unit['shard']}"
+
+    with collector.metrics.timer("fmg_login_seconds"):
+        if unit.get("session_id"):
+            collector.sessions.adopt(unit["session_id"])
+            logged_in = True
+        else:
+            logged_in = collector.sessions.ensure()
+    if not logged_in:
+        logger.error(f"{label}: failed to login")
+        return {"unit": label, "results": [], "errors": len(unit["devices"]), "metrics": collector.metrics}
+
+    try:
+        results, errors = collector.fetch_devices(unit["devices"], max_workers=threads)
+    finally:
+        if collector.response_cache is not None:
+            collector.response_cache.close()  # lets background refreshes reach the disk layer
+        collector.close()
+
+    for result in results:
+        result["fmg"] = target["name"]
+        result["adom"] = unit["adom"]
+    return {"unit": label, "results": results, "errors": errors, "metrics": collector.metrics}
+
+
+def find_name_collisions(results):
+    """
+    Device names reported by more than one (fmg, adom). Sites are keyed by device name, so
+    these would overwrite each other's site_status row and history.
+    Returns {name: sorted ["fmg/adom", ...]}.
+    """
+    scopes = {}
+    for result in results:
+        scopes.setdefault(result["name"], set()).add(f"{result.get('fmg')}/{result.get('adom')}")
+    return {name: sorted(found) for name, found in scopes.items() if len(found) > 1}
+
+
+def to_site_record(result):
+    """
+    Maps one collector device result onto a site_status record for the store. With SD-WAN
+    health-check data, the WAN is down when no member is up and the worst up-member
+    latency/loss/jitter are used.
+    """
+    switches_total = result.get("switches_total", 0)
+    aps_total = result.get("aps_total", 0)
+    members = result.get("sdwan_members") or []
+    record = {
+        "site_id": result["name"],
+        "site_name": result["name"],
+        "wan_status": result.get("status") == "UP" and (not members or result.get("wan_members_up", 0) > 0),
+        "lan_switch_status": result.get("switches_up", 0) == switches_total,
+        "lan_ap_status": result.get("aps_up", 0) == aps_total,
+    }
+    if members:
+        record["latency_ms"] = result.get("latency_ms", 0.0)
+        record["packet_loss_pct"] = result.get("packet_loss_pct", 0.0)
+        record["jitter_ms"] = result.get("jitter_ms", 0.0)
+        record["sdwan_members"] = members
+    return record
+
+
+class ShardedCollector:
+    """
+    Runs a collection over every configured FMG/ADOM using a pool of worker processes.
+
+    Usage:
+        results = ShardedCollector(load_targets(), workers=4, shard_size=50).run()
+    """
+
+    def __init__(self, targets, workers=None, shard_size=50, threads_per_worker=10, write_store=True, record_runs=False, detector=None,
+                 inventory=None, response_cache_file=None):
+        self.targets = targets
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.threads_per_worker = threads_per_worker
+        self.write_store = write_store
+        self.record_runs = record_runs
+        self.detector = detector
+        self.inventory = inventory
+        self.response_cache_file = response_cache_file
+        self.sessions = {}  # target name -> FMGSessionManager, kept across runs until close()
+        self.metrics = MetricsRegistry()
+        self.summary = DataCollector._empty_summary()
+        self.last_run = None
+
+    def run(self):
+        """Collects all work units and writes the merged results. Returns the list of device results."""
+        self.metrics = MetricsRegistry()
+        self.summary = DataCollector._empty_summary()
+        started_at = datetime.utcnow()
+        results = []
+        errors = 0
+
+        with self.metrics.timer("fmg_plan_seconds"):
+            units = plan_work_units(self.targets, self.shard_size, inventory=self.inventory, sessions=self.sessions)
+        for unit in units:
+            unit["response_cache_file"] = self.response_cache_file
+        logger.info(f"Planned {len(units)} work units across {len(self.targets)} FMG target(s)")
+
+        with self.metrics.timer("fmg_sweep_seconds"), \
+                concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(collect_unit, unit, self.threads_per_worker): unit for unit in units}
+            for future in concurrent.futures.as_completed(futures):
+                unit = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as exc:
+                    logger.error(f"Work unit {unit['target']['name']}/{unit['adom']}#{unit['shard']} failed: {exc}")
+                    errors += len(unit["devices"])
+                    continue
+                results.extend(outcome["results"])
+                errors += outcome["errors"]
+                self.metrics.merge(outcome["metrics"])
+
+        for result in results:
+            tally_summary(self.summary, result)
+
+        collisions = find_name_collisions(results)
+        if collisions:
+            logger.error(f"{len(collisions)} device name(s) exist on more than one FMG/ADOM and are not written "
+                         f"(rename them or collect the scopes separately): "
+                         + ", ".join(f"{name} ({', '.join(scopes)})" for name, scopes in sorted(collisions.items())[:10]))
+            errors += sum(1 for r in results if r["name"] in collisions)
+
+        stored = [r for r in results if r["name"] not in collisions]
+        if self.write_store and stored:
+            from database.store import upsert_sites
+            with self.metrics.timer("db_commit_seconds"):
+                upsert_sites([to_site_record(r) for r in stored], detector=self.detector)
+
+        if self.record_runs:
+            self.last_run = finish_run("fmg_sharded", started_at, self.metrics, devices=len(results), errors=errors)
+        else:
+            self.last_run = {"stages": self.metrics.stage_summary()}
+        return results
+
+    def close(self):
+        """Logs out of every FMG session opened by run()."""
+        for manager in self.sessions.values():
+            manager.close()
+        self.sessions = {}
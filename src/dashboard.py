@@ -7,11 +7,14 @@ import os
 # Add src to sys.path if needed
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-try:
-    from collector import DataCollector
-except ImportError:
-    st.error("Could not import DataCollector. Make sure you are running from the project root or 'src' directory.")
-    DataCollector = None
+def load_collector_class():
+    """Imports the collector stack (requests, FMG client) only when a fetch is requested."""
+    try:
+        from collector import DataCollector
+    except ImportError:
+        st.error("Could not import DataCollector. Make sure you are running from the project root or 'src' directory.")
+        return None
+    return DataCollector
 
 # Configure logging to capture output
 logging.basicConfig(level=logging.INFO)
@@ -29,16 +32,30 @@ fmg_adom = st.sidebar.text_input("ADOM", value="root")
 # Initialize session state for dataframe
 if 'df' not in st.session_state:
     st.session_state.df = pd.DataFrame()
+    st.session_state.summary = None
 
 if st.sidebar.button("Fetch Data"):
     if not fmg_url or not fmg_user or not fmg_pass:
         st.error("Please provide all credentials.")
-    elif DataCollector is None:
+    elif (DataCollector := load_collector_class()) is None:
         st.error("DataCollector module is missing. Cannot fetch data.")
     else:
         with st.spinner("Connecting to FMG and fetching data from 260+ sites... This may take a moment."):
             try:
-                collector = DataCollector(fmg_url, fmg_user, fmg_pass, verify_ssl=False, adom=fmg_adom)
+                # Reuse the collector (and its FMG session) across fetches with the same settings.
+                collector = st.session_state.get('collector')
+                settings = (fmg_url.rstrip('/'), fmg_user, fmg_pass, fmg_adom)
+                if collector is None or (collector.client.base_url, collector.client.username,
+                                         collector.client.password, collector.adom) != settings:
+                    if collector is not None:
+                        collector.close()
+                    from response_cache import ResponseCache
+                    from database.inventory import InventoryCache
+                    # Repeated fetches reuse the device inventory and (in memory) the slow
+                    # switch/AP/interface responses.
+                    collector = DataCollector(fmg_url, fmg_user, fmg_pass, verify_ssl=False, adom=fmg_adom,
+                                              inventory=InventoryCache(), response_cache=ResponseCache())
+                    st.session_state.collector = collector
                 fetched_df = collector.fetch_all_data()
 
                 if fetched_df.empty:
@@ -46,6 +63,7 @@ if st.sidebar.button("Fetch Data"):
                 else:
                     st.success(f"Successfully fetched data for {len(fetched_df)} sites.")
                     st.session_state.df = fetched_df
+                    st.session_state.summary = dict(collector.summary)
 
             except Exception as e:
                 st.error(f"An error occurred: {e}")
@@ -55,22 +73,23 @@ if st.sidebar.button("Fetch Data"):
 if not st.session_state.df.empty:
     df = st.session_state.df
 
-    # Metrics
+    # Metrics (tallied by the collector as results arrived)
     col1, col2, col3, col4, col5 = st.columns(5)
-    total_sites = len(df)
-    up_sites = len(df[df['status'] == 'UP'])
-    down_sites = total_sites - up_sites
-
-    switches_total = df['switches_total'].sum()
-    switches_up = df['switches_up'].sum()
-    aps_total = df['aps_total'].sum()
-    aps_up = df['aps_up'].sum()
-
-    col1.metric("Total Sites", total_sites)
-    col2.metric("Sites UP", up_sites)
-    col3.metric("Sites DOWN", down_sites, delta_color="inverse")
-    col4.metric("Switches UP", f"{switches_up}/{switches_total}")
-    col5.metric("APs UP", f"{aps_up}/{aps_total}")
+    summary = st.session_state.get('summary') or {
+        "total_sites": len(df),
+        "sites_up": int((df['status'] == 'UP').sum()),
+        "sites_down": int((df['status'] != 'UP').sum()),
+        "switches_total": df['switches_total'].sum(),
+        "switches_up": df['switches_up'].sum(),
+        "aps_total": df['aps_total'].sum(),
+        "aps_up": df['aps_up'].sum(),
+    }
+
+    col1.metric("Total Sites", summary['total_sites'])
+    col2.metric("Sites UP", summary['sites_up'])
+    col3.metric("Sites DOWN", summary['sites_down'], delta_color="inverse")
+    col4.metric("Switches UP", f"{summary['switches_up']}/{summary['switches_total']}")
+    col5.metric("APs UP", f"{summary['aps_up']}/{summary['aps_total']}")
 
     # Search
     search_term = st.text_input("Search by Site Name or Serial", "")
@@ -79,8 +98,10 @@ if not st.session_state.df.empty:
     else:
         df_display = df
 
-    # Main Table
-    st.dataframe(df_display.style.map(lambda x: 'color: red' if x == 'DOWN' or x == 'Unreachable' else 'color: green', subset=['status']))
+    # Main Table (the details text is only built for the rows being shown)
+    from collector import device_details
+    df_display = df_display.assign(details=[device_details(row) for row in df_display.to_dict('records')])
+    st.dataframe(df_display.style.map(lambda x: 'color: red' if x in ('DOWN', 'Unreachable', 'Error') else 'color: green', subset=['status']))
 
     # Detailed View
     st.subheader("Granular Data Analysis")
@@ -89,7 +110,7 @@ if not st.session_state.df.empty:
     selected_site = st.selectbox("Select a site for details", site_options)
 
     if selected_site:
-        site_data = df[df['name'] == selected_site].iloc[0]
+        site_data = df_display[df_display['name'] == selected_site].iloc[0]
 
         col_d1, col_d2 = st.columns(2)
         with col_d1:
@@ -100,7 +121,7 @@ if not st.session_state.df.empty:
              st.write(f"APs: {site_data['aps_up']}/{site_data['aps_total']} Online")
 
         with st.expander("Raw Data"):
-            st.json(site_data.to_dict())
+            st.json(site_data.to_json())
 
         st.info("ZDX Data Integration: Pending API Access or Report Parsing implementation.")
 
@@ -6,6 +6,16 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# JSON-RPC status codes FMG returns for a missing or expired session.
+SESSION_EXPIRED_CODES = (-11,)
+
+def session_expired(data):
+    """True if a JSON-RPC response reports an invalid/expired session."""
+    try:
+        return data['result'][0]['status']['code'] in SESSION_EXPIRED_CODES
+    except (KeyError, IndexError, TypeError):
+        return False
+
 class FMGClient:
     def __init__(self, base_url, username, password, verify_ssl=False):
         """
@@ -22,6 +32,8 @@ class FMGClient:
         self.verify_ssl = verify_ssl
         self.session = requests.Session()
         self.session_id = None
+        # Set by session_manager.FMGSessionManager to re-login when FMG reports an expired session.
+        self.session_manager = None
 
         if not verify_ssl:
             requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
@@ -67,11 +79,44 @@ class FMGClient:
             logger.error(f"Login exception: {e}")
             return False
 
-    def get_managed_devices(self, adom="root"):
+    def _post(self, payload):
         """
-        Retrieve a list of managed devices in the specified ADOM.
+        Sends a JSON-RPC request with the current session and returns the decoded response.
+        If FMG reports the session as expired and a session manager is attached, the request
+        is retried once with the renewed session.
         """
         url = f"{self.base_url}/jsonrpc"
+        session_id = self.session_id
+        response = self.session.post(url, json=dict(payload, session=session_id) if session_id else payload, verify=self.verify_ssl)
+        response.raise_for_status()
+        data = response.json()
+        if self.session_manager is not None and session_expired(data) and self.session_manager.renew(session_id):
+            response = self.session.post(url, json=dict(payload, session=self.session_id), verify=self.verify_ssl)
+            response.raise_for_status()
+            data = response.json()
+        return data
+
+    def get_system_status(self):
+        """
+        Cheap authenticated call (FMG /sys/status), used to check that the session is alive.
+        Returns the status dict or None.
+        """
+        try:
+            data = self._post({"method": "get", "params": [{"url": "/sys/status"}], "id": 5})
+            if 'result' in data and data['result'][0]['status']['code'] == 0:
+                return data['result'][0].get('data', {})
+            return None
+        except Exception as e:
+            logger.error(f"Exception getting system status: {e}")
+            return None
+
+    def get_managed_devices(self, adom="root", fields=None):
+        """
+        Retrieve a list of managed devices in the specified ADOM.
+
+        :param fields: Optional list of attributes to return (e.g. ["name", "sn", "conn_status"])
+                       instead of the full device objects.
+        """
         payload = {
             "method": "get",
             "params": [
@@ -81,13 +126,11 @@ class FMGClient:
             ],
             "id": 2
         }
-        if self.session_id:
-            payload['session'] = self.session_id
+        if fields:
+            payload['params'][0]['fields'] = list(fields)
 
         try:
-            response = self.session.post(url, json=payload, verify=self.verify_ssl)
-            response.raise_for_status()
-            data = response.json()
+            data = self._post(payload)
 
             if 'result' in data and data['result'][0]['status']['code'] == 0:
                 return data['result'][0]['data']
@@ -105,8 +148,6 @@ class FMGClient:
         :param device_name: The name or serial number of the target device.
         :param command_api_path: The API path on the device (e.g., /api/v2/monitor/system/status).
         """
-        url = f"{self.base_url}/jsonrpc"
-
         # This payload structure is typical for FMG proxying to FGT
         payload = {
             "method": "exec",
@@ -122,13 +163,9 @@ class FMGClient:
             ],
             "id": 3
         }
-        if self.session_id:
-            payload['session'] = self.session_id
 
         try:
-            response = self.session.post(url, json=payload, verify=self.verify_ssl)
-            response.raise_for_status()
-            data = response.json()
+            data = self._post(payload)
 
             if 'result' in data and len(data['result']) > 0:
                 # The inner result from the device
@@ -160,8 +197,11 @@ class FMGClient:
             ],
             "id": 4
         }
+        if self.session_id:
+            payload['session'] = self.session_id
         try:
             self.session.post(url, json=payload, verify=self.verify_ssl)
+            self.session_id = None
             logger.info("Logged out.")
         except Exception:
             pass
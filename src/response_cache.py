@@ -0,0 +1,191 @@
+"""
+Cache for proxied FortiGate monitor responses, with a TTL per resource.
+
+The monitor endpoints change at very different rates: CPU/memory and SD-WAN health change
+every poll, interface addresses rarely do. Managed switch/AP status sits in between: the
+inventory rarely changes, but the same response carries the up/down state behind
+lan_switch_status/lan_ap_status, so it is only cached briefly and never served stale.
+ResponseCache sits in front of FMGClient.execute_device_command (see
+DataCollector._device_command):
+
+    age < ttl                    -> hit: served from cache
+    ttl <= age < ttl + max stale -> stale: served from cache, refreshed in the background
+                                    (max stale: MAX_STALE for the resource, else ttl * (stale_factor - 1))
+    older, or not cached         -> miss: fetched now
+    resource with no TTL         -> bypass: always fetched (reachability stays live)
+
+Entries live in an in-memory LRU and, with `disk_path`, in a small SQLite file, so cron
+runs and sharded worker processes share what earlier runs fetched. Failed fetches (None)
+are never cached and never replace a cached value.
+"""
+import concurrent.futures
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MANAGED_SWITCH = "/api/v2/monitor/switch-controller/managed-switch/status"
+MANAGED_AP = "/api/v2/monitor/wifi/managed-ap"
+
+# Seconds a response stays fresh. Resources not listed are not cached.
+DEFAULT_TTLS = {
+    MANAGED_SWITCH: 120,
+    MANAGED_AP: 120,
+    "/api/v2/monitor/system/available-interfaces": 3600,
+}
+# Seconds past the TTL an entry may still be served while it is refreshed. Switch/AP
+# status is never served stale, so a lost switch or AP shows within the TTL.
+MAX_STALE = {
+    MANAGED_SWITCH: 0,
+    MANAGED_AP: 0,
+}
+RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", "cache/fmg_responses.db")
+
+
+class DiskLayer:
+    """SQLite-backed key -> (stored_at, JSON value) store, safe to share between threads."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT stored_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def put(self, key, stored_at, value):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, stored_at, json.dumps(value))
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ResponseCache:
+    """
+    Usage:
+        cache = ResponseCache(disk_path=RESPONSE_CACHE_FILE)
+        value, state = cache.get("https://fmg|FGT-01", resource, lambda: client.execute_device_command(...))
+        cache.close()
+    """
+
+    def __init__(self, ttls=None, max_entries=10000, stale_factor=2.0, disk_path=None, refresh_workers=4, clock=time.time,
+                 max_stale=None):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_stale = {**MAX_STALE, **(max_stale or {})}
+        self.max_entries = max_entries
+        self.stale_factor = stale_factor
+        self.refresh_workers = refresh_workers
+        self.clock = clock
+        self.disk = DiskLayer(disk_path) if disk_path else None
+        self.stats = Counter()
+        self._entries = OrderedDict()  # cache key -> (stored_at, value), least recently used first
+        self._refreshing = set()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, cache_key):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                return entry
+        if self.disk is not None:
+            entry = self.disk.get(cache_key)
+            if entry is not None:
+                self._remember(cache_key, entry)
+        return entry
+
+    def _remember(self, cache_key, entry):
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store(self, cache_key, value):
+        entry = (self.clock(), value)
+        self._remember(cache_key, entry)
+        if self.disk is not None:
+            self.disk.put(cache_key, *entry)
+
+    def _revalidate(self, cache_key, fetch):
+        with self._lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.refresh_workers)
+        self._executor.submit(self._refresh, cache_key, fetch)
+
+    def _refresh(self, cache_key, fetch):
+        try:
+            value = fetch()
+            if value is not None:
+                self._store(cache_key, value)
+        except Exception as e:
+            logger.warning(f"Background refresh of {cache_key} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(cache_key)
+
+    def get(self, key, resource, fetch):
+        """
+        Returns (value, state) for `resource` of `key` (e.g. "<fmg url>|<device>"), calling
+        `fetch()` when needed. state is 'hit', 'stale', 'miss' or 'bypass'.
+        """
+        ttl = self.ttls.get(resource, 0)
+        if ttl <= 0:
+            self.stats['bypass'] += 1
+            return fetch(), 'bypass'
+
+        cache_key = f"{key}|{resource}"
+        entry = self._lookup(cache_key)
+        if entry is not None:
+            age = self.clock() - entry[0]
+            if age < ttl:
+                self.stats['hit'] += 1
+                return entry[1], 'hit'
+            if age < ttl + self.max_stale.get(resource, ttl * (self.stale_factor - 1)):
+                self.stats['stale'] += 1
+                self._revalidate(cache_key, fetch)
+                return entry[1], 'stale'
+
+        self.stats['miss'] += 1
+        value = fetch()
+        if value is not None:
+            self._store(cache_key, value)
+        return value, 'miss'
+
+    def wait(self):
+        """Waits for background refreshes in flight."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def close(self):
+        self.wait()
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
@@ -0,0 +1,200 @@
+"""
+Priority polling: degraded sites are polled more often than healthy ones.
+
+PollScheduler keeps every site in a heap keyed by its next due time. After each poll the
+site is rescheduled from its result:
+    - DOWN/Unreachable/Error or a Poor/Critical score -> `degraded_interval`
+    - Fair/Good                                       -> `base_interval`
+    - Excellent                                       -> `base_interval`, doubled (by `backoff`)
+                                                         for every `stable_after` consecutive
+                                                         Excellent polls
+No interval exceeds `max_staleness`, so every site is refreshed at least that often.
+"""
+import heapq
+import itertools
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+try:
+    from .collector import DataCollector
+    from .coordinator import to_site_record
+except ImportError:
+    from collector import DataCollector
+    from coordinator import to_site_record
+try:
+    from analysis.scoring import calculate_score, get_health_status
+    from utils.metrics import MetricsRegistry
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from analysis.scoring import calculate_score, get_health_status
+    from utils.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+DEGRADED_DEVICE_STATES = ("DOWN", "Unreachable", "Error")
+DEGRADED_HEALTH = ("Poor", "Critical")
+
+
+class PollScheduler:
+    """
+    Heap of (next_due, seq, site_id). Rescheduling pushes a new entry and bumps the site's
+    sequence number, so stale heap entries are skipped when popped instead of searched for.
+    """
+
+    def __init__(self, base_interval=300, degraded_interval=None, max_staleness=None,
+                 stable_after=3, backoff=2.0, clock=time.monotonic):
+        self.base_interval = base_interval
+        self.degraded_interval = degraded_interval or base_interval / 2
+        self.max_staleness = max_staleness or base_interval * 4
+        self.stable_after = stable_after
+        self.backoff = backoff
+        self.clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._entries = {}  # site_id -> seq of its live heap entry
+        self.streaks = {}  # site_id -> consecutive Excellent polls
+        self.health = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _push(self, site_id, due):
+        seq = next(self._seq)
+        self._entries[site_id] = seq
+        heapq.heappush(self._heap, (due, seq, site_id))
+
+    def add(self, site_id, due=None):
+        """Schedules a new site (immediately by default). Known sites are left as they are."""
+        if site_id not in self._entries:
+            self._push(site_id, self.clock() if due is None else due)
+
+    def remove(self, site_id):
+        self._entries.pop(site_id, None)
+        self.streaks.pop(site_id, None)
+        self.health.pop(site_id, None)
+
+    def due(self, now=None, limit=None):
+        """Pops and returns the site ids that are due, most overdue first."""
+        now = self.clock() if now is None else now
+        sites = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(sites) < limit):
+            _due, seq, site_id = heapq.heappop(self._heap)
+            if self._entries.get(site_id) == seq:
+                del self._entries[site_id]
+                sites.append(site_id)
+        return sites
+
+    def next_due(self):
+        """Time of the earliest live entry, or None if nothing is scheduled."""
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def interval_for(self, site_id, health):
+        if health == "Degraded" or health in DEGRADED_HEALTH:
+            interval = self.degraded_interval
+        elif health == "Excellent":
+            interval = self.base_interval * self.backoff ** (self.streaks.get(site_id, 0) // self.stable_after)
+        else:
+            interval = self.base_interval
+        return min(interval, self.max_staleness)
+
+    def report(self, site_id, health, now=None):
+        """Records a poll result ('Degraded' or a get_health_status value) and reschedules the site."""
+        now = self.clock() if now is None else now
+        self.streaks[site_id] = self.streaks.get(site_id, 0) + 1 if health == "Excellent" else 0
+        self.health[site_id] = health
+        interval = self.interval_for(site_id, health)
+        self._push(site_id, now + interval)
+        return interval
+
+
+def result_health(result):
+    """Health of one DataCollector device result, for PollScheduler.report."""
+    if result.get("status") in DEGRADED_DEVICE_STATES:
+        return "Degraded"
+    return get_health_status(calculate_score(to_site_record(result)))
+
+
+class ScheduledCollector:
+    """
+    Polls one FMG/ADOM continuously, fetching only the devices the scheduler says are due.
+
+    Usage:
+        ScheduledCollector(fmg_url, user, password, scheduler=PollScheduler(base_interval=300)).run()
+    """
+
+    def __init__(self, fmg_url, username, password, verify_ssl=False, adom="root",
+                 scheduler=None, device_refresh=3600, write_store=True, record_runs=False, detector=None, rolling=None,
+                 inventory=None, response_cache=None):
+        self.collector = DataCollector(fmg_url, username, password, verify_ssl, adom, record_runs=record_runs, inventory=inventory,
+                                       response_cache=response_cache)
+        self.scheduler = PollScheduler() if scheduler is None else scheduler
+        self.device_refresh = device_refresh
+        self.write_store = write_store
+        self.detector = detector
+        self.rolling = rolling
+        self.devices = {}
+        self._devices_at = None
+
+    def refresh_devices(self):
+        """
+        Reloads the device list and (un)schedules added or removed devices. An empty listing
+        (FMG returns [] on errors) keeps the known devices and is retried on the next poll.
+        """
+        devices = self.collector.list_devices()
+        if not devices:
+            logger.warning(f"FMG returned no devices, keeping the {len(self.devices)} known device(s) and retrying")
+            return
+        current = {d.get("name"): d for d in devices}
+        for name in self.devices.keys() - current.keys():
+            self.scheduler.remove(name)
+        for name in current:
+            self.scheduler.add(name)
+        self.devices = current
+        self._devices_at = self.scheduler.clock()
+
+    def poll_once(self, now=None):
+        """Polls every due device once. Returns the device results."""
+        if not self.collector.sessions.ensure():
+            logger.error("Failed to login to FMG")
+            return []
+        if self._devices_at is None or self.scheduler.clock() - self._devices_at >= self.device_refresh:
+            self.refresh_devices()
+
+        due = [self.devices[name] for name in self.scheduler.due(now) if name in self.devices]
+        if not due:
+            return []
+
+        started_at = datetime.utcnow()
+        self.collector.metrics = MetricsRegistry()
+        results, errors = self.collector.fetch_devices(due)
+        for result in results:
+            self.scheduler.report(result["name"], result_health(result))
+
+        if self.write_store:
+            from database.store import upsert_sites
+            upsert_sites([to_site_record(r) for r in results], detector=self.detector, rolling=self.rolling)
+        self.collector.devices = due
+        self.collector._finish_run(started_at, errors=errors)
+        logger.info(f"Polled {len(results)} due device(s), {errors} error(s)")
+        return results
+
+    def run(self, cycles=None, max_sleep=60):
+        """Polls until interrupted, or for `cycles` rounds that polled at least one device."""
+        if not self.collector.sessions.ensure():
+            logger.error("Failed to login to FMG")
+            return
+        try:
+            rounds = 0
+            while cycles is None or rounds < cycles:
+                if self.poll_once():
+                    rounds += 1
+                next_due = self.scheduler.next_due()
+                wait = max_sleep if next_due is None else next_due - self.scheduler.clock()
+                if wait > 0 and (cycles is None or rounds < cycles):
+                    time.sleep(min(wait, max_sleep))
+        finally:
+            self.collector.close()
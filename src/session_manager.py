@@ -0,0 +1,86 @@
+"""
+One long-lived FMG JSON-RPC session per client, shared by all threads that use it.
+
+FMGSessionManager attaches itself to an FMGClient. Collectors call `ensure()` before a
+sweep instead of login() and keep the session across sweeps:
+    - no session yet: log in
+    - idle longer than `keepalive_interval`: a cheap /sys/status call checks the session
+    - any call answered with an expired-session code (-11): FMGClient asks the manager to
+      renew, and retries once. Renewal is serialized, so when several threads hit the
+      expiry at once only the first logs in again and the others reuse its session.
+
+A session created elsewhere (e.g. by the coordinator, for its worker processes) can be
+adopted; the manager then never logs it out.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class FMGSessionManager:
+    """
+    Usage:
+        sessions = FMGSessionManager(client)
+        if sessions.ensure():
+            ...  # any number of sweeps, from any number of threads
+        sessions.close()
+    """
+
+    def __init__(self, client, keepalive_interval=240, clock=time.monotonic):
+        self.client = client
+        self.keepalive_interval = keepalive_interval
+        self.clock = clock
+        self.logins = 0
+        self.owned = False  # True if this manager logged in (and so should log out)
+        self._last_checked = None
+        self._lock = threading.Lock()
+        client.session_manager = self
+
+    def _login(self):
+        self.client.session_id = None
+        if not self.client.login():
+            return False
+        self.logins += 1
+        self.owned = True
+        self._last_checked = self.clock()
+        return True
+
+    def ensure(self):
+        """Makes sure there is a live session. Returns False if FMG refused the login."""
+        with self._lock:
+            if self.client.session_id is None:
+                return self._login()
+            if self._last_checked is not None and self.clock() - self._last_checked < self.keepalive_interval:
+                return True
+        # Outside the lock: an expired session comes back through renew().
+        alive = self.client.get_system_status() is not None
+        with self._lock:
+            if alive:
+                self._last_checked = self.clock()
+            return alive or self._login()
+
+    def renew(self, stale_session_id):
+        """Called by FMGClient when `stale_session_id` was rejected. Returns True if there is a new session."""
+        with self._lock:
+            if self.client.session_id is not None and self.client.session_id != stale_session_id:
+                return True  # another thread already logged in again
+            logger.info("FMG session expired, logging in again")
+            return self._login()
+
+    def adopt(self, session_id):
+        """Uses a session owned by someone else (not logged out by close())."""
+        with self._lock:
+            self.client.session_id = session_id
+            self.owned = False
+            self._last_checked = self.clock()
+
+    def close(self):
+        """Logs out if this manager owns the session."""
+        with self._lock:
+            if self.client.session_id is not None and self.owned:
+                self.client.logout()
+            self.client.session_id = None
+            self.owned = False
+            self._last_checked = None
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database.db as db
+from database.db import Base
+
+
+@pytest.fixture
+def engine():
+    """A fresh in-memory database with every table. Override it for a file-backed one."""
+    engine = create_engine('sqlite:///:memory:')
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session(engine):
+    """A session on `engine`, for code that takes the session as an argument."""
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def database(engine, monkeypatch):
+    """Points database.db.get_engine/get_session at `engine`, for code that opens its own sessions."""
+    monkeypatch.setattr(db, '_engine', engine)
+    monkeypatch.setattr(db, '_Session', sessionmaker(bind=engine))
+    return engine
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.baselines import Baselines, compute_baselines, hour_of_week
+
+def make_history():
+    rng = np.random.default_rng(0)
+    start = datetime(2024, 1, 1)  # Monday
+    rows = []
+    for step in range(4 * 168):
+        ts = start + timedelta(hours=step)
+        # An LTE branch that is always ~600ms, and a fibre branch ~20ms, busier on Monday 9:00.
+        rows.append(('LTE', ts, 600 + rng.normal(0, 20), 0.0, 5.0))
+        latency = 80 if hour_of_week(ts) == 9 else 20
+        rows.append(('FIBRE', ts, latency + rng.normal(0, 2), 0.0, 1.0))
+    return pd.DataFrame(rows, columns=['site_id', 'timestamp', 'latency_ms', 'packet_loss_pct', 'jitter_ms'])
+
+def test_baselines_are_per_site_and_hour(tmp_path):
+    baselines = compute_baselines(make_history())
+    assert baselines.site_ids == ['FIBRE', 'LTE']
+    assert baselines.median.shape == (2, 168, 3)
+
+    monday_9 = datetime(2024, 2, 5, 9)
+    assert abs(baselines.zscores('LTE', monday_9, latency_ms=610)['latency_ms']) < 2
+    assert abs(baselines.zscores('FIBRE', monday_9, latency_ms=80)['latency_ms']) < 2
+    assert baselines.zscores('FIBRE', monday_9 + timedelta(hours=1), latency_ms=80)['latency_ms'] > 10
+    assert baselines.zscores('UNKNOWN', monday_9, latency_ms=1) is None
+
+    path = str(tmp_path / 'baselines.npz')
+    baselines.save(path)
+    loaded = Baselines.load(path)
+    assert loaded.site_ids == baselines.site_ids
+    assert loaded.zscores('LTE', monday_9, latency_ms=900) == baselines.zscores('LTE', monday_9, latency_ms=900)
+
+def test_sparse_buckets_fall_back_and_frame_scoring():
+    df = make_history()
+    df = df[~((df['site_id'] == 'LTE') & (df['timestamp'].dt.dayofweek == 6))]
+    baselines = compute_baselines(df)
+    sunday = datetime(2024, 2, 4, 12)
+    assert baselines.zscores('LTE', sunday, latency_ms=600)['latency_ms'] == pytest.approx(0, abs=1)
+
+    samples = pd.DataFrame({
+        'site_id': ['LTE', 'FIBRE', 'NEW'], 'timestamp': [sunday] * 3,
+        'latency_ms': [600, 20, 5], 'packet_loss_pct': [0, 0, 0], 'jitter_ms': [5, 1, 1],
+    })
+    z = baselines.zscores_frame(samples)
+    assert z['latency_ms_z'].iloc[:2].abs().max() < 2
+    assert np.isnan(z['latency_ms_z'].iloc[2])
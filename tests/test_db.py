@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import database.db as db
+from database.store import upsert_sites
+
+# site_status as created by the first release, before the region column.
+BASELINE_SITE_STATUS = """
+CREATE TABLE site_status (
+    id INTEGER NOT NULL PRIMARY KEY,
+    site_id VARCHAR NOT NULL UNIQUE,
+    site_name VARCHAR NOT NULL,
+    wan_status BOOLEAN,
+    latency_ms FLOAT,
+    packet_loss_pct FLOAT,
+    jitter_ms FLOAT,
+    lan_switch_status BOOLEAN,
+    lan_ap_status BOOLEAN,
+    zdx_score FLOAT,
+    timestamp DATETIME
+)
+"""
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(BASELINE_SITE_STATUS))
+        connection.execute(text("INSERT INTO site_status (site_id, site_name, zdx_score) VALUES ('S1', 'Site 1', 80.0)"))
+    yield engine
+    engine.dispose()
+
+def test_init_db_upgrades_a_baseline_database(database):
+    db.init_db()
+    assert 'region' in {column['name'] for column in inspect(database).get_columns('site_status')}
+    assert db.add_missing_columns(database) == []
+
+    upsert_sites([{'site_id': 'S2', 'site_name': 'Site 2', 'region': 'EMEA', 'wan_status': True}])
+    session = db.get_session()
+    regions = {site.site_id: site.region for site in session.query(db.SiteStatus)}
+    session.close()
+    assert regions == {'S1': None, 'S2': 'EMEA'}
@@ -0,0 +1,50 @@
+from analysis.events import ChangeDetector
+
+def contribution(status='Excellent', wan_down=False, switch_down=False, ap_down=False):
+    return {'status': status, 'wan_down': wan_down, 'switch_down': switch_down, 'ap_down': ap_down}
+
+class ListSink:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, events):
+        self.events.extend(events)
+
+def test_transitions_are_debounced():
+    sink = ListSink()
+    detector = ChangeDetector(debounce=2, sinks=[sink])
+    detector.observe('fmg', [('S1', contribution()), ('S2', contribution())])
+
+    # A single bad sweep is not enough.
+    assert detector.observe('fmg', [('S1', contribution('Critical', wan_down=True))]) == []
+    assert detector.observe('fmg', [('S1', contribution())]) == []
+    assert detector.observe('fmg', [('S1', contribution('Critical', wan_down=True))]) == []
+
+    events = detector.observe('fmg', [('S1', contribution('Critical', wan_down=True)), ('S2', contribution())])
+    assert {(e['kind'], e['old_state'], e['new_state']) for e in events} == \
+        {('wan', 'UP', 'DOWN'), ('health', 'Excellent', 'Critical')}
+    assert all(e['site_id'] == 'S1' for e in events)
+    assert sink.events == events
+
+def test_lan_loss_and_recovery():
+    detector = ChangeDetector(debounce=1)
+    detector.observe('fmg', [('S1', contribution())])
+
+    events = detector.observe('fmg', [('S1', contribution('Good', ap_down=True))])
+    assert [(e['kind'], e['new_state']) for e in events] == [('health', 'Good'), ('ap', 'LOST')]
+
+    events = detector.observe('zdx', [('S1', contribution())])
+    assert [(e['kind'], e['new_state'], e['source']) for e in events] == \
+        [('health', 'Excellent', 'zdx'), ('ap', 'OK', 'zdx')]
+
+def test_failing_sink_does_not_stop_the_others():
+    class BrokenSink:
+        def emit(self, events):
+            raise OSError("disk full")
+
+    sink = ListSink()
+    detector = ChangeDetector(debounce=1, sinks=[BrokenSink(), sink])
+    detector.observe('fmg', [('S1', contribution())])
+    events = detector.observe('fmg', [('S1', contribution('Critical', wan_down=True))])
+    assert len(events) == 2
+    assert sink.events == events
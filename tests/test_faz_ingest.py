@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from collectors.faz_scraper import newest_position, parse_event_rows, site_updates
+from database.db import SiteStatus
+from database.store import build_site_index, get_cursor, save_cursor
+
+ROWS = [
+    {'log_id': '101', 'timestamp': '2024-01-01 10:00:00', 'device': 'FGT-SITE-001', 'message': 'Interface wan1 link down'},
+    {'log_id': '102', 'timestamp': '2024-01-01 10:05:00', 'device': 'FGT-SITE-002', 'message': 'Admin login successful'},
+    {'log_id': '103', 'timestamp': '2024-01-01 10:05:00', 'device': 'fgt-site-001', 'message': 'Interface wan1 link up'},
+    {'log_id': '104', 'timestamp': '2024-01-01 10:06:00', 'device': 'FGT-UNKNOWN', 'message': 'interface down'},
+    {'log_id': '105', 'timestamp': 'garbage', 'device': 'FGT-SITE-002', 'message': 'interface down'},
+]
+
+def test_parse_event_rows_respects_cursor():
+    events = parse_event_rows(ROWS)
+    assert [e['log_id'] for e in events] == ['101', '103', '104']
+
+    events = parse_event_rows(ROWS, cursor=(datetime(2024, 1, 1, 10, 5), '103'))
+    assert [e['log_id'] for e in events] == ['104']
+
+def test_cursor_advances_past_non_wan_rows_and_compares_ids_numerically():
+    rows = [
+        {'log_id': '9', 'timestamp': '2024-01-01 11:00:00', 'device': 'FGT-SITE-001', 'message': 'link down'},
+        {'log_id': '10', 'timestamp': '2024-01-01 11:00:00', 'device': 'FGT-SITE-001', 'message': 'link up'},
+        {'log_id': '11', 'timestamp': '2024-01-01 11:30:00', 'device': 'FGT-SITE-002', 'message': 'Admin login successful'},
+    ]
+    assert [e['log_id'] for e in parse_event_rows(rows)] == ['9', '10']
+    assert [e['log_id'] for e in parse_event_rows(rows, cursor=(datetime(2024, 1, 1, 11), '9'))] == ['10']
+
+    # The newest row is not a WAN event, but the cursor still moves past it.
+    cursor = newest_position(rows)
+    assert cursor == (datetime(2024, 1, 1, 11, 30), '11')
+    assert parse_event_rows(rows, cursor) == []
+    assert newest_position(rows, cursor) == cursor
+
+def test_site_index_and_cursor_round_trip(session):
+    session.add(SiteStatus(site_id='FGT-SITE-001', site_name='Branch 1'))
+    session.commit()
+
+    index = build_site_index(session)
+    assert index['fgt-site-001'] == 'FGT-SITE-001'
+    assert index['branch 1'] == 'FGT-SITE-001'
+
+    records, unmatched = site_updates(parse_event_rows(ROWS), index)
+    assert records == [{'site_id': 'FGT-SITE-001', 'wan_status': True}]
+    assert unmatched == {'FGT-UNKNOWN'}
+
+    assert get_cursor(session, 'faz_events') == (None, None)
+    save_cursor(session, 'faz_events', datetime(2024, 1, 1, 10, 6), '104')
+    session.commit()
+    assert get_cursor(session, 'faz_events') == (datetime(2024, 1, 1, 10, 6), '104')
@@ -0,0 +1,85 @@
+import unittest
+import logging
+
+from src.fmg_client import FMGClient
+from src.collector import DataCollector, device_details, results_frame
+from src.coordinator import ShardedCollector, find_name_collisions, plan_work_units
+from utils.fmg_simulator import FMGSimulator, SYSTEM_STATUS
+
+logging.getLogger("src").setLevel(logging.CRITICAL)
+
+class TestFMGSimulator(unittest.TestCase):
+    def test_client_round_trip(self):
+        with FMGSimulator(num_devices=5, seed=1) as fmg:
+            client = FMGClient(fmg.url, "admin", "password")
+            self.assertTrue(client.login())
+
+            devices = client.get_managed_devices()
+            self.assertEqual(len(devices), 5)
+            self.assertNotIn("_cpu", devices[0])
+
+            status = client.execute_device_command(devices[0]["name"], SYSTEM_STATUS)
+            self.assertIn("cpu", status["results"])
+
+    def test_rejects_bad_credentials_and_sessions(self):
+        with FMGSimulator(num_devices=1) as fmg:
+            client = FMGClient(fmg.url, "admin", "wrong")
+            self.assertFalse(client.login())
+            self.assertEqual(client.get_managed_devices(), [])
+            self.assertEqual(fmg.stats()["invalid_session"], 1)
+
+    def test_collector_with_injected_faults(self):
+        with FMGSimulator(num_devices=40, down_fraction=0.25, error_rate=1.0, seed=3) as fmg:
+            df = DataCollector(fmg.url, "admin", "password").fetch_all_data()
+
+            self.assertEqual(len(df), 40)
+            self.assertEqual((df["status"] == "DOWN").sum(), 10)
+            # Every proxied call fails, so every connected device is unreachable.
+            self.assertEqual((df["status"] == "Unreachable").sum(), 30)
+            self.assertGreaterEqual(fmg.stats()["max_in_flight"], 1)
+            self.assertEqual(str(df["status"].dtype), "category")
+            self.assertEqual(str(df["cpu"].dtype), "float32")
+            self.assertEqual(str(df["switches_total"].dtype), "uint16")
+            self.assertNotIn("details", df.columns)
+
+    def test_results_frame_chunks_and_details(self):
+        results = [
+            {"name": f"FGT-{i}", "serial": f"SN{i}", "status": "UP", "cpu": i, "mem": 40,
+             "switches_total": 2, "switches_up": 1, "aps_total": 4, "aps_up": 4, "wan_members_up": 2,
+             "latency_ms": 12.5, "packet_loss_pct": 0.0, "jitter_ms": 1.0}
+            for i in range(5)
+        ] + [{"name": "FGT-X", "serial": "SNX", "status": "Error", "cpu": 0, "mem": 0, "switches_total": 0,
+              "switches_up": 0, "aps_total": 0, "aps_up": 0, "error": "timeout"}]
+
+        df = results_frame(iter(results), chunk_rows=2)
+        self.assertEqual(len(df), 6)
+        self.assertEqual(list(df["status"].cat.categories), ["UP", "DOWN", "Unreachable", "Error"])
+        self.assertEqual(df["latency_ms"].iloc[-1], 0.0)
+        self.assertEqual(device_details(df.iloc[0]), "Switches: 1/2 UP, APs: 4/4 UP")
+        self.assertEqual(device_details(df.iloc[-1]), "Error: timeout")
+        self.assertEqual(len(results_frame([])), 0)
+
+    def test_sharded_collection_across_fmgs(self):
+        with FMGSimulator(num_devices=12, seed=4) as eu, FMGSimulator(num_devices=5, adom="retail", seed=5) as us:
+            targets = [
+                {"name": "eu", "url": eu.url, "username": "admin", "password": "password", "adoms": ["root"], "verify_ssl": False},
+                {"name": "us", "url": us.url, "username": "admin", "password": "password", "adoms": ["retail"], "verify_ssl": False},
+            ]
+            units = plan_work_units(targets, shard_size=5)
+            self.assertEqual([len(u["devices"]) for u in units], [5, 5, 2, 5])
+
+            collector = ShardedCollector(targets, workers=2, shard_size=5, write_store=False)
+            results = collector.run()
+
+            self.assertEqual(len(results), 17)
+            self.assertEqual(collector.summary["total_sites"], 17)
+            self.assertEqual(sorted({(r["fmg"], r["adom"]) for r in results}), [("eu", "root"), ("us", "retail")])
+            self.assertEqual(collector.last_run["stages"]["fmg_proxy_call_seconds"]["count"], 17 * 4)
+
+            # Both simulators name their devices FGT-SITE-001...; those sites would collide.
+            collisions = find_name_collisions(results)
+            self.assertEqual(sorted(collisions), [f"FGT-SITE-{i:03d}" for i in range(1, 6)])
+            self.assertEqual(collisions["FGT-SITE-001"], ["eu/root", "us/retail"])
+
+if __name__ == '__main__':
+    unittest.main()
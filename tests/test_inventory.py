@@ -0,0 +1,59 @@
+import logging
+from datetime import datetime, timedelta
+
+from database.inventory import InventoryCache, inventory_scope, load_inventory
+from src.collector import DataCollector
+from utils.fmg_simulator import FMGSimulator
+
+logging.getLogger("src").setLevel(logging.CRITICAL)
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1)
+
+    def __call__(self):
+        return self.now
+
+def test_device_list_is_reused_until_it_changes(database, session):
+    clock = Clock()
+    inventory = InventoryCache(ttl=600, clock=clock)
+    with FMGSimulator(num_devices=6, seed=1) as fmg:
+        collector = DataCollector(fmg.url, "admin", "password", inventory=inventory)
+        assert collector.client.login()
+
+        assert len(collector.list_devices()) == 6
+        assert (fmg.stats()["device_list"], inventory.misses) == (1, 1)
+
+        # Unchanged inventory: only the light name/sn/conn_status listing, with fresh states.
+        fmg.devices[0]["conn_status"] = 0
+        devices = collector.list_devices()
+        assert {d["name"]: d["conn_status"] for d in devices}[fmg.devices[0]["name"]] == 0
+        assert devices[0]["platform_str"] == "FortiGate-60F"
+        assert (fmg.stats()["device_list"], fmg.stats()["device_states"], inventory.hits) == (1, 1, 1)
+
+        # A new device changes the fingerprint and forces a full listing.
+        fmg.devices.append(fmg._make_device(99))
+        assert len(collector.list_devices()) == 7
+        assert fmg.stats()["device_list"] == 2
+
+        # So does an expired TTL.
+        clock.now += timedelta(seconds=601)
+        collector.list_devices()
+        assert fmg.stats()["device_list"] == 3
+
+        # The cached list is stored in the database and shared: another collector skips the FMG listing entirely.
+        scope = inventory_scope(fmg.url, "root")
+        devices, fetched_at, _digest = load_inventory(session, scope)
+        assert (len(devices), fetched_at) == (7, clock.now)
+        assert len(InventoryCache(ttl=600, clock=clock).cached(scope)) == 7
+        collector.client.logout()
+
+def test_fetch_all_data_uses_the_inventory_cache(database):
+    inventory = InventoryCache(ttl=600)
+    with FMGSimulator(num_devices=5, seed=2) as fmg:
+        collector = DataCollector(fmg.url, "admin", "password", inventory=inventory)
+        assert len(collector.fetch_all_data()) == 5
+        assert len(collector.fetch_all_data()) == 5
+        assert (fmg.stats()["device_list"], fmg.stats()["device_states"]) == (1, 1)
+        assert (inventory.misses, inventory.hits) == (1, 1)
+        collector.close()
@@ -0,0 +1,36 @@
+import pytest
+from utils.metrics import Histogram, MetricsRegistry
+
+def test_histogram_percentiles():
+    histogram = Histogram(buckets=(1, 2, 5, 10))
+    for value in [0.5] * 50 + [1.5] * 45 + [8] * 5:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.percentile(0.5) <= 1
+    assert 1 < histogram.percentile(0.95) <= 2
+    assert 5 < histogram.percentile(0.99) <= 8
+
+def test_registry_merge_and_top():
+    run = MetricsRegistry()
+    run.observe("fmg_proxy_call_seconds", 0.2, device="FGT-1", resource="a")
+    run.observe("fmg_proxy_call_seconds", 0.3, device="FGT-1", resource="b")
+    run.observe("fmg_proxy_call_seconds", 0.1, device="FGT-2", resource="a")
+
+    total = MetricsRegistry()
+    total.merge(run)
+    total.merge(run)
+
+    assert total.stage_summary()["fmg_proxy_call_seconds"]["count"] == 6
+    assert total.top("fmg_proxy_call_seconds", "device", n=1) == [{"device": "FGT-1", "seconds": pytest.approx(1.0)}]
+
+def test_prometheus_exposition():
+    registry = MetricsRegistry()
+    registry.observe("fmg_login_seconds", 0.02)
+    registry.inc("collection_runs_total", collector='fmg"api')
+
+    text = registry.to_prometheus()
+    assert '# TYPE fmg_login_seconds histogram' in text
+    assert 'fmg_login_seconds_bucket{le="+Inf"} 1' in text
+    assert 'fmg_login_seconds_count 1' in text
+    assert 'collection_runs_total{collector="fmg\\"api"} 1' in text
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from database.db import SiteStatus
+from utils.mock_data import generate_fleet_history, generate_mock_data
+
+END = datetime(2024, 3, 1)
+FIELDS = ('site_id', 'region', 'wan_status', 'latency_ms', 'packet_loss_pct', 'jitter_ms',
+          'lan_switch_status', 'lan_ap_status', 'zdx_score')
+
+def history(seed, num_sites=200, timesteps=300):
+    chunks = list(generate_fleet_history(num_sites=num_sites, timesteps=timesteps, seed=seed, end=END, chunk_rows=10_000))
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+
+def snapshot_sites(session):
+    session.expire_all()  # generate_mock_data writes through its own session
+    return [tuple(getattr(site, f) for f in FIELDS) for site in session.query(SiteStatus).order_by(SiteStatus.site_id)]
+
+def test_mock_snapshot_is_reproducible_with_a_seed(database, session):
+    generate_mock_data(num_sites=50, seed=7)
+    first = snapshot_sites(session)
+    generate_mock_data(num_sites=50, seed=7)
+    assert snapshot_sites(session) == first
+    generate_mock_data(num_sites=50, seed=8)
+    assert snapshot_sites(session) != first
+
+def test_fleet_history_is_reproducible_with_a_seed():
+    first, second, other = history(1), history(1), history(2)
+    for key in first:
+        assert np.array_equal(first[key], second[key])
+    assert not np.array_equal(first['latency_ms'], other['latency_ms'])
+
+def test_fleet_history_metrics_are_correlated():
+    data = history(3)
+    up = data['wan_status']
+
+    # WAN down means no latency/jitter and a failing score.
+    assert (data['latency_ms'][~up] == 0).all() and (data['jitter_ms'][~up] == 0).all()
+    assert data['zdx_score'][~up].max() < data['zdx_score'][up].mean()
+
+    # Lossy samples also run slower and score worse than clean ones.
+    lossy = up & (data['packet_loss_pct'] >= 1)
+    clean = up & (data['packet_loss_pct'] == 0) & (data['jitter_ms'] <= 8)
+    assert data['latency_ms'][lossy].mean() > data['latency_ms'][clean].mean()
+    assert data['zdx_score'][lossy].mean() < data['zdx_score'][clean].mean()
+    assert np.corrcoef(data['latency_ms'][up], data['zdx_score'][up])[0, 1] < 0
+
+    # Incidents persist: a site down at one step is usually still down at the next.
+    wan_down = (~up).reshape(300, 200)
+    assert (wan_down[1:] & wan_down[:-1]).sum() / wan_down[:-1].sum() > 0.8
+
+def test_parquet_rerun_replaces_mock_parts(tmp_path):
+    from database.snapshot import load_history, partition_files
+    from utils.mock_data import write_fleet_history_parquet
+
+    def write(chunk_rows):
+        chunks = generate_fleet_history(num_sites=10, timesteps=12, interval_minutes=60, seed=1,
+                                        end=datetime(2024, 3, 1, 11), chunk_rows=chunk_rows)
+        return write_fleet_history_parquet(chunks, snapshot_dir=str(tmp_path))
+
+    assert write(chunk_rows=20) == 120
+    assert len(partition_files(END.date(), str(tmp_path))) == 6
+    assert write(chunk_rows=1000) == 120
+    assert len(partition_files(END.date(), str(tmp_path))) == 1
+    assert load_history(END, END + timedelta(days=1), snapshot_dir=str(tmp_path)).num_rows == 120
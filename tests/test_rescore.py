@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, insert, update
+
+import database.db as db
+from database.db import Base, SiteStatus, SiteStatusHistory, FleetSummaryHourly, IngestCursor
+from database.rescore import rescore_history
+from database.summary import get_fleet_summary, rebuild_summary
+
+START = datetime(2024, 3, 4, 10)
+
+@pytest.fixture
+def engine(tmp_path):
+    # A file, so the process pool can open it.
+    engine = create_engine(f"sqlite:///{tmp_path / 'rescore.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def database(database):
+    # 91 samples with stale scores of 50; every 10th has its WAN down, the last has no WAN status.
+    rows = [{
+        'site_id': f'SITE-{i % 3}', 'wan_status': i % 10 != 0, 'lan_switch_status': True, 'lan_ap_status': True,
+        'latency_ms': 20.0 + i, 'packet_loss_pct': 0.0, 'jitter_ms': 1.0, 'zdx_score': 50.0,
+        'timestamp': START + timedelta(minutes=i),
+    } for i in range(91)]
+    session = db.get_session()
+    session.execute(insert(SiteStatusHistory), rows)
+    session.add_all([
+        FleetSummaryHourly(hour=START, samples=60, score_sum=3000.0, critical_samples=0, wan_down_samples=6),
+        FleetSummaryHourly(hour=START + timedelta(hours=1), samples=31, score_sum=1550.0, critical_samples=0, wan_down_samples=4),
+        SiteStatus(site_id='SITE-0', site_name='Zero', wan_status=True, latency_ms=20.0, zdx_score=10.0),
+        SiteStatus(site_id='SITE-1', site_name='One', latency_ms=20.0, zdx_score=10.0),
+    ])
+    # The ORM applies the column default to None, so clear the NULL statuses afterwards.
+    session.execute(update(SiteStatusHistory).where(SiteStatusHistory.id == 91).values(wan_status=None))
+    session.execute(update(SiteStatus).where(SiteStatus.site_id == 'SITE-1').values(wan_status=None))
+    rebuild_summary(session)
+    session.commit()
+    session.close()
+    return database
+
+def check_rescored():
+    session = db.get_session()
+    try:
+        history = session.query(SiteStatusHistory).order_by(SiteStatusHistory.id).all()
+        for i, row in enumerate(history):
+            expected = 0.0 if i % 10 == 0 else round(100 - max(0, (20 + i - 50) / 10), 1)
+            assert row.zdx_score == expected
+
+        hourly = {h.hour: h for h in session.query(FleetSummaryHourly)}
+        for hour, rows in ((START, history[:60]), (START + timedelta(hours=1), history[60:])):
+            assert hourly[hour].score_sum == pytest.approx(sum(r.zdx_score for r in rows))
+            assert hourly[hour].critical_samples == sum(r.zdx_score == 0 for r in rows)
+
+        assert {s.site_id: s.zdx_score for s in session.query(SiteStatus)} == {'SITE-0': 100.0, 'SITE-1': 0.0}
+        assert get_fleet_summary(session)['avg_score'] == 50.0
+        assert session.get(IngestCursor, 'rescore') is None
+    finally:
+        session.close()
+
+def test_rescore_inline(database):
+    messages = []
+    result = rescore_history(workers=1, chunk_size=25, progress=messages.append)
+    assert (result['rows'], result['changed'], result['sites']) == (91, 91, 2)
+    assert len(messages) == 4 and messages[-1].startswith("Rescored 91/91 rows (100%)")
+    check_rescored()
+
+    # A second run finds nothing to change.
+    assert rescore_history(workers=1, chunk_size=25, progress=messages.append)['changed'] == 0
+
+def test_rescore_in_process_pool_resumes_from_checkpoint(database):
+    from database.store import save_cursor
+
+    session = db.get_session()
+    save_cursor(session, 'rescore', START, '30')
+    session.commit()
+    session.close()
+
+    messages = []
+    result = rescore_history(workers=2, chunk_size=20, progress=messages.append)
+    assert messages[0] == "Resuming after history id 30."
+    assert (result['rows'], result['changed']) == (61, 61)
+
+    rescore_history(workers=2, chunk_size=20, restart=True, progress=messages.append)
+    check_rescored()
@@ -0,0 +1,90 @@
+import logging
+import threading
+
+from src.collector import DataCollector
+from src.response_cache import DEFAULT_TTLS, ResponseCache
+from utils.fmg_simulator import FMGSimulator, HEALTH_CHECK, MANAGED_AP, MANAGED_SWITCH, SYSTEM_STATUS
+
+logging.getLogger("src").setLevel(logging.CRITICAL)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_slow_endpoints_are_cached_across_sweeps():
+    clock = Clock()
+    cache = ResponseCache(clock=clock)
+    with FMGSimulator(num_devices=8, seed=3) as fmg:
+        collector = DataCollector(fmg.url, "admin", "password", response_cache=cache)
+        first = collector.fetch_all_data()
+        clock.now += 60
+        second = collector.fetch_all_data()
+
+        stats = fmg.stats()
+        up = int((first["status"] == "UP").sum())
+        assert stats[f"proxy:{SYSTEM_STATUS}"] == stats[f"proxy:{HEALTH_CHECK}"] == 2 * up
+        assert stats[f"proxy:{MANAGED_SWITCH}"] == stats[f"proxy:{MANAGED_AP}"] == up
+        totals = lambda df: dict(zip(df["name"], df["switches_total"]))
+        assert totals(second) == totals(first)
+        assert collector.metrics.to_prometheus().count('result="hit"') == 2
+        collector.close()
+    cache.close()
+
+def test_stale_entry_is_served_and_refreshed_in_the_background():
+    clock = Clock()
+    cache = ResponseCache(ttls={"/r": 10}, clock=clock)
+    calls = []
+    release = threading.Event()
+
+    def fetch(value):
+        def call():
+            calls.append(value)
+            release.wait(5)
+            return value
+        return call
+
+    release.set()
+    assert cache.get("fgt", "/r", fetch("v1")) == ("v1", "miss")
+    assert cache.get("fgt", "/r", fetch("unused")) == ("v1", "hit")
+
+    # Past the TTL but within stale_factor * TTL: the old value is returned at once.
+    clock.now += 15
+    release.clear()
+    assert cache.get("fgt", "/r", fetch("v2")) == ("v1", "stale")
+    assert cache.get("fgt", "/r", fetch("v3")) == ("v1", "stale")  # refresh already in flight
+    release.set()
+    cache.wait()
+    assert calls == ["v1", "v2"]
+    assert cache.get("fgt", "/r", fetch("unused")) == ("v2", "hit")
+
+    # Too old to serve, and a failed fetch is not cached.
+    clock.now += 100
+    assert cache.get("fgt", "/r", lambda: None) == (None, "miss")
+    assert cache.get("fgt", "/other", fetch("live")) == ("live", "bypass")
+    cache.close()
+
+def test_switch_status_is_never_served_stale():
+    clock = Clock()
+    cache = ResponseCache(clock=clock)
+    cache.get("fgt", MANAGED_SWITCH, lambda: {"up": 2})
+    assert cache.get("fgt", MANAGED_SWITCH, lambda: {"up": 1}) == ({"up": 2}, "hit")
+    clock.now += DEFAULT_TTLS[MANAGED_SWITCH]
+    assert cache.get("fgt", MANAGED_SWITCH, lambda: {"up": 1}) == ({"up": 1}, "miss")
+    cache.close()
+
+def test_disk_layer_is_shared_and_memory_is_bounded(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "cache" / "responses.db")
+    cache = ResponseCache(ttls={"/r": 60}, max_entries=2, disk_path=path, clock=clock)
+    for name in ("a", "b", "c"):
+        cache.get(name, "/r", lambda: {"name": name})
+    assert len(cache) == 2
+    cache.close()
+
+    other = ResponseCache(ttls={"/r": 60}, disk_path=path, clock=clock)
+    assert other.get("a", "/r", lambda: None) == ({"name": "a"}, "hit")
+    assert len(other) == 1
+    other.close()
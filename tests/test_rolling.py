@@ -0,0 +1,51 @@
+import pytest
+
+from analysis.rolling import RollingStats, SiteWindow
+
+def test_single_spike_does_not_flip_score():
+    stats = RollingStats(window=10, alpha=0.2)
+    for _ in range(10):
+        stats.update('S1', latency_ms=20, packet_loss_pct=0, jitter_ms=2)
+    stats.update('S1', latency_ms=400, packet_loss_pct=0, jitter_ms=2)
+
+    metrics = stats.smoothed_metrics('S1')
+    assert metrics['latency_ms'] == pytest.approx(20 + 0.2 * 380)
+    assert stats.score('S1') == pytest.approx(100 - (96 - 50) / 10)
+
+def test_window_percentile_slides():
+    window = SiteWindow(window=20)
+    for _ in range(20):
+        window.update(300, 0, 0)
+    assert 250 < window.latency_percentile(0.95) <= 300
+
+    for _ in range(20):
+        window.update(8, 0, 0)
+    assert window.latency_percentile(0.95) <= 10
+    assert sum(window.buckets) == 20
+
+def test_loss_bursts():
+    stats = RollingStats(window=5)
+    for loss in (0, 2, 3, 0, 5, 5, 5):
+        stats.update('S1', packet_loss_pct=loss)
+    metrics = stats.smoothed_metrics('S1')
+    assert metrics['loss_burst'] == 3
+    assert metrics['longest_loss_burst'] == 3
+    assert metrics['lossy_samples'] == 4  # last five samples: 3, 0, 5, 5, 5
+    assert stats.smoothed_metrics('unknown') is None
+
+def test_records_without_metrics_add_no_samples(session):
+    from database.store import upsert_sites
+
+    stats = RollingStats(window=10)
+
+    upsert_sites([{'site_id': 'S1', 'latency_ms': 80.0, 'packet_loss_pct': 0.0}], session=session, source='zdx', rolling=stats)
+    # FMG sweeps without SD-WAN members carry no metrics: the ZDX sample must not be repeated.
+    for _ in range(3):
+        upsert_sites([{'site_id': 'S1', 'wan_status': True}], session=session, rolling=stats)
+    assert stats.sites['S1'].samples == 1
+
+    # Metrics missing from a sample keep their smoothed value.
+    upsert_sites([{'site_id': 'S1', 'latency_ms': 40.0}], session=session, source='zdx', rolling=stats)
+    metrics = stats.smoothed_metrics('S1')
+    assert metrics['latency_ms'] == pytest.approx(80 + 0.2 * (40 - 80))
+    assert (metrics['packet_loss_pct'], metrics['jitter_ms']) == (0.0, 0.0)
@@ -0,0 +1,80 @@
+from src.scheduler import PollScheduler, result_health
+
+def make_scheduler():
+    return PollScheduler(base_interval=60, degraded_interval=15, max_staleness=240, stable_after=2)
+
+def test_degraded_sites_are_polled_first_and_more_often():
+    scheduler = make_scheduler()
+    for site in ('A', 'B'):
+        scheduler.add(site, due=0)
+
+    assert scheduler.due(now=0) == ['A', 'B']
+    assert scheduler.report('A', 'Critical', now=0) == 15
+    assert scheduler.report('B', 'Good', now=0) == 60
+
+    assert scheduler.due(now=30) == ['A']
+    scheduler.report('A', 'Degraded', now=30)
+    assert scheduler.due(now=60) == ['A', 'B']
+
+def test_excellent_sites_back_off_up_to_max_staleness():
+    scheduler = make_scheduler()
+    intervals = [scheduler.report('A', 'Excellent', now=0) for _ in range(8)]
+    assert intervals == [60, 120, 120, 240, 240, 240, 240, 240]
+
+    # One bad poll resets the streak.
+    assert scheduler.report('A', 'Poor', now=0) == 15
+    assert scheduler.report('A', 'Excellent', now=0) == 60
+
+def test_removed_sites_are_not_returned():
+    scheduler = make_scheduler()
+    scheduler.add('A', due=0)
+    scheduler.add('B', due=5)
+    scheduler.remove('A')
+    assert scheduler.next_due() == 5
+    assert scheduler.due(now=10) == ['B']
+    assert len(scheduler) == 0
+
+def test_result_health():
+    assert result_health({'name': 'X', 'status': 'Unreachable'}) == 'Degraded'
+    up = {'name': 'X', 'status': 'UP', 'switches_total': 2, 'switches_up': 2, 'aps_total': 4, 'aps_up': 4}
+    assert result_health(up) == 'Excellent'
+    assert result_health(dict(up, aps_up=3)) == 'Good'
+
+def test_scheduled_collector_polls_only_due_devices():
+    from utils.fmg_simulator import FMGSimulator
+    from src.scheduler import ScheduledCollector
+
+    clock = [0.0]
+    with FMGSimulator(num_devices=6, down_fraction=0.5, seed=2) as fmg:
+        scheduler = PollScheduler(base_interval=60, degraded_interval=15, clock=lambda: clock[0])
+        poller = ScheduledCollector(fmg.url, 'admin', 'password', scheduler=scheduler, write_store=False)
+        assert poller.collector.client.login()
+
+        assert len(poller.poll_once()) == 6
+        clock[0] = 20
+        polled = poller.poll_once()
+        assert len(polled) == 3
+        assert {r['status'] for r in polled} == {'DOWN'}
+
+def test_failed_device_listing_keeps_devices_scheduled():
+    from utils.fmg_simulator import FMGSimulator
+    from src.scheduler import ScheduledCollector
+
+    clock = [0.0]
+    with FMGSimulator(num_devices=4, seed=2) as fmg:
+        scheduler = PollScheduler(base_interval=60, clock=lambda: clock[0])
+        poller = ScheduledCollector(fmg.url, 'admin', 'password', scheduler=scheduler, write_store=False, device_refresh=3600)
+        assert len(poller.poll_once()) == 4
+
+        # The listing fails once the refresh is due: devices stay scheduled and it is retried.
+        clock[0] = 3600
+        list_devices = poller.collector.list_devices
+        poller.collector.list_devices = lambda: []
+        assert len(poller.poll_once()) == 4
+        assert len(scheduler) == 4
+
+        poller.collector.list_devices = list_devices
+        clock[0] = 3660
+        assert len(poller.poll_once()) == 4
+        assert poller._devices_at == 3660
+        poller.collector.close()
@@ -71,3 +71,25 @@ def test_score_floor():
     }
     # Total deduction: 120 -> Score 0
     assert calculate_score(metrics) == 0.0
+
+def test_vectorized_scores_match_scalar():
+    import random
+    from analysis.scoring import calculate_scores
+
+    rng = random.Random(7)
+    samples = [
+        {
+            'wan_status': rng.random() > 0.1,
+            'lan_switch_status': rng.random() > 0.2,
+            'lan_ap_status': rng.random() > 0.2,
+            'latency_ms': rng.uniform(0, 400),
+            'packet_loss_pct': rng.uniform(0, 10),
+            'jitter_ms': rng.uniform(0, 80)
+        }
+        for _ in range(500)
+    ]
+    columns = {key: [s[key] for s in samples] for key in samples[0]}
+    scores = calculate_scores(**columns)
+
+    for sample, score in zip(samples, scores):
+        assert score == pytest.approx(calculate_score(sample), abs=0.1)
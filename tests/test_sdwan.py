@@ -0,0 +1,32 @@
+from analysis.sdwan import parse_health_check, site_wan_metrics
+from src.coordinator import to_site_record
+
+RESPONSE = {'results': {
+    'SLA_Internet': {
+        'wan1': {'status': 'up', 'latency': 12.5, 'jitter': 1.0, 'packet_loss': 0.0},
+        'wan2': {'status': 'up', 'latency': 48.0, 'jitter': 4.0, 'packet_loss': 1.5},
+        'lte1': {'status': 'down', 'latency': 0, 'jitter': 0, 'packet_loss': 100},
+    },
+}}
+
+def test_parse_and_reduce_members():
+    members = parse_health_check(RESPONSE)
+    assert len(members) == 3
+    assert members[2] == {'health_check': 'SLA_Internet', 'member': 'lte1', 'status': False,
+                          'latency_ms': 0.0, 'jitter_ms': 0.0, 'packet_loss_pct': 100.0}
+
+    assert site_wan_metrics(members) == {'latency_ms': 48.0, 'packet_loss_pct': 1.5, 'jitter_ms': 4.0}
+    assert site_wan_metrics(members, mode='mean')['latency_ms'] == 30.25
+    assert site_wan_metrics(members[2:]) is None
+    assert parse_health_check(None) == []
+
+def test_site_record_uses_members():
+    members = parse_health_check(RESPONSE)
+    result = {'name': 'FGT-1', 'status': 'UP', 'sdwan_members': members, 'wan_members_up': 2,
+              **site_wan_metrics(members)}
+    record = to_site_record(result)
+    assert record['wan_status'] is True
+    assert record['latency_ms'] == 48.0
+
+    down = parse_health_check({'sla': {'wan1': {'status': 'down'}}})
+    assert to_site_record({'name': 'FGT-2', 'status': 'UP', 'sdwan_members': down, 'wan_members_up': 0})['wan_status'] is False
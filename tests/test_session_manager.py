@@ -0,0 +1,56 @@
+import logging
+
+from src.collector import DataCollector
+from src.coordinator import ShardedCollector
+from src.fmg_client import FMGClient
+from src.session_manager import FMGSessionManager
+from utils.fmg_simulator import FMGSimulator
+
+logging.getLogger("src").setLevel(logging.CRITICAL)
+
+def test_session_is_kept_across_sweeps_and_renewed_once_on_expiry():
+    with FMGSimulator(num_devices=30, seed=5) as fmg:
+        collector = DataCollector(fmg.url, "admin", "password")
+        assert len(collector.fetch_all_data()) == 30
+        assert len(collector.fetch_all_data()) == 30
+        assert fmg.stats()["login"] == 1
+
+        # Every worker thread hits the expired session; only one of them logs in again.
+        fmg.expire_sessions()
+        df = collector.fetch_all_data()
+        assert (df["status"] == "UP").all()
+        assert fmg.stats()["login"] == 2
+        assert collector.sessions.logins == 2
+
+        collector.close()
+        assert fmg.stats()["logout"] == 1
+        assert fmg.stats()["sessions"] == 0
+
+def test_idle_session_is_checked_before_reuse():
+    now = [0.0]
+    with FMGSimulator(num_devices=1) as fmg:
+        sessions = FMGSessionManager(FMGClient(fmg.url, "admin", "password"), keepalive_interval=60, clock=lambda: now[0])
+        assert sessions.ensure()
+        assert sessions.ensure()
+        assert fmg.stats().get("sys_status", 0) == 0
+
+        now[0] = 61
+        assert sessions.ensure()
+        assert (fmg.stats()["sys_status"], fmg.stats()["login"]) == (1, 1)
+
+        now[0] = 200
+        fmg.expire_sessions()
+        assert sessions.ensure()
+        assert fmg.stats()["login"] == 2
+
+def test_sharded_workers_share_the_coordinator_session():
+    with FMGSimulator(num_devices=12, seed=4) as fmg:
+        targets = [{"name": "eu", "url": fmg.url, "username": "admin", "password": "password",
+                    "adoms": ["root"], "verify_ssl": False}]
+        collector = ShardedCollector(targets, workers=2, shard_size=4, write_store=False)
+        assert len(collector.run()) == 12
+        assert len(collector.run()) == 12
+        assert fmg.stats()["login"] == 1
+
+        collector.close()
+        assert fmg.stats()["sessions"] == 0
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from analysis.site_mapping import PrefixTrie, SiteMapper, SubnetIndex, ip_to_int
+
+def test_prefix_trie_longest_match():
+    trie = PrefixTrie()
+    trie.add('nyc-', 'NYC')
+    trie.add('nyc-hq-', 'NYC-HQ')
+    assert trie.match('NYC-HQ-alice') == 'NYC-HQ'
+    assert trie.match('nyc-bob') == 'NYC'
+    assert trie.match('lon-carol') is None
+
+def test_subnet_index_longest_prefix_and_invalid_ips():
+    index = SubnetIndex([('10.0.0.0/8', 'A'), ('10.1.0.0/16', 'B'), ('10.1.2.0/24', 'C')])
+    assert list(index.lookup_many(['10.1.2.3', '10.1.9.9', '10.200.0.1', '11.0.0.1', '10.1.2.256', 'nope'])) == \
+        ['C', 'B', 'A', None, None, None]
+
+def test_ip_to_int():
+    addresses, valid = ip_to_int(['0.0.0.1', '255.255.255.255', '1.2.3'])
+    assert list(addresses[:2]) == [1, 0xFFFFFFFF]
+    assert list(valid) == [True, True, False]
+
+def test_map_frame_rule_precedence():
+    mapper = SiteMapper([
+        {'type': 'prefix', 'pattern': 'nyc-', 'site_id': 'NYC'},
+        {'type': 'regex', 'pattern': r'^(\w+)-kiosk', 'site_id': 'KIOSK-{1}'},
+        {'type': 'subnet', 'pattern': '10.5.0.0/16', 'site_id': 'LON'},
+    ], site_index={'fgt-site-001': 'FGT-SITE-001'})
+    df = pd.DataFrame({
+        'user': ['nyc-alice', 'paris-kiosk-1', 'bob', 'carol', None],
+        'device': ['', '', 'FGT-SITE-001', '', ''],
+        'ip': ['10.5.0.1', '10.5.0.1', '', '10.5.3.3', '1.1.1.1'],
+    })
+    assert mapper.map_frame(df).tolist() == ['NYC', 'KIOSK-paris', 'FGT-SITE-001', 'LON', None]
@@ -0,0 +1,42 @@
+import logging
+from datetime import datetime
+
+import pytest
+
+from collectors.faz_scraper import site_updates
+from database.subnets import load_subnet_index, normalize_cidr, register_subnets
+from src.collector import DataCollector
+from utils.fmg_simulator import FMGSimulator
+
+logging.getLogger("src").setLevel(logging.CRITICAL)
+
+def test_register_and_reassign(session):
+    register_subnets(session, [('10.1.2.3/24', 'A'), ('10.1.0.0/16', 'B')])
+    register_subnets(session, [('10.1.2.0/24', 'C')], source='fmg')
+    session.commit()
+
+    index = load_subnet_index(session)
+    assert len(index) == 2
+    assert list(index.lookup_many(['10.1.2.9', '10.1.7.7'])) == ['C', 'B']
+
+    with pytest.raises(ValueError):
+        normalize_cidr('2001:db8::/32')
+
+def test_faz_events_fall_back_to_source_ip(session):
+    register_subnets(session, [('10.0.5.0/24', 'SITE-005')])
+    session.commit()
+    events = [{'device': 'FAZ-UNKNOWN', 'srcip': '10.0.5.20', 'wan_status': False, 'timestamp': datetime(2024, 1, 1)}]
+    records, unmatched = site_updates(events, {}, load_subnet_index(session))
+    assert records == [{'site_id': 'SITE-005', 'wan_status': False}]
+    assert unmatched == set()
+
+def test_discover_interface_subnets():
+    with FMGSimulator(num_devices=4, down_fraction=0.25, seed=1) as fmg:
+        collector = DataCollector(fmg.url, 'admin', 'password')
+        assert collector.client.login()
+        discovered = collector.discover_subnets(collector.client.get_managed_devices())
+
+    assert len(discovered) == 3
+    for name, subnets in discovered.items():
+        index = int(name[-3:])
+        assert subnets == [f'10.0.{index}.0/24']
@@ -0,0 +1,69 @@
+import pytest
+from datetime import datetime
+
+from database.db import SiteStatus
+from database.summary import apply_site_changes, get_counters, get_fleet_summary, rebuild_summary, site_contribution
+
+def make_site(site_id, score, region='EMEA', wan_status=True):
+    return SiteStatus(
+        site_id=site_id, site_name=site_id, region=region, wan_status=wan_status,
+        lan_switch_status=True, lan_ap_status=True, zdx_score=score, timestamp=datetime(2024, 1, 1, 10, 30)
+    )
+
+def test_incremental_matches_rebuild(session):
+    sites = [make_site('S1', 95), make_site('S2', 75, region='APAC'), make_site('S3', 0, wan_status=False)]
+    session.add_all(sites)
+    apply_site_changes(session, [(None, site_contribution(s)) for s in sites])
+    session.commit()
+
+    # S1 degrades from Excellent to Poor
+    before = site_contribution(sites[0])
+    sites[0].zdx_score = 40
+    apply_site_changes(session, [(before, site_contribution(sites[0]))])
+    session.commit()
+
+    summary = get_fleet_summary(session)
+    assert summary['total_sites'] == 3
+    assert summary['excellent'] == 0
+    assert summary['poor'] == 1
+    assert summary['critical'] == 1
+    assert summary['wan_down'] == 1
+    assert summary['avg_score'] == pytest.approx((40 + 75 + 0) / 3)
+    assert get_counters(session, 'region') == {'EMEA': 2, 'APAC': 1}
+    assert 'EMEA|Excellent' not in get_counters(session, 'region_status')
+
+    rebuild_summary(session)
+    session.commit()
+    rebuilt = get_fleet_summary(session)
+    assert {k: v for k, v in rebuilt.items() if k != 'updated_at'} == \
+        {k: v for k, v in summary.items() if k != 'updated_at'}
+
+def test_upsert_sites_updates_summary(session):
+    from database.store import upsert_sites
+
+    upsert_sites([{'site_id': 'S1', 'wan_status': True, 'lan_switch_status': True, 'lan_ap_status': True}], session=session)
+    upsert_sites([
+        {'site_id': 'S1', 'wan_status': False},
+        {'site_id': 'S2', 'wan_status': True, 'lan_switch_status': True, 'lan_ap_status': False},
+    ], session=session)
+
+    sites = {s.site_id: s for s in session.query(SiteStatus)}
+    assert sites['S1'].lan_switch_status is True
+    assert sites['S1'].zdx_score == 0
+    summary = get_fleet_summary(session)
+    assert summary['total_sites'] == 2
+    assert summary['wan_down'] == 1
+    assert summary['ap_down'] == 1
+
+def test_upsert_sites_stores_sdwan_members(session):
+    from database.db import SdwanMember
+    from database.store import upsert_sites
+
+    member = {'health_check': 'SLA', 'member': 'wan1', 'status': True, 'latency_ms': 80.0, 'jitter_ms': 1.0, 'packet_loss_pct': 0.0}
+    for latency in (80.0, 150.0):
+        upsert_sites([{'site_id': 'S1', 'wan_status': True, 'latency_ms': latency,
+                       'sdwan_members': [dict(member, latency_ms=latency)]}], session=session)
+
+    rows = session.query(SdwanMember).all()
+    assert [(r.member, r.latency_ms) for r in rows] == [('wan1', 150.0)]
+    assert session.query(SiteStatus).one().zdx_score == 90.0
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from analysis.topology import CorrelationEngine, Topology
+
+def contribution(status='Excellent', wan_down=False):
+    return {'status': status, 'wan_down': wan_down}
+
+def build_topology():
+    topology = Topology()
+    for i in range(10):
+        topology.add(f'S{i}', isp='ISP-A' if i < 4 else 'ISP-B', hub='HUB-1', region='EMEA')
+    return topology
+
+def test_shared_isp_degradation_is_one_incident():
+    engine = CorrelationEngine(build_topology(), min_sites=3, min_fraction=0.5)
+    engine.observe('fmg', [(f'S{i}', contribution()) for i in range(10)])
+
+    opened = engine.observe('fmg', [('S0', contribution(wan_down=True)), ('S1', contribution('Critical'))])
+    assert opened == []
+
+    opened = engine.observe('fmg', [('S2', contribution('Poor')), ('S5', contribution('Fair'))])
+    assert opened == [('isp', 'ISP-A')]
+
+    incidents = engine.incidents()
+    assert len(incidents) == 1
+    assert incidents[0]['dimension'] == 'isp'
+    assert incidents[0]['sites'] == ['S0', 'S1', 'S2']
+    assert (incidents[0]['degraded'], incidents[0]['total']) == (3, 4)
+
+def test_region_wide_degradation_groups_sites_once():
+    engine = CorrelationEngine(build_topology(), min_sites=3, min_fraction=0.5)
+    engine.observe('fmg', [(f'S{i}', contribution('Critical')) for i in range(10)])
+
+    incidents = engine.incidents()
+    # Every node is fully degraded: the most specific explanations win and no site is listed twice.
+    assert [(i['dimension'], i['name']) for i in incidents] == [('isp', 'ISP-A'), ('isp', 'ISP-B')]
+    assert sum(len(i['sites']) for i in incidents) == 10
+
+    engine.observe('fmg', [(f'S{i}', contribution()) for i in range(4)])
+    assert [(i['name'], len(i['sites'])) for i in engine.incidents()] == [('ISP-B', 6)]
+
+def test_follows_change_detector_events():
+    engine = CorrelationEngine(build_topology(), min_sites=2, min_fraction=0.5)
+    now = datetime(2024, 1, 1)
+    events = [
+        {'site_id': 'S0', 'kind': 'wan', 'new_state': 'DOWN', 'timestamp': now},
+        {'site_id': 'S1', 'kind': 'health', 'new_state': 'Critical', 'timestamp': now},
+        {'site_id': 'S2', 'kind': 'ap', 'new_state': 'LOST', 'timestamp': now},
+    ]
+    engine.emit(events)
+    assert [(i['name'], i['sites'], i['since']) for i in engine.incidents()] == [('ISP-A', ['S0', 'S1'], now)]
+
+    # Health recovering doesn't clear a site whose WAN is still down.
+    engine.emit([{'site_id': 'S1', 'kind': 'health', 'new_state': 'Good', 'timestamp': now},
+                 {'site_id': 'S0', 'kind': 'health', 'new_state': 'Good', 'timestamp': now}])
+    assert engine.incidents() == []
+    assert 'S0' in engine.degraded
+
+def test_seeded_incident_dates_from_the_degradation_onset(session):
+    from datetime import timedelta
+    from database.db import SiteEvent, SiteStatus
+
+    onset, last_sweep = datetime(2024, 1, 1, 8), datetime(2024, 1, 1, 12)
+    for i in range(4):
+        session.add(SiteStatus(site_id=f'S{i}', site_name=f'S{i}', wan_status=i == 3, zdx_score=90.0 if i == 3 else 0.0,
+                               lan_switch_status=True, lan_ap_status=True, timestamp=last_sweep))
+    session.add_all([
+        SiteEvent(site_id='S0', source='fmg', kind='wan', old_state='UP', new_state='DOWN', timestamp=onset),
+        SiteEvent(site_id='S1', source='fmg', kind='wan', old_state='UP', new_state='DOWN', timestamp=onset + timedelta(hours=1)),
+        # An earlier outage that recovered doesn't count.
+        SiteEvent(site_id='S1', source='fmg', kind='wan', old_state='UP', new_state='DOWN', timestamp=onset - timedelta(days=1)),
+        SiteEvent(site_id='S3', source='fmg', kind='wan', old_state='UP', new_state='DOWN', timestamp=onset - timedelta(days=2)),
+    ])
+    session.commit()
+
+    engine = CorrelationEngine(build_topology(), min_sites=3, min_fraction=0.5)
+    engine.seed(session)
+    assert [(i['sites'], i['since']) for i in engine.incidents()] == [(['S0', 'S1', 'S2'], onset)]
+    # No recorded transition: the last sample time is the best known onset.
+    assert engine.degraded['S2'] == last_sweep
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from database.db import SiteStatusHistory, FleetSummaryHourly
+from database import trends
+
+END = datetime(2024, 3, 1)
+
+@pytest.fixture
+def database(database, session):
+    rows = []
+    for minute in range(3 * 24 * 60):
+        ts = END - timedelta(minutes=minute + 1)
+        for site in ('S1', 'S2'):
+            rows.append({'site_id': site, 'timestamp': ts, 'zdx_score': 90.0 if site == 'S1' else 50.0,
+                         'latency_ms': float(minute % 100), 'packet_loss_pct': 0.0, 'jitter_ms': 1.0})
+    session.execute(insert(SiteStatusHistory), rows)
+    session.execute(insert(FleetSummaryHourly), [
+        {'hour': END - timedelta(hours=h + 1), 'samples': 120, 'score_sum': 120 * 70.0,
+         'critical_samples': 12, 'wan_down_samples': 0} for h in range(72)
+    ])
+    session.commit()
+    return database
+
+def test_site_trend_is_bounded(database):
+    df = trends.site_trend('S1', '24h', end=END, max_points=48)
+    assert 48 <= len(df) <= 49
+    assert df['samples'].sum() == 24 * 60
+    assert (df['score'] == 90.0).all()
+    assert df['latency_max'].max() == 99.0
+
+    assert trends.site_trend('S1', '1h', end=END, max_points=500).shape[0] == 60
+    assert trends.site_trend('NOPE', '1h', end=END).empty
+
+def test_fleet_trend_uses_hourly_table_for_long_ranges(database):
+    short = trends.fleet_trend('1h', end=END)
+    assert short['score'].round(1).eq(70.0).all()
+
+    long = trends.fleet_trend('7d', end=END)
+    assert set(long.columns) >= {'score', 'critical_pct'}
+    assert long['samples'].sum() == 72 * 120
+    assert long['critical_pct'].round(1).eq(10.0).all()
+
+def test_sparklines(database):
+    sparklines = trends.site_sparklines(hours=24, points=12, end=END)
+    assert set(sparklines) == {'S1', 'S2'}
+    assert sparklines['S2'] == [50.0] * len(sparklines['S2'])
+    assert 12 <= len(sparklines['S1']) <= 13
@@ -0,0 +1,116 @@
+from collectors.zdx_scraper import ZDXScraper, parse_metric_rows
+
+def row(i):
+    return {'_key': str(i), 'user': f'user{i}@site-{i % 3:03d}', 'device': '', 'ip': f'10.0.{i % 3}.{i}',
+            'zdx_score': '87', 'latency': f'{i} ms', 'packet_loss': '0.5 %'}
+
+class FakeGridPage:
+    """Virtualised grid showing 4 rows per viewport, 10 rows per page, 2 pages."""
+
+    def __init__(self):
+        self.page = 0
+        self.offset = 0
+        self.calls = 0
+
+    def evaluate(self, script, args):
+        self.calls += 1
+        start = self.page * 10 + self.offset
+        rows = [row(i) for i in range(start, min(start + 4, self.page * 10 + 10))]
+        at_end = self.offset + 4 >= 10
+        self.offset = min(self.offset + 4, 6)
+        return {'rows': rows, 'atEnd': at_end}
+
+    def wait_for_timeout(self, ms):
+        pass
+
+    def wait_for_load_state(self, state):
+        pass
+
+    def query_selector(self, selector):
+        if self.page == 1:
+            return None
+        page = self
+
+        class Next:
+            def click(self):
+                page.page += 1
+                page.offset = 0
+        return Next()
+
+def test_scrape_metrics_reads_all_pages_in_few_round_trips():
+    page = FakeGridPage()
+    metrics = ZDXScraper('https://zdx', 'u', 'p')._scrape_metrics(page)
+
+    assert len(metrics) == 20
+    assert sorted(m['latency'] for m in metrics) == list(range(20))
+    assert page.calls == 6
+
+def test_parse_metric_rows():
+    metrics = parse_metric_rows([row(1), {'user': '', 'device': ''}])
+    assert metrics == [{'user': 'user1@site-001', 'device': '', 'ip': '10.0.1.1',
+                        'zdx_score': 87.0, 'latency': 1.0, 'packet_loss': 0.5}]
+
+def test_store_site_metrics_maps_and_aggregates(session):
+    from analysis.site_mapping import SiteMapper
+    from collectors.zdx_scraper import store_site_metrics
+    from database.db import SiteStatus, ZdxSiteMetrics
+    from database.subnets import invalidate_index, register_subnets
+
+    for i in range(3):
+        session.add(SiteStatus(site_id=f'SITE-{i:03d}', site_name=f'Site {i}', wan_status=True,
+                               lan_switch_status=True, lan_ap_status=True))
+    register_subnets(session, [('10.8.0.0/16', 'SITE-001')])
+    session.commit()
+    invalidate_index()
+
+    mapper = SiteMapper([
+        {'type': 'regex', 'pattern': r'@site-(\d{3})$', 'site_id': 'SITE-{1}'},
+        {'type': 'subnet', 'pattern': '10.9.0.0/16', 'site_id': 'SITE-002'},
+    ])
+    rows = [row(i) for i in range(9)] + [
+        {'user': 'visitor', 'ip': '10.9.1.1', 'zdx_score': 50.0, 'latency': 400.0, 'packet_loss': 0.0},
+        {'user': 'nobody', 'ip': '172.16.0.1', 'zdx_score': 50.0, 'latency': 1.0, 'packet_loss': 0.0},
+        {'user': 'guest', 'ip': '10.8.0.7', 'zdx_score': 50.0, 'latency': 1.0, 'packet_loss': 0.0},
+    ]
+    rows = parse_metric_rows(rows[:9]) + rows[9:]
+    aggregates = store_site_metrics(session, rows, mapper=mapper)
+
+    # Registered subnets are a fallback; the (reusable) mapper is left as it was.
+    assert aggregates['users'].to_dict() == {'SITE-000': 3, 'SITE-001': 4, 'SITE-002': 4}
+    assert len(mapper.subnets) == 1 and mapper.site_index == {}
+    assert aggregates.loc['SITE-000', 'latency_median'] == 3.0
+    assert session.query(ZdxSiteMetrics).count() == 3
+    site = session.query(SiteStatus).filter_by(site_id='SITE-000').one()
+    assert site.latency_ms == 3.0 and site.packet_loss_pct == 0.5
+    assert site.zdx_score == 97.5
+
+    store_site_metrics(session, rows, mapper=mapper)
+    assert len(mapper.subnets) == 1
+    invalidate_index()
+
+class SlowGridPage(FakeGridPage):
+    """Like FakeGridPage, but the first two scrolls of each page return rows already seen."""
+
+    def __init__(self):
+        super().__init__()
+        self.lagging = 0
+
+    def evaluate(self, script, args):
+        if self.offset == 4 and self.lagging < 2:
+            self.lagging += 1
+            self.calls += 1
+            start = self.page * 10
+            return {'rows': [row(i) for i in range(start, start + 4)], 'atEnd': False}
+        return super().evaluate(script, args)
+
+    def query_selector(self, selector):
+        self.lagging = 0
+        return super().query_selector(selector)
+
+def test_scrape_metrics_waits_for_a_grid_still_rendering():
+    page = SlowGridPage()
+    metrics = ZDXScraper('https://zdx', 'u', 'p')._scrape_metrics(page)
+    assert len(metrics) == 20
+
+    page = SlowGridPage()
+    assert len(ZDXScraper('https://zdx', 'u', 'p')._scrape_metrics(page, stall_retries=1)) == 8
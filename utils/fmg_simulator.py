@@ -0,0 +1,373 @@
+"""
+Local fake FortiManager JSON-RPC server for offline testing and benchmarks.
+
+Implements the parts of /jsonrpc that FMGClient uses:
+    - /sys/login/user (login and logout)
+    - /sys/status
+    - /dvmdb/adom/{adom}/device (optionally with "fields")
+    - /sys/proxy/json for /api/v2/monitor/system/status, managed-switch, managed-ap and
+      available-interfaces, virtual-wan/health-check
+
+Fleet size, per-device latency and error injection are configurable and seeded, so
+collector throughput and concurrency behaviour can be measured reproducibly without
+touching a production FMG.
+
+Run standalone:
+    python -m utils.fmg_simulator --devices 260 --latency 0.05 --error-rate 0.02 --port 8080
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SYSTEM_STATUS = "/api/v2/monitor/system/status"
+MANAGED_SWITCH = "/api/v2/monitor/switch-controller/managed-switch/status"
+MANAGED_AP = "/api/v2/monitor/wifi/managed-ap"
+INTERFACES = "/api/v2/monitor/system/available-interfaces"
+HEALTH_CHECK = "/api/v2/monitor/virtual-wan/health-check"
+
+
+def _ok(data=None, url=None):
+    result = {"status": {"code": 0, "message": "OK"}}
+    if url is not None:
+        result["url"] = url
+    if data is not None:
+        result["data"] = data
+    return result
+
+
+def _error(code, message, url=None):
+    result = {"status": {"code": code, "message": message}}
+    if url is not None:
+        result["url"] = url
+    return result
+
+
+class FMGSimulator:
+    """
+    Fake FMG with a fleet of `num_devices` FortiGates.
+
+    Latency model (seconds per proxied call): `latency`, overridden per device by
+    `device_latency`, multiplied by `slow_factor` for a seeded `slow_fraction` of the
+    fleet, plus up to +/- `latency_jitter` (a fraction) of random noise.
+
+    Error injection:
+        down_fraction   -- devices reported with conn_status 0 in the device list
+        error_rate      -- proxied calls that return a non-zero status code
+        http_error_rate -- requests answered with HTTP 500
+        timeout_rate    -- proxied calls that stall for `timeout_delay` seconds first
+
+    Usage:
+        with FMGSimulator(num_devices=260, latency=0.02) as fmg:
+            client = FMGClient(fmg.url, "admin", "password")
+    """
+
+    def __init__(self, num_devices=260, latency=0.0, host="127.0.0.1", port=0,
+                 username="admin", password="password", adom="root",
+                 latency_jitter=0.0, device_latency=None, slow_fraction=0.0, slow_factor=5.0,
+                 down_fraction=0.0, error_rate=0.0, http_error_rate=0.0,
+                 timeout_rate=0.0, timeout_delay=30.0, seed=None):
+        self.num_devices = num_devices
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.adom = adom
+        self.latency_jitter = latency_jitter
+        self.device_latency = dict(device_latency or {})
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+
+        self.sessions = set()
+        self.request_count = 0
+        self.counters = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+        self._rng = random.Random(seed)
+        self.devices = [self._make_device(i) for i in range(1, num_devices + 1)]
+        self._by_name = {device["name"]: device for device in self.devices}
+
+        for device in self._rng.sample(self.devices, int(num_devices * down_fraction)):
+            device["conn_status"] = 0
+        for device in self._rng.sample(self.devices, int(num_devices * slow_fraction)):
+            self.device_latency.setdefault(device["name"], latency * slow_factor)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def _make_device(self, index):
+        rng = self._rng
+        switches = rng.randint(1, 4)
+        aps = rng.randint(2, 10)
+        return {
+            "name": f"FGT-SITE-{index:03d}",
+            "sn": f"FGT60F{index:010d}",
+            "ip": f"10.{(index >> 8) & 255}.{index & 255}.1",
+            "conn_status": 1,
+            "os_ver": 7,
+            "platform_str": "FortiGate-60F",
+            # Simulator-only state, used to build monitor responses.
+            "_cpu": rng.randint(2, 60),
+            "_mem": rng.randint(20, 80),
+            "_switches": [rng.random() > 0.03 for _ in range(switches)],
+            "_aps": [rng.random() > 0.05 for _ in range(aps)],
+            "_sdwan": {
+                member: {
+                    "status": "up" if rng.random() > 0.03 else "down",
+                    "latency": round(rng.uniform(5, 60), 3),
+                    "jitter": round(rng.uniform(0.2, 8), 3),
+                    "packet_loss": round(rng.choice([0, 0, 0, rng.uniform(0, 3)]), 3),
+                }
+                for member in ("wan1", "wan2")
+            },
+        }
+
+    def device_list(self):
+        """The dvmdb view of the fleet (without simulator-only fields)."""
+        return [{k: v for k, v in d.items() if not k.startswith("_")} for d in self.devices]
+
+    def stats(self):
+        """Request counters and the peak number of concurrent requests seen."""
+        with self._lock:
+            return {
+                "requests": self.request_count,
+                "max_in_flight": self.max_in_flight,
+                "sessions": len(self.sessions),
+                **dict(self.counters),
+            }
+
+    def expire_sessions(self):
+        """Invalidates every session, as FMG does after an idle timeout or restart."""
+        with self._lock:
+            self.sessions.clear()
+
+    # --- Request handling ---
+
+    def _count(self, key):
+        with self._lock:
+            self.counters[key] += 1
+
+    def handle_rpc(self, request):
+        """Handles one decoded JSON-RPC request and returns the response dict."""
+        with self._lock:
+            self.request_count += 1
+
+        method = request.get("method")
+        params = request.get("params") or [{}]
+        param = params[0]
+        url = param.get("url", "")
+        response = {"id": request.get("id"), "result": []}
+
+        if url == "/sys/login/user":
+            data = param.get("data") or {}
+            if not data:
+                self._count("logout")
+                self.sessions.discard(request.get("session"))
+                response["result"].append(_ok(url=url))
+            elif data.get("user") == self.username and data.get("passwd") == self.password:
+                self._count("login")
+                session_id = uuid.uuid4().hex
+                self.sessions.add(session_id)
+                response["session"] = session_id
+                response["result"].append(_ok(url=url))
+            else:
+                self._count("login_failed")
+                response["result"].append(_error(-22, "Login fail", url=url))
+            return response
+
+        if request.get("session") not in self.sessions:
+            self._count("invalid_session")
+            response["result"].append(_error(-11, "No permission for the resource", url=url))
+            return response
+
+        if method == "get" and url == "/sys/status":
+            self._count("sys_status")
+            response["result"].append(_ok({"Version": "v7.4.3", "Hostname": "FMG-SIM"}, url=url))
+        elif method == "get" and url == f"/dvmdb/adom/{self.adom}/device":
+            fields = param.get("fields")
+            if fields:
+                self._count("device_states")
+                response["result"].append(_ok([{k: d.get(k) for k in fields} for d in self.device_list()], url=url))
+            else:
+                self._count("device_list")
+                response["result"].append(_ok(self.device_list(), url=url))
+        elif method == "exec" and url == "/sys/proxy/json":
+            response["result"].append(self.handle_proxy(param.get("data") or {}))
+        else:
+            response["result"].append(_error(-3, "Object does not exist", url=url))
+        return response
+
+    def device_delay(self, name):
+        """Seconds a proxied call to `name` takes."""
+        delay = self.device_latency.get(name, self.latency)
+        if self.latency_jitter and delay:
+            with self._lock:
+                delay *= 1 + self._rng.uniform(-self.latency_jitter, self.latency_jitter)
+        return max(delay, 0.0)
+
+    def _roll(self, rate):
+        if not rate:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def handle_proxy(self, data):
+        """Simulates a FortiGate monitor API response for one proxied device."""
+        target = data.get("target")
+        resource = data.get("resource")
+        self._count(f"proxy:{resource}")
+
+        device = self._by_name.get(target)
+        if device is None:
+            return _error(-3, f"Device {target} not found")
+        if device["conn_status"] != 1:
+            return _error(-1, f"Device {target} is not connected")
+
+        if self._roll(self.timeout_rate):
+            self._count("injected_timeout")
+            time.sleep(self.timeout_delay)
+
+        delay = self.device_delay(target)
+        if delay:
+            time.sleep(delay)
+
+        if self._roll(self.error_rate):
+            self._count("injected_error")
+            return _error(-1, "Failed to connect to the device")
+
+        if resource == SYSTEM_STATUS:
+            return _ok({"results": {"cpu": device["_cpu"], "mem": device["_mem"], "hostname": target}})
+        if resource == MANAGED_SWITCH:
+            return _ok({"results": [
+                {"serial": f"S124F{target[-3:]}{i}", "status": "Connected" if up else "Disconnected"}
+                for i, up in enumerate(device["_switches"])
+            ]})
+        if resource == HEALTH_CHECK:
+            return _ok({"results": {"SLA_Internet": device["_sdwan"]}})
+        if resource == INTERFACES:
+            index = int(target[-3:]) if target[-3:].isdigit() else 0
+            return _ok({"results": [
+                {"name": "wan1", "role": "wan", "ipv4_addresses": [{"ip": f"203.0.113.{index & 255}", "cidr_netmask": 30}]},
+                {"name": "internal", "role": "lan", "ipv4_addresses": [{"ip": device["ip"], "cidr_netmask": 24}]},
+            ]})
+        if resource == MANAGED_AP:
+            return _ok({"results": [
+                {"serial": f"FP231F{target[-3:]}{i}", "status": "connected" if up else "disconnected"}
+                for i, up in enumerate(device["_aps"])
+            ]})
+        return _error(-3, f"Unknown resource {resource}")
+
+    # --- Server lifecycle ---
+
+    def start(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without TCP_NODELAY each keep-alive
+            # call stalls ~40 ms on Nagle + delayed ACK, which would swamp the simulated latency.
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                if self.path != "/jsonrpc":
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self.send_error(400)
+                    return
+
+                with simulator._lock:
+                    simulator.in_flight += 1
+                    simulator.max_in_flight = max(simulator.max_in_flight, simulator.in_flight)
+                try:
+                    if simulator._roll(simulator.http_error_rate):
+                        simulator._count("injected_http_error")
+                        self.send_error(500)
+                        return
+                    body = json.dumps(simulator.handle_rpc(request)).encode()
+                finally:
+                    with simulator._lock:
+                        simulator.in_flight -= 1
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake FortiManager JSON-RPC server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--devices", type=int, default=260, help="Fleet size")
+    parser.add_argument("--adom", default="root")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per proxied call")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random +/- fraction of the latency")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Fraction of devices that are slow")
+    parser.add_argument("--slow-factor", type=float, default=5.0, help="Latency multiplier for slow devices")
+    parser.add_argument("--down-fraction", type=float, default=0.0, help="Fraction of devices disconnected from FMG")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability a proxied call fails")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Probability a request returns HTTP 500")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Probability a proxied call stalls")
+    parser.add_argument("--timeout-delay", type=float, default=30.0, help="Seconds a stalled call takes")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = FMGSimulator(
+        num_devices=args.devices, latency=args.latency, host=args.host, port=args.port, adom=args.adom,
+        latency_jitter=args.latency_jitter, slow_fraction=args.slow_fraction, slow_factor=args.slow_factor,
+        down_fraction=args.down_fraction, error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+        timeout_rate=args.timeout_rate, timeout_delay=args.timeout_delay, seed=args.seed
+    ).start()
+    print(f"Fake FMG listening on {simulator.url} with {args.devices} devices (user: admin / password). Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(10)
+            print(f"Stats: {simulator.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Lightweight in-process metrics: timers backed by fixed-bucket histograms and counters.
+
+Collectors time their stages into a per-run MetricsRegistry, which is summarised into the
+`collection_runs` table and merged into the process-wide REGISTRY. REGISTRY can be written
+as a Prometheus text file (node_exporter textfile collector format) or served over HTTP.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds. Covers fast JSON-RPC calls up to multi-minute Playwright stages.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics/collector.prom")
+
+
+class Histogram:
+    """Cumulative-bucket histogram with constant memory; percentiles are interpolated within buckets."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Estimates the q-th quantile (0-1), like Prometheus' histogram_quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and seen + count >= rank:
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+            lower = upper
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": round(self.percentile(0.50), 6),
+            "p95": round(self.percentile(0.95), 6),
+            "p99": round(self.percentile(0.99), 6),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe collection of labelled histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Times the enclosed block into histogram `name`, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def merge(self, other):
+        with self._lock:
+            for key, histogram in other.histograms.items():
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(histogram.buckets)
+                self.histograms[key].merge(histogram)
+            for key, value in other.counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def stage_summary(self):
+        """
+        Percentile summary per metric name, aggregated over all label sets.
+        Returns {name: {"count", "sum", "max", "p50", "p95", "p99"}}.
+        """
+        merged = {}
+        with self._lock:
+            for (name, _labels), histogram in self.histograms.items():
+                if name not in merged:
+                    merged[name] = Histogram(histogram.buckets)
+                merged[name].merge(histogram)
+        return {name: histogram.summary() for name, histogram in merged.items()}
+
+    def top(self, name, label, n=10):
+        """The `n` label values with the largest total time in histogram `name` (e.g. slowest devices)."""
+        totals = {}
+        with self._lock:
+            for (metric, labels), histogram in self.histograms.items():
+                if metric != name:
+                    continue
+                value = dict(labels).get(label)
+                totals[value] = totals.get(value, 0.0) + histogram.sum
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{label: value, "seconds": round(seconds, 6)} for value, seconds in ranked]
+
+    def to_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=METRICS_FILE):
+        """Atomically writes the text exposition to `path`."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def __getstate__(self):
+        # Locks can't be pickled; registries are sent back from worker processes.
+        with self._lock:
+            return {"histograms": dict(self.histograms), "counters": dict(self.counters)}
+
+    def __setstate__(self, state):
+        self._lock = threading.Lock()
+        self.histograms = state["histograms"]
+        self.counters = state["counters"]
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+def _labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry that every collector run is merged into.
+REGISTRY = MetricsRegistry()
+
+
+def serve_metrics(port, registry=REGISTRY, host="0.0.0.0"):
+    """Serves `registry` at http://host:port/metrics from a daemon thread. Returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def finish_run(collector, started_at, run_metrics, devices=0, errors=0, export=True):
+    """
+    Closes out one collection run: merges its metrics into REGISTRY, optionally rewrites the
+    Prometheus file, and records a `collection_runs` row (best effort, logged on failure).
+    Returns the row's values as a dict.
+    """
+    finished_at = datetime.utcnow()
+    record = {
+        "collector": collector,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "duration_s": (finished_at - started_at).total_seconds(),
+        "devices": devices,
+        "errors": errors,
+        "stages": run_metrics.stage_summary(),
+        "slowest_devices": run_metrics.top("fmg_proxy_call_seconds", "device", n=10),
+    }
+
+    REGISTRY.merge(run_metrics)
+    REGISTRY.inc("collection_runs_total", collector=collector)
+    REGISTRY.observe("collection_run_seconds", record["duration_s"], collector=collector)
+
+    if export:
+        try:
+            REGISTRY.write_prometheus()
+        except OSError as e:
+            print(f"Could not write metrics file: {e}")
+
+    try:
+        from database.db import get_session, CollectionRun
+        session = get_session()
+        try:
+            session.add(CollectionRun(
+                collector=collector,
+                started_at=started_at,
+                finished_at=finished_at,
+                duration_s=record["duration_s"],
+                devices=devices,
+                errors=errors,
+                stages=json.dumps(record["stages"]),
+                slowest_devices=json.dumps(record["slowest_devices"]),
+            ))
+            session.commit()
+        finally:
+            session.close()
+    except Exception as e:
+        print(f"Could not record collection run: {e}")
+
+    return record
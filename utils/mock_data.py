@@ -1,15 +1,25 @@
+import os
 import random
+import numpy as np
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from database.db import SiteStatus, get_session, init_db
-from analysis.scoring import calculate_score
-from datetime import datetime
+from database.db import SiteStatus, SiteStatusHistory, get_session, init_db, record_history
+from database.summary import apply_site_changes, add_hourly_samples, rebuild_summary, reset_summary, site_contribution
+from analysis.scoring import calculate_score, calculate_scores
+from datetime import datetime, timedelta
 
-def generate_mock_data(num_sites=260):
-    """Generates mock data for the specified number of sites."""
+REGIONS = ["NA-East", "NA-West", "EMEA", "APAC", "LATAM"]
+# Kept apart from the exported snapshots, so mock days never look exported (see database/snapshot.py).
+MOCK_SNAPSHOT_DIR = os.getenv("MOCK_SNAPSHOT_DIR", "snapshots-mock")
+
+def generate_mock_data(num_sites=260, seed=None):
+    """Generates mock data for the specified number of sites (reproducible with `seed`)."""
+    rng = random.Random(seed)
     session = get_session()
 
     # Clear existing data
     session.query(SiteStatus).delete()
+    reset_summary(session)
     session.commit()
 
     sites = []
@@ -18,43 +28,43 @@ def generate_mock_data(num_sites=260):
         site_name = f"Branch Office {i}"
 
         # Randomize Network Conditions
-        rand = random.random()
+        rand = rng.random()
 
         # 80% Healthy
         if rand < 0.8:
             wan_status = True
-            latency = random.uniform(5, 45)
+            latency = rng.uniform(5, 45)
             packet_loss = 0.0
-            jitter = random.uniform(1, 8)
+            jitter = rng.uniform(1, 8)
             switch_status = True
             ap_status = True
 
         # 10% High Latency / Jitter
         elif rand < 0.9:
             wan_status = True
-            latency = random.uniform(55, 150)
-            packet_loss = random.uniform(0, 0.5)
-            jitter = random.uniform(12, 30)
+            latency = rng.uniform(55, 150)
+            packet_loss = rng.uniform(0, 0.5)
+            jitter = rng.uniform(12, 30)
             switch_status = True
             ap_status = True
 
         # 5% Packet Loss
         elif rand < 0.95:
             wan_status = True
-            latency = random.uniform(40, 80)
-            packet_loss = random.uniform(1, 5)
-            jitter = random.uniform(5, 15)
+            latency = rng.uniform(40, 80)
+            packet_loss = rng.uniform(1, 5)
+            jitter = rng.uniform(5, 15)
             switch_status = True
             ap_status = True
 
         # 3% Device Failure (LAN)
         elif rand < 0.98:
             wan_status = True
-            latency = random.uniform(20, 50)
+            latency = rng.uniform(20, 50)
             packet_loss = 0.0
-            jitter = random.uniform(2, 10)
+            jitter = rng.uniform(2, 10)
             # Randomly fail switch or AP
-            if random.random() < 0.5:
+            if rng.random() < 0.5:
                 switch_status = False
                 ap_status = True # Often dependent, but let's keep simple
             else:
@@ -84,6 +94,7 @@ def generate_mock_data(num_sites=260):
         site = SiteStatus(
             site_id=site_id,
             site_name=site_name,
+            region=REGIONS[i % len(REGIONS)],
             wan_status=wan_status,
             latency_ms=round(latency, 2),
             packet_loss_pct=round(packet_loss, 2),
@@ -96,10 +107,200 @@ def generate_mock_data(num_sites=260):
         sites.append(site)
 
     session.add_all(sites)
+    record_history(session, sites)
+    apply_site_changes(session, [(None, site_contribution(site)) for site in sites])
     session.commit()
     print(f"Generated data for {len(sites)} sites.")
     session.close()
 
+# Scenario states used by the fleet history generator (same mix as generate_mock_data).
+HEALTHY, HIGH_LATENCY, PACKET_LOSS, LAN_FAILURE, WAN_DOWN = range(5)
+
+# Per-timestep transition probabilities between scenarios. Incidents persist for a
+# while (high self-transition) and recover back to HEALTHY rather than hopping around.
+TRANSITIONS = np.array([
+    #  healthy  latency  loss    lan     wan
+    [0.985,   0.007,   0.004,  0.003,  0.001],   # healthy
+    [0.15,    0.84,    0.01,   0.0,    0.0],     # high latency
+    [0.20,    0.02,    0.78,   0.0,    0.0],     # packet loss
+    [0.05,    0.0,     0.0,    0.95,   0.0],     # lan failure
+    [0.10,    0.0,     0.0,    0.0,    0.90],    # wan down
+])
+INITIAL_MIX = np.array([0.80, 0.10, 0.05, 0.03, 0.02])
+
+def _site_ids(num_sites):
+    width = max(3, len(str(num_sites)))
+    return np.array([f"SITE-{i:0{width}d}" for i in range(1, num_sites + 1)], dtype=object)
+
+def generate_fleet_history(num_sites=260, timesteps=288, interval_minutes=5, seed=None, end=None, chunk_rows=100_000):
+    """
+    Vectorized generator of N sites x T timesteps of site metrics.
+
+    Each site follows a Markov chain over the scenarios above, so incidents persist and
+    recover, and latency/jitter carry a per-site baseline plus AR(1) noise. Yields chunks
+    (dicts of numpy arrays keyed like SiteStatusHistory columns) of roughly `chunk_rows`
+    rows, so memory stays flat regardless of N x T.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.utcnow()
+    start = end - timedelta(minutes=interval_minutes * (timesteps - 1))
+    site_ids = _site_ids(num_sites)
+
+    cumulative = TRANSITIONS.cumsum(axis=1)
+    state = np.searchsorted(INITIAL_MIX.cumsum(), rng.random(num_sites))
+    # Some branches (satellite/LTE) simply run slower than others.
+    base_latency = rng.lognormal(mean=np.log(20), sigma=0.5, size=num_sites)
+    noise = np.zeros(num_sites)
+    lan_switch_fails = rng.random(num_sites) < 0.5
+
+    steps_per_chunk = max(1, chunk_rows // max(num_sites, 1))
+    for chunk_start in range(0, timesteps, steps_per_chunk):
+        steps = min(steps_per_chunk, timesteps - chunk_start)
+        states = np.empty((steps, num_sites), dtype=np.int8)
+        noises = np.empty((steps, num_sites))
+
+        for step in range(steps):
+            if chunk_start + step > 0:
+                u = rng.random(num_sites)
+                state = np.minimum((u[:, None] > cumulative[state]).sum(axis=1), len(INITIAL_MIX) - 1)
+            noise = 0.8 * noise + rng.normal(0, 2.0, num_sites)
+            states[step] = state
+            noises[step] = noise
+
+        states = states.ravel()
+        size = states.size
+        latency = np.clip(np.tile(base_latency, steps) + noises.ravel(), 1, None)
+        jitter = rng.uniform(1, 8, size)
+        loss = np.zeros(size)
+
+        mask = states == HIGH_LATENCY
+        latency[mask] += rng.uniform(40, 120, mask.sum())
+        jitter[mask] = rng.uniform(12, 30, mask.sum())
+        loss[mask] = rng.uniform(0, 0.5, mask.sum())
+
+        mask = states == PACKET_LOSS
+        latency[mask] += rng.uniform(20, 40, mask.sum())
+        jitter[mask] = rng.uniform(5, 15, mask.sum())
+        loss[mask] = rng.uniform(1, 5, mask.sum())
+
+        wan_status = states != WAN_DOWN
+        latency[~wan_status] = 0.0
+        jitter[~wan_status] = 0.0
+
+        lan_failed = states == LAN_FAILURE
+        switch_flag = np.tile(lan_switch_fails, steps)
+        lan_switch_status = ~(lan_failed & switch_flag)
+        lan_ap_status = ~(lan_failed & ~switch_flag)
+
+        offsets = np.repeat(np.arange(chunk_start, chunk_start + steps), num_sites)
+        timestamps = np.datetime64(start, 'us') + offsets * np.timedelta64(interval_minutes, 'm')
+
+        chunk = {
+            'site_id': np.tile(site_ids, steps),
+            'wan_status': wan_status,
+            'latency_ms': np.round(latency, 2),
+            'packet_loss_pct': np.round(loss, 2),
+            'jitter_ms': np.round(jitter, 2),
+            'lan_switch_status': lan_switch_status,
+            'lan_ap_status': lan_ap_status,
+            'timestamp': timestamps.astype('datetime64[us]'),
+        }
+        chunk['zdx_score'] = calculate_scores(
+            chunk['wan_status'], chunk['lan_switch_status'], chunk['lan_ap_status'],
+            chunk['latency_ms'], chunk['packet_loss_pct'], chunk['jitter_ms']
+        )
+        yield chunk
+
+def _chunk_records(chunk):
+    columns = list(chunk)
+    values = [chunk[c].tolist() for c in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+def _hourly_buckets(chunk):
+    hours = chunk['timestamp'].astype('datetime64[h]')
+    unique_hours, inverse = np.unique(hours, return_inverse=True)
+    samples = np.bincount(inverse)
+    score_sum = np.bincount(inverse, weights=chunk['zdx_score'])
+    critical = np.bincount(inverse, weights=(chunk['zdx_score'] <= 0))
+    wan_down = np.bincount(inverse, weights=~chunk['wan_status'])
+    return {
+        hour.astype('datetime64[us]').item(): {
+            'samples': int(samples[i]),
+            'score_sum': float(score_sum[i]),
+            'critical_samples': int(critical[i]),
+            'wan_down_samples': int(wan_down[i]),
+        }
+        for i, hour in enumerate(unique_hours)
+    }
+
+def write_fleet_history_db(chunks, regions=REGIONS):
+    """
+    Bulk-inserts generated chunks into site_status_history (one executemany per chunk),
+    then sets site_status to each site's latest sample and rebuilds the fleet summary.
+    """
+    session = get_session()
+    total = 0
+    last = None
+    try:
+        for chunk in chunks:
+            session.execute(insert(SiteStatusHistory), _chunk_records(chunk))
+            add_hourly_samples(session, _hourly_buckets(chunk))
+            session.commit()
+            total += len(chunk['site_id'])
+            last = chunk
+            print(f"Inserted {total} history rows...")
+
+        if last is not None:
+            # The final timestep of the last chunk holds each site's current state.
+            latest_ts = last['timestamp'].max()
+            latest = {key: values[last['timestamp'] == latest_ts] for key, values in last.items()}
+            latest['site_name'] = np.array([f"Branch Office {int(s.split('-')[1])}" for s in latest['site_id']], dtype=object)
+            latest['region'] = np.array([regions[int(s.split('-')[1]) % len(regions)] for s in latest['site_id']], dtype=object)
+
+            session.query(SiteStatus).delete()
+            session.execute(insert(SiteStatus), _chunk_records(latest))
+            rebuild_summary(session)
+            session.commit()
+    finally:
+        session.close()
+
+    print(f"Generated {total} history rows.")
+    return total
+
+def write_fleet_history_parquet(chunks, snapshot_dir=None):
+    """
+    Streams generated chunks into day-partitioned Parquet files (one part per chunk and day)
+    under MOCK_SNAPSHOT_DIR. A day's mock parts from an earlier run are removed before its
+    first part is written.
+    """
+    import pyarrow as pa
+    from database.snapshot import HISTORY_SCHEMA, partition_files, partition_path, write_partition
+
+    snapshot_dir = snapshot_dir or MOCK_SNAPSHOT_DIR
+    total = 0
+    cleared = set()
+    for index, chunk in enumerate(chunks):
+        days = chunk['timestamp'].astype('datetime64[D]')
+        for day in np.unique(days):
+            if day not in cleared:
+                for stale in partition_files(day.item(), snapshot_dir):
+                    if os.path.basename(stale).startswith("part-mock-"):
+                        os.remove(stale)
+                cleared.add(day)
+            mask = days == day
+            table = pa.Table.from_arrays(
+                [pa.array(chunk[field.name][mask], type=field.type) for field in HISTORY_SCHEMA],
+                schema=HISTORY_SCHEMA
+            )
+            path = partition_path(day.item(), snapshot_dir).replace("part-0", f"part-mock-{index:05d}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_partition(table, path)
+            total += table.num_rows
+        print(f"Wrote {total} history rows...")
+
+    print(f"Generated {total} history rows into {snapshot_dir}.")
+    return total
+
 if __name__ == "__main__":
     init_db()
     generate_mock_data()
@@ -0,0 +1,148 @@
+"""
+Per-run profiling for main.py (--profile).
+
+Captures a CPU profile (cProfile, or pyinstrument if requested and installed) and a
+tracemalloc allocation summary, writes them to profiles/<timestamp>-<mode>/ and prints a
+top-N report, including how much time went to Playwright, JSON parsing, the ORM and scoring.
+
+Note: cProfile only follows the main thread. Allocation tracking covers every thread.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Substrings of a function's filename used to attribute self time to a subsystem.
+CATEGORIES = [
+    ("Playwright", ("playwright", "greenlet")),
+    ("JSON parsing", ("json/", "json\\", "simplejson")),
+    ("HTTP (requests/urllib3)", ("requests/", "urllib3", "http/client", "ssl.py", "socket.py")),
+    ("ORM / SQLite", ("sqlalchemy", "sqlite3", "database/")),
+    ("Scoring", ("analysis/",)),
+    ("pandas / numpy", ("pandas", "numpy")),
+]
+
+
+def _category(filename):
+    normalized = filename.replace("\\", "/")
+    for name, needles in CATEGORIES:
+        if any(needle.replace("\\", "/") in normalized for needle in needles):
+            return name
+    if normalized.startswith("~") or normalized.startswith("<"):
+        return "Builtins / C"
+    return "Other"
+
+
+def category_breakdown(stats):
+    """Sums self time (tottime) per subsystem from a pstats.Stats object."""
+    totals = {}
+    for (filename, _line, _func), (_cc, _nc, tottime, _ct, _callers) in stats.stats.items():
+        name = _category(filename)
+        totals[name] = totals.get(name, 0.0) + tottime
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def _hot_functions_report(stats, top_n):
+    buffer = io.StringIO()
+    stats.stream = buffer
+    stats.sort_stats("cumulative").print_stats(top_n)
+    stats.sort_stats("tottime").print_stats(top_n)
+    return buffer.getvalue()
+
+
+def _allocation_report(snapshot, peak, top_n):
+    lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB", "", f"Top {top_n} allocation sites still live at the end of the run:"]
+    for stat in snapshot.statistics("lineno")[:top_n]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KiB  {stat.count:8d} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profile_run(label, engine="cprofile", top_n=20, output_root=PROFILE_DIR):
+    """
+    Profiles the enclosed block and writes the reports to a timestamped directory.
+    `engine` is "cprofile" or "pyinstrument" (falls back to cProfile if not installed).
+    Yields the output directory.
+    """
+    output_dir = os.path.join(output_root, f"{datetime.now():%Y%m%d-%H%M%S}-{label}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    profiler = None
+    if engine == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+        except ImportError:
+            print("pyinstrument is not installed, falling back to cProfile.")
+            engine = "cprofile"
+    if profiler is None:
+        profiler = cProfile.Profile()
+
+    tracemalloc.start(10)
+    start = time.perf_counter()
+    if engine == "cprofile":
+        profiler.enable()
+    else:
+        profiler.start()
+    try:
+        yield output_dir
+    finally:
+        if engine == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        _write_reports(output_dir, engine, profiler, snapshot, peak, elapsed, top_n)
+
+
+def _write_reports(output_dir, engine, profiler, snapshot, peak, elapsed, top_n):
+    allocations = _allocation_report(snapshot, peak, top_n)
+    with open(os.path.join(output_dir, "allocations.txt"), "w") as f:
+        f.write(allocations)
+
+    print(f"\n=== Profile ({elapsed:.2f}s wall) -> {output_dir} ===")
+
+    if engine == "pyinstrument":
+        with open(os.path.join(output_dir, "profile.html"), "w") as f:
+            f.write(profiler.output_html())
+        text = profiler.output_text(unicode=False, color=False)
+        with open(os.path.join(output_dir, "hot_functions.txt"), "w") as f:
+            f.write(text)
+        print(text)
+    else:
+        profiler.dump_stats(os.path.join(output_dir, "cprofile.prof"))
+        stats = pstats.Stats(profiler)
+        with open(os.path.join(output_dir, "hot_functions.txt"), "w") as f:
+            f.write(_hot_functions_report(stats, top_n))
+
+        breakdown = category_breakdown(stats)
+        total = sum(seconds for _name, seconds in breakdown) or 1.0
+        with open(os.path.join(output_dir, "categories.txt"), "w") as f:
+            for name, seconds in breakdown:
+                f.write(f"{name}\t{seconds:.4f}\n")
+
+        print("Self time by subsystem:")
+        for name, seconds in breakdown:
+            print(f"  {name:<26} {seconds:8.3f}s  {100 * seconds / total:5.1f}%")
+
+        print(f"\nTop {top_n} functions by self time:")
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+        for (filename, line, func), (_cc, calls, tottime, cumtime, _callers) in rows:
+            print(f"  {tottime:8.3f}s self {cumtime:8.3f}s cum {calls:9d} calls  {func} ({os.path.basename(filename)}:{line})")
+        print(f"(open with: python -m pstats {os.path.join(output_dir, 'cprofile.prof')})")
+
+    print(f"\n{allocations}")